@@ -0,0 +1,53 @@
+"""add file hash and parse cache
+
+Revision ID: 1b6e4d0c8a35
+Revises: 
+Create Date: 2026-10-17 15:55:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b6e4d0c8a35'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    columns = {column['name'] for column in inspector.get_columns('chromatographic_analyses')}
+    if 'file_hash' not in columns:
+        op.add_column('chromatographic_analyses', sa.Column('file_hash', sa.String(length=64), nullable=True))
+        op.create_index('ix_chromatographic_analyses_file_hash', 'chromatographic_analyses', ['file_hash'])
+    
+    if not inspector.has_table('parse_cache'):
+        op.create_table(
+            'parse_cache',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('parser_version', sa.String(length=20), nullable=False),
+            sa.Column('parsed_data', sa.JSON(), nullable=False),
+            sa.Column('file_size', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('content_hash', 'parser_version', name='uq_parse_cache_hash_version')
+        )
+        op.create_index('ix_parse_cache_id', 'parse_cache', ['id'])
+        op.create_index('ix_parse_cache_content_hash', 'parse_cache', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_table('parse_cache')
+    op.drop_index('ix_chromatographic_analyses_file_hash', table_name='chromatographic_analyses')
+    with op.batch_alter_table('chromatographic_analyses') as batch_op:
+        batch_op.drop_column('file_hash')
@@ -0,0 +1,152 @@
+"""add analysis_components
+
+Revision ID: 3f9a2c7d1b4e
+Revises: 9a4c3e6f2b17
+Create Date: 2026-10-17 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c7d1b4e'
+down_revision: Union[str, None] = '9a4c3e6f2b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Backfill in one statement on PostgreSQL. Keys are cas_<cas> or
+# name_<name>: the component catalog does not exist yet at this revision.
+BACKFILL_SQL = """
+INSERT INTO analysis_components (
+    analysis_id, material_id, position, component_key, component_name,
+    cas_number, percentage, component_type, retention_index
+)
+SELECT
+    a.id,
+    a.material_id,
+    (e.ordinality - 1)::int,
+    CASE WHEN coalesce(e.value ->> 'cas_number', '') <> ''
+         THEN 'cas_' || (e.value ->> 'cas_number')
+         ELSE 'name_' || lower(btrim(coalesce(e.value ->> 'component_name', ''))) END,
+    coalesce(e.value ->> 'component_name', ''),
+    nullif(e.value ->> 'cas_number', ''),
+    (e.value ->> 'percentage')::float8,
+    coalesce(e.value ->> 'component_type', 'COMPONENT'),
+    (e.value ->> 'retention_index')::float8
+FROM chromatographic_analyses a
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(a.parsed_data::jsonb -> 'components') = 'array'
+         THEN a.parsed_data::jsonb -> 'components'
+         ELSE '[]'::jsonb END
+) WITH ORDINALITY AS e(value, ordinality)
+WHERE a.is_processed = 1
+  AND NOT EXISTS (SELECT 1 FROM analysis_components c WHERE c.analysis_id = a.id)
+"""
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    if not inspector.has_table('analysis_components'):
+        op.create_table(
+            'analysis_components',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('analysis_id', sa.Integer(), nullable=False),
+            sa.Column('material_id', sa.Integer(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('component_key', sa.String(length=255), nullable=False),
+            sa.Column('component_name', sa.String(length=255), nullable=False),
+            sa.Column('cas_number', sa.String(length=50), nullable=True),
+            sa.Column('percentage', sa.Float(), nullable=False),
+            sa.Column('component_type', sa.String(length=20), nullable=True),
+            sa.Column('retention_index', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['analysis_id'], ['chromatographic_analyses.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_analysis_components_id', 'analysis_components', ['id'])
+        op.create_index('ix_analysis_components_analysis_id', 'analysis_components', ['analysis_id'])
+        op.create_index('ix_analysis_components_material_cas', 'analysis_components', ['material_id', 'cas_number'])
+        op.create_index('ix_analysis_components_material_key', 'analysis_components', ['material_id', 'component_key'])
+    
+    # Backfill the components of existing processed analyses
+    inserted = bind.execute(sa.text(BACKFILL_SQL)).rowcount if bind.dialect.name == 'postgresql' else _backfill(bind)
+    print(f"Backfilled {inserted} analysis components")
+
+
+def _backfill(bind) -> int:
+    """Backfill for other databases, reading parsed_data in batches with Core"""
+    analyses = sa.table(
+        'chromatographic_analyses',
+        sa.column('id', sa.Integer()),
+        sa.column('material_id', sa.Integer()),
+        sa.column('is_processed', sa.Integer()),
+        sa.column('parsed_data', sa.JSON())
+    )
+    components = sa.table(
+        'analysis_components',
+        sa.column('analysis_id', sa.Integer()),
+        sa.column('material_id', sa.Integer()),
+        sa.column('position', sa.Integer()),
+        sa.column('component_key', sa.String()),
+        sa.column('component_name', sa.String()),
+        sa.column('cas_number', sa.String()),
+        sa.column('percentage', sa.Float()),
+        sa.column('component_type', sa.String()),
+        sa.column('retention_index', sa.Float())
+    )
+    
+    inserted = 0
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(analyses.c.id, analyses.c.material_id, analyses.c.parsed_data).where(
+                analyses.c.is_processed == 1,
+                analyses.c.id > last_id,
+                ~analyses.c.id.in_(sa.select(components.c.analysis_id))
+            ).order_by(analyses.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not batch:
+            return inserted
+        
+        rows = [
+            {
+                'analysis_id': analysis_id,
+                'material_id': material_id,
+                'position': position,
+                'component_key': (
+                    f"cas_{component['cas_number']}" if component.get('cas_number')
+                    else f"name_{(component.get('component_name') or '').lower().strip()}"
+                ),
+                'component_name': component.get('component_name') or '',
+                'cas_number': component.get('cas_number') or None,
+                'percentage': component['percentage'],
+                'component_type': component.get('component_type') or 'COMPONENT',
+                'retention_index': component.get('retention_index')
+            }
+            for analysis_id, material_id, parsed_data in batch
+            for position, component in enumerate((parsed_data or {}).get('components') or [])
+        ]
+        if rows:
+            bind.execute(sa.insert(components), rows)
+        inserted += len(rows)
+        last_id = batch[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_components_material_key', table_name='analysis_components')
+    op.drop_index('ix_analysis_components_material_cas', table_name='analysis_components')
+    op.drop_index('ix_analysis_components_analysis_id', table_name='analysis_components')
+    op.drop_index('ix_analysis_components_id', table_name='analysis_components')
+    op.drop_table('analysis_components')
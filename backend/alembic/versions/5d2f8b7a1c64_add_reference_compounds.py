@@ -0,0 +1,48 @@
+"""add reference compounds
+
+Revision ID: 5d2f8b7a1c64
+Revises: 1b6e4d0c8a35
+Create Date: 2026-10-17 16:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8b7a1c64'
+down_revision: Union[str, None] = '1b6e4d0c8a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    if not inspector.has_table('reference_compounds'):
+        op.create_table(
+            'reference_compounds',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=200), nullable=False),
+            sa.Column('cas_number', sa.String(length=50), nullable=True),
+            sa.Column('retention_index', sa.Float(), nullable=False),
+            sa.Column('column_phase', sa.String(length=50), nullable=True),
+            sa.Column('source', sa.String(length=200), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_reference_compounds_id', 'reference_compounds', ['id'])
+        op.create_index('ix_reference_compounds_cas_number', 'reference_compounds', ['cas_number'])
+        op.create_index('ix_reference_compounds_retention_index', 'reference_compounds', ['retention_index'])
+        op.create_index('ix_reference_compounds_column_phase', 'reference_compounds', ['column_phase'])
+
+
+def downgrade() -> None:
+    op.drop_table('reference_compounds')
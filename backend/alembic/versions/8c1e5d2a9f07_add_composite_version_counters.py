@@ -0,0 +1,79 @@
+"""add composite version counters
+
+Revision ID: 8c1e5d2a9f07
+Revises: 3f9a2c7d1b4e
+Create Date: 2026-10-17 18:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1e5d2a9f07'
+down_revision: Union[str, None] = '3f9a2c7d1b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    if not inspector.has_table('composites'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    # Concurrent calculations may already have written duplicate versions:
+    # the oldest row keeps its version, the others move past the maximum
+    duplicates = bind.execute(sa.text("""
+        SELECT c.id, c.material_id
+        FROM composites c
+        WHERE EXISTS (
+            SELECT 1 FROM composites o
+            WHERE o.material_id = c.material_id
+              AND o.version = c.version
+              AND o.id < c.id
+        )
+        ORDER BY c.material_id, c.id
+    """)).all()
+    
+    max_versions = dict(bind.execute(sa.text(
+        "SELECT material_id, max(version) FROM composites GROUP BY material_id"
+    )).all())
+    
+    for composite_id, material_id in duplicates:
+        max_versions[material_id] += 1
+        bind.execute(
+            sa.text("UPDATE composites SET version = :version WHERE id = :id"),
+            {"version": max_versions[material_id], "id": composite_id}
+        )
+    if duplicates:
+        print(f"Renumbered {len(duplicates)} duplicate composite versions")
+    
+    if not inspector.has_table('composite_version_counters'):
+        op.create_table(
+            'composite_version_counters',
+            sa.Column('material_id', sa.Integer(), nullable=False),
+            sa.Column('last_version', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('material_id')
+        )
+    
+    bind.execute(sa.text("""
+        INSERT INTO composite_version_counters (material_id, last_version)
+        SELECT material_id, max(version) FROM composites
+        WHERE material_id NOT IN (SELECT material_id FROM composite_version_counters)
+        GROUP BY material_id
+    """))
+    
+    indexes = {index['name'] for index in inspector.get_indexes('composites')}
+    if 'uq_composites_material_version' not in indexes:
+        op.create_index('uq_composites_material_version', 'composites', ['material_id', 'version'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_composites_material_version', table_name='composites')
+    op.drop_table('composite_version_counters')
@@ -0,0 +1,74 @@
+"""add component statistics
+
+Revision ID: 9a4c3e6f2b17
+Revises: 5d2f8b7a1c64
+Create Date: 2026-10-17 16:08:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c3e6f2b17'
+down_revision: Union[str, None] = '5d2f8b7a1c64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    # Both tables start empty: calculations add the processed analyses
+    # missing from component_statistics_sources on their first run
+    if not inspector.has_table('component_statistics'):
+        op.create_table(
+            'component_statistics',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('material_id', sa.Integer(), nullable=False),
+            sa.Column('component_key', sa.String(length=255), nullable=False),
+            sa.Column('component_name', sa.String(length=255), nullable=False),
+            sa.Column('cas_number', sa.String(length=50), nullable=True),
+            sa.Column('name_analysis_id', sa.Integer(), nullable=True),
+            sa.Column('observation_count', sa.Integer(), nullable=False),
+            sa.Column('sum_weight', sa.Float(), nullable=False),
+            sa.Column('sum_weighted_percentage', sa.Float(), nullable=False),
+            sa.Column('sum_percentage', sa.Float(), nullable=False),
+            sa.Column('sum_squared_percentage', sa.Float(), nullable=False),
+            sa.Column('type_counts', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('material_id', 'component_key', name='uq_component_statistics_material_key')
+        )
+        op.create_index('ix_component_statistics_id', 'component_statistics', ['id'])
+        op.create_index('ix_component_statistics_material_id', 'component_statistics', ['material_id'])
+    
+    if not inspector.has_table('component_statistics_sources'):
+        op.create_table(
+            'component_statistics_sources',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('material_id', sa.Integer(), nullable=False),
+            sa.Column('analysis_id', sa.Integer(), nullable=False),
+            sa.Column('weight', sa.Float(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_component_statistics_sources_id', 'component_statistics_sources', ['id'])
+        op.create_index('ix_component_statistics_sources_material_id', 'component_statistics_sources', ['material_id'])
+        op.create_index(
+            'ix_component_statistics_sources_analysis_id', 'component_statistics_sources', ['analysis_id'], unique=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('component_statistics_sources')
+    op.drop_table('component_statistics')
@@ -0,0 +1,59 @@
+"""add component catalog
+
+Revision ID: a7d3f19c8e52
+Revises: e4a7c9d2f615
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f19c8e52'
+down_revision: Union[str, None] = 'e4a7c9d2f615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    if not inspector.has_table('component_catalog'):
+        op.create_table(
+            'component_catalog',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('cas_number', sa.String(length=50), nullable=True),
+            sa.Column('component_key', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('component_key')
+        )
+        op.create_index('ix_component_catalog_id', 'component_catalog', ['id'])
+    
+    if not inspector.has_table('component_synonyms'):
+        op.create_table(
+            'component_synonyms',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('catalog_id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=10), nullable=False),
+            sa.Column('value', sa.String(length=255), nullable=False),
+            sa.ForeignKeyConstraint(['catalog_id'], ['component_catalog.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('kind', 'value', name='uq_component_synonyms_kind_value')
+        )
+        op.create_index('ix_component_synonyms_id', 'component_synonyms', ['id'])
+        op.create_index('ix_component_synonyms_catalog_id', 'component_synonyms', ['catalog_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('component_synonyms')
+    op.drop_table('component_catalog')
@@ -0,0 +1,38 @@
+"""add component confidence intervals
+
+Revision ID: b52d7e1c4a93
+Revises: 8c1e5d2a9f07
+Create Date: 2026-10-17 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52d7e1c4a93'
+down_revision: Union[str, None] = '8c1e5d2a9f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('composite_components'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    columns = {column['name'] for column in inspector.get_columns('composite_components')}
+    if 'ci_lower' not in columns:
+        op.add_column('composite_components', sa.Column('ci_lower', sa.Float(), nullable=True))
+    if 'ci_upper' not in columns:
+        op.add_column('composite_components', sa.Column('ci_upper', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('composite_components') as batch_op:
+        batch_op.drop_column('ci_upper')
+        batch_op.drop_column('ci_lower')
@@ -0,0 +1,51 @@
+"""add significance rules
+
+Revision ID: c3e8a1f47b2d
+Revises: a7d3f19c8e52
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f47b2d'
+down_revision: Union[str, None] = 'a7d3f19c8e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    if not inspector.has_table('significance_rules'):
+        op.create_table(
+            'significance_rules',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('cas_number', sa.String(length=50), nullable=True),
+            sa.Column('component_type', postgresql.ENUM(
+                'COMPONENT', 'IMPURITY', name='componenttype', create_type=False  # Type of composite_components
+            ), nullable=True),
+            sa.Column('min_change', sa.Float(), nullable=True),
+            sa.Column('absolute_threshold', sa.Float(), nullable=True),
+            sa.Column('relative_threshold', sa.Float(), nullable=True),
+            sa.Column('max_percentage', sa.Float(), nullable=True),
+            sa.Column('description', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_significance_rules_id', 'significance_rules', ['id'])
+        op.create_index('ix_significance_rules_cas_number', 'significance_rules', ['cas_number'])
+
+
+def downgrade() -> None:
+    op.drop_table('significance_rules')
@@ -0,0 +1,44 @@
+"""add analysis outlier flags
+
+Revision ID: e4a7c9d2f615
+Revises: b52d7e1c4a93
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c9d2f615'
+down_revision: Union[str, None] = 'b52d7e1c4a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('chromatographic_analyses'):
+        # Fresh database: the application creates all tables on startup
+        return
+    
+    columns = {column['name'] for column in inspector.get_columns('chromatographic_analyses')}
+    if 'outlier_score' not in columns:
+        op.add_column('chromatographic_analyses', sa.Column('outlier_score', sa.Float(), nullable=True))
+    if 'is_outlier' not in columns:
+        op.add_column('chromatographic_analyses', sa.Column('is_outlier', sa.Boolean(), nullable=True))
+    if 'outlier_screened_at' not in columns:
+        op.add_column(
+            'chromatographic_analyses',
+            sa.Column('outlier_screened_at', sa.DateTime(timezone=True), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('chromatographic_analyses') as batch_op:
+        batch_op.drop_column('outlier_screened_at')
+        batch_op.drop_column('is_outlier')
+        batch_op.drop_column('outlier_score')
@@ -1,22 +1,114 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from pydantic import TypeAdapter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Dict, Any
 from pathlib import Path
-import shutil
 from datetime import datetime
+import asyncio
+import hashlib
+import io
+import logging
+import uuid
+import zipfile
 
 from app.core.database import get_db
 from app.core.config import settings
 from app.models.chromatographic_analysis import ChromatographicAnalysis
 from app.models.material import Material
+from app.models.analysis_component import AnalysisComponent
 from app.schemas.chromatographic_analysis import (
     ChromatographicAnalysisResponse,
-    ChromatographicAnalysisCreate
+    ChromatographicAnalysisCreate,
+    BatchFileMetadata,
+    BatchUploadFileResult,
+    BatchUploadResponse,
+    AnalysisProcessingStatus,
+    AnalysisComponentResponse
 )
-from app.parsers.csv_parser import ChromatographicCSVParser
+from app.parsers.csv_parser import ChromatographicCSVParser, init_parse_worker, parse_csv_in_worker
+from app.services.composite_calculator import CompositeCalculator
+from app.services.analysis_components import AnalysisComponentIndex
+from app.services.parse_cache import ParseCache
+from app.services.composite_preview import invalidate_composite_previews
+from app.services.retention_index import get_reference_library
+from app.services.component_identity import get_identity_index
+from app.core.celery_app import celery_app
+from app.tasks.ingestion_tasks import parse_analysis
 
 router = APIRouter(prefix="/chromatographic-analyses", tags=["chromatographic-analyses"])
 
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_versions: Optional[Tuple[str, ...]] = None
+
+
+def _get_parse_pool(**context) -> ProcessPoolExecutor:
+    """
+    Process pool for batch parsing, created on first use
+    
+    Workers receive the parsing context (versioned objects passed on to
+    parse_csv_content) once, when they start; the pool is replaced when
+    the version of any of them has changed. Files still parsing on the
+    old pool finish there.
+    """
+    global _parse_pool, _parse_pool_versions
+    versions = tuple(f"{name}:{value.version}" for name, value in sorted(context.items()))
+    
+    if _parse_pool is None or _parse_pool_versions != versions:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False)
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.PARSER_POOL_WORKERS or None,
+            initializer=init_parse_worker,
+            initargs=(context,)
+        )
+        _parse_pool_versions = versions
+    return _parse_pool
+
+
+async def _read_upload(file: UploadFile) -> Tuple[bytes, str]:
+    """
+    Read an uploaded file in chunks, hashing it and enforcing MAX_UPLOAD_SIZE
+    
+    Returns:
+        Tuple of (file content, SHA-256 hex digest)
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        
+        size += len(chunk)
+        if size > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds maximum upload size of {settings.MAX_UPLOAD_SIZE} bytes"
+            )
+        
+        digest.update(chunk)
+        chunks.append(chunk)
+    
+    return b"".join(chunks), digest.hexdigest()
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO date, ignoring invalid values"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
 
 @router.post("", response_model=ChromatographicAnalysisResponse, status_code=status.HTTP_201_CREATED)
 async def upload_chromatographic_analysis(
@@ -27,9 +119,22 @@ async def upload_chromatographic_analysis(
     analysis_date: Optional[str] = Form(None),
     lab_technician: Optional[str] = Form(None),
     weight: float = Form(1.0),
+    allow_duplicate: bool = Form(False),
+    async_processing: Optional[bool] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """Upload and parse a chromatographic analysis CSV file"""
+    """
+    Upload and parse a chromatographic analysis CSV file
+    
+    The file is either a peak table or a raw trace (time and intensity
+    columns), which is integrated with RawTraceParser. Files are stored and parsed once per content hash. Uploading the same
+    file again for the same material is rejected with 409 unless
+    allow_duplicate is set.
+    
+    With async_processing (default ASYNC_INGESTION) the file is only stored:
+    the analysis is created with is_processed=0 and parsed by a Celery
+    worker on the ingestion queue. Follow it with GET /{id}/status.
+    """
     
     # Verify material exists
     material = db.query(Material).filter(Material.id == material_id).first()
@@ -46,52 +151,349 @@ async def upload_chromatographic_analysis(
             detail="Only CSV files are supported"
         )
     
+    # Read, hash and size-check the upload in one pass
+    content, file_hash = await _read_upload(file)
+    
+    reference_library = get_reference_library(db)
+    identity_index = get_identity_index(db)
+    parse_cache = ParseCache(db, reference_library=reference_library, identity_index=identity_index)
+    
+    if not allow_duplicate:
+        existing = parse_cache.find_analysis(file_hash, material_id=material_id)
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"File already ingested as analysis {existing.id}"
+            )
+    
     # Create upload directory if it doesn't exist
     upload_dir = Path(settings.UPLOAD_DIR)
     upload_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{material.reference_code}_{timestamp}_{file.filename}"
-    file_path = upload_dir / filename
+    # Files are stored by content, so identical uploads share one copy
+    file_path = upload_dir / f"{file_hash}.csv"
+    
+    def save_file():
+        if not file_path.exists():
+            file_path.write_bytes(content)
     
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    if async_processing is None:
+        async_processing = settings.ASYNC_INGESTION
     
-    # Parse CSV
-    parser = ChromatographicCSVParser()
-    parse_result = parser.parse_file(str(file_path))
+    # Reuse the parse result of an identical earlier upload
+    parse_result = parse_cache.get(file_hash)
+    queued = parse_result is None and async_processing
+    
+    if parse_result is not None:
+        await run_in_threadpool(save_file)
+    elif queued:
+        # Only store the file, a worker parses it
+        await run_in_threadpool(save_file)
+        parse_result = {
+            'task_id': str(uuid.uuid4()),
+            'file_sha256': file_hash,
+            'file_size': len(content)
+        }
+    else:
+        # Save file and parse CSV from memory at the same time
+        parser = ChromatographicCSVParser.for_content(
+            content, reference_library=reference_library, identity_index=identity_index
+        )
+        _, parse_result = await asyncio.gather(
+            run_in_threadpool(save_file),
+            run_in_threadpool(parser.parse_buffer, content)
+        )
+        parse_result['file_sha256'] = file_hash
+        parse_result['file_size'] = len(content)
+        parse_cache.put(file_hash, parse_result, file_size=len(content))
     
     # Parse analysis_date if provided
-    parsed_date = None
-    if analysis_date:
-        try:
-            parsed_date = datetime.fromisoformat(analysis_date)
-        except ValueError:
-            pass
+    parsed_date = _parse_date(analysis_date)
     
     # Create database record
     analysis = ChromatographicAnalysis(
         material_id=material_id,
         filename=file.filename,
         file_path=str(file_path),
+        file_hash=file_hash,
         batch_number=batch_number,
         supplier=supplier,
         analysis_date=parsed_date,
         lab_technician=lab_technician,
         weight=weight,
         parsed_data=parse_result,
-        is_processed=1 if parse_result['success'] else -1,
-        processing_notes="; ".join(parse_result.get('validation_errors', []))
+        is_processed=0 if queued else (1 if parse_result['success'] else -1),
+        processing_notes="Queued for parsing" if queued else "; ".join(parse_result.get('validation_errors', []))
     )
     
     db.add(analysis)
+    db.flush()
+    AnalysisComponentIndex(db).add([analysis])
+    CompositeCalculator(db).record_analysis(analysis)
     db.commit()
     db.refresh(analysis)
     
+    if queued:
+        try:
+            parse_analysis.apply_async(args=[analysis.id], task_id=parse_result['task_id'])
+        except Exception as e:
+            # Undo the upload, including the stored file unless another analysis shares it
+            if file_path.exists() and not parse_cache.is_file_shared(analysis):
+                file_path.unlink()
+            db.delete(analysis)
+            db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Could not queue analysis for parsing: {e}"
+            )
+    
     return analysis
 
 
+def _expand_zip(content: bytes) -> List[Dict[str, Any]]:
+    """
+    Extract the CSV members of a zip upload
+    
+    Returns:
+        List of batch items (filename, content, file_hash or error)
+    """
+    items = []
+    
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith('.csv'):
+                continue
+            
+            filename = Path(info.filename).name
+            if info.file_size > settings.MAX_UPLOAD_SIZE:
+                items.append({
+                    'filename': filename,
+                    'error': f"File exceeds maximum upload size of {settings.MAX_UPLOAD_SIZE} bytes"
+                })
+                continue
+            
+            member = archive.read(info)
+            items.append({
+                'filename': filename,
+                'content': member,
+                'file_hash': hashlib.sha256(member).hexdigest()
+            })
+    
+    return items
+
+
+@router.post("/batch", response_model=BatchUploadResponse)
+async def upload_chromatographic_analyses_batch(
+    files: List[UploadFile] = File(...),
+    material_id: Optional[int] = Form(None),
+    metadata: Optional[str] = Form(None),
+    allow_duplicate: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload and parse many chromatographic analysis CSV files at once
+    
+    Accepts CSV files and zip archives of CSV files. metadata is an optional
+    JSON list of BatchFileMetadata, matched to files by filename or, for
+    entries without one, by position. Files are parsed in parallel on a
+    process pool and all analyses are inserted in one transaction. Each file
+    gets its own result; a bad file does not stop the others.
+    """
+    try:
+        file_metadata = TypeAdapter(List[BatchFileMetadata]).validate_json(metadata) if metadata else []
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid metadata: {e}"
+        )
+    
+    # Read, hash and size-check every upload, expanding zip archives
+    items = []
+    for file in files:
+        filename = file.filename or ''
+        try:
+            content, file_hash = await _read_upload(file)
+        except HTTPException as e:
+            items.append({'filename': filename, 'error': e.detail})
+            continue
+        
+        if filename.lower().endswith('.zip'):
+            try:
+                items.extend(_expand_zip(content))
+            except zipfile.BadZipFile:
+                items.append({'filename': filename, 'error': "Invalid zip archive"})
+        elif filename.endswith('.csv'):
+            items.append({'filename': filename, 'content': content, 'file_hash': file_hash})
+        else:
+            items.append({'filename': filename, 'error': "Only CSV and zip files are supported"})
+    
+    # Attach metadata and material to each file
+    by_filename = {m.filename: m for m in file_metadata if m.filename}
+    by_position = [m for m in file_metadata if not m.filename]
+    for position, item in enumerate(items):
+        meta = by_filename.get(item['filename'])
+        if meta is None:
+            meta = by_position[position] if position < len(by_position) else BatchFileMetadata()
+        item['metadata'] = meta
+        item['material_id'] = meta.material_id or material_id
+        if 'error' not in item and item['material_id'] is None:
+            item['error'] = "No material_id given for this file"
+    
+    pending = [item for item in items if 'error' not in item]
+    
+    # Materials, previous ingestions and cached parses: one query each
+    material_ids = {item['material_id'] for item in pending}
+    existing_materials = {
+        row[0] for row in db.query(Material.id).filter(Material.id.in_(material_ids)).all()
+    } if material_ids else set()
+    
+    reference_library = get_reference_library(db)
+    identity_index = get_identity_index(db)
+    parse_cache = ParseCache(db, reference_library=reference_library, identity_index=identity_index)
+    hashes = [item['file_hash'] for item in pending]
+    ingested = parse_cache.find_ingested(hashes) if not allow_duplicate else {}
+    parsed_by_hash = parse_cache.get_many(hashes)
+    
+    seen = set()
+    for item in pending:
+        key = (item['file_hash'], item['material_id'])
+        if item['material_id'] not in existing_materials:
+            item['error'] = f"Material {item['material_id']} not found"
+        elif key in ingested:
+            item['error'] = f"File already ingested as analysis {ingested[key]}"
+        elif key in seen and not allow_duplicate:
+            item['error'] = "Same file already included in this batch"
+        seen.add(key)
+    
+    pending = [item for item in pending if 'error' not in item]
+    contents = {item['file_hash']: item['content'] for item in pending}
+    to_parse = {h: content for h, content in contents.items() if h not in parsed_by_hash}
+    
+    # Create upload directory if it doesn't exist
+    upload_dir = Path(settings.UPLOAD_DIR)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    
+    def save_files():
+        for file_hash, content in contents.items():
+            file_path = upload_dir / f"{file_hash}.csv"
+            if not file_path.exists():
+                file_path.write_bytes(content)
+    
+    # Parse new content on the process pool while the files are written
+    loop = asyncio.get_running_loop()
+    pool = _get_parse_pool(reference_library=reference_library, identity_index=identity_index)
+    _, *parse_results = await asyncio.gather(
+        run_in_threadpool(save_files),
+        *(loop.run_in_executor(pool, parse_csv_in_worker, content) for content in to_parse.values())
+    )
+    
+    for (file_hash, content), parse_result in zip(to_parse.items(), parse_results):
+        parse_result['file_sha256'] = file_hash
+        parse_result['file_size'] = len(content)
+        parse_cache.put(file_hash, parse_result, file_size=len(content))
+        parsed_by_hash[file_hash] = parse_result
+    
+    # Insert all analyses in one transaction
+    analyses = []
+    for item in pending:
+        meta = item['metadata']
+        parse_result = parsed_by_hash[item['file_hash']]
+        analysis = ChromatographicAnalysis(
+            material_id=item['material_id'],
+            filename=item['filename'],
+            file_path=str(upload_dir / f"{item['file_hash']}.csv"),
+            file_hash=item['file_hash'],
+            batch_number=meta.batch_number,
+            supplier=meta.supplier,
+            analysis_date=meta.analysis_date,
+            lab_technician=meta.lab_technician,
+            weight=meta.weight,
+            parsed_data=parse_result,
+            is_processed=1 if parse_result['success'] else -1,
+            processing_notes="; ".join(parse_result.get('validation_errors', []))
+        )
+        item['analysis'] = analysis
+        analyses.append(analysis)
+    
+    db.add_all(analyses)
+    db.flush()
+    
+    AnalysisComponentIndex(db).add(analyses)
+    calculator = CompositeCalculator(db)
+    for analysis in analyses:
+        calculator.record_analysis(analysis)
+    
+    results = []
+    for item in items:
+        analysis = item.get('analysis')
+        if analysis is None:
+            results.append(BatchUploadFileResult(
+                filename=item['filename'],
+                material_id=item.get('material_id'),
+                success=False,
+                error=item.get('error')
+            ))
+        else:
+            results.append(BatchUploadFileResult(
+                filename=item['filename'],
+                material_id=analysis.material_id,
+                success=True,
+                analysis_id=analysis.id,
+                is_processed=analysis.is_processed,
+                component_count=analysis.parsed_data.get('component_count')
+            ))
+    
+    db.commit()
+    
+    created = len(analyses)
+    return BatchUploadResponse(
+        total=len(items),
+        created=created,
+        failed=len(items) - created,
+        results=results
+    )
+
+
+@router.get("/by-hash/{file_hash}", response_model=List[ChromatographicAnalysisResponse])
+def get_analyses_by_hash(file_hash: str, db: Session = Depends(get_db)):
+    """Get the analyses ingested from a file with this SHA-256"""
+    analyses = db.query(ChromatographicAnalysis).filter(
+        ChromatographicAnalysis.file_hash == file_hash.lower()
+    ).order_by(ChromatographicAnalysis.id).all()
+    
+    return analyses
+
+
+@router.get("/components", response_model=List[AnalysisComponentResponse])
+def search_analysis_components(
+    cas_number: Optional[str] = None,
+    component_name: Optional[str] = None,
+    material_id: Optional[int] = None,
+    min_percentage: Optional[float] = None,
+    max_percentage: Optional[float] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Search parsed components across analyses (by CAS, name, material and percentage)"""
+    query = db.query(AnalysisComponent)
+    
+    if cas_number:
+        query = query.filter(AnalysisComponent.cas_number == cas_number.strip())
+    if component_name:
+        query = query.filter(AnalysisComponent.component_name.ilike(f"%{component_name.strip()}%"))
+    if material_id is not None:
+        query = query.filter(AnalysisComponent.material_id == material_id)
+    if min_percentage is not None:
+        query = query.filter(AnalysisComponent.percentage >= min_percentage)
+    if max_percentage is not None:
+        query = query.filter(AnalysisComponent.percentage <= max_percentage)
+    
+    return query.order_by(
+        AnalysisComponent.analysis_id, AnalysisComponent.position
+    ).offset(skip).limit(limit).all()
+
+
 @router.get("/material/{material_id}", response_model=List[ChromatographicAnalysisResponse])
 def get_material_analyses(
     material_id: int,
@@ -123,6 +525,56 @@ def get_analysis(analysis_id: int, db: Session = Depends(get_db)):
     return analysis
 
 
+@router.get("/{analysis_id}/status", response_model=AnalysisProcessingStatus)
+def get_analysis_status(analysis_id: int, db: Session = Depends(get_db)):
+    """Get the parsing status of an analysis (for queued uploads)"""
+    analysis = db.query(ChromatographicAnalysis).filter(
+        ChromatographicAnalysis.id == analysis_id
+    ).first()
+    
+    if not analysis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Analysis {analysis_id} not found"
+        )
+    
+    task_id = (analysis.parsed_data or {}).get('task_id')
+    result = AnalysisProcessingStatus(
+        analysis_id=analysis.id,
+        is_processed=analysis.is_processed,
+        state="PROCESSED" if analysis.is_processed == 1 else "ERROR",
+        progress=1.0,
+        task_id=task_id,
+        processing_notes=analysis.processing_notes
+    )
+    
+    if analysis.is_processed != 0:
+        return result
+    
+    result.state = "QUEUED"
+    result.progress = 0.0
+    
+    if task_id:
+        try:
+            task = celery_app.AsyncResult(task_id)
+            result.task_state = task.state
+            
+            if task.state == "PROGRESS" and isinstance(task.info, dict):
+                result.state = "PROCESSING"
+                result.stage = task.info.get('stage')
+                result.progress = task.info.get('progress', 0.0)
+            elif task.state in ("STARTED", "SUCCESS"):
+                result.state = "PROCESSING"
+            elif task.state == "FAILURE":
+                result.state = "ERROR"
+                result.progress = 1.0
+        except Exception as e:
+            # Result backend unavailable, report what the database knows
+            logger.warning("Could not read task state for analysis %s: %s", analysis_id, e)
+    
+    return result
+
+
 @router.delete("/{analysis_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_analysis(analysis_id: int, db: Session = Depends(get_db)):
     """Delete a chromatographic analysis"""
@@ -136,13 +588,16 @@ def delete_analysis(analysis_id: int, db: Session = Depends(get_db)):
             detail=f"Analysis {analysis_id} not found"
         )
     
-    # Delete file if exists
+    # Delete file if exists and no other analysis shares it
     file_path = Path(analysis.file_path)
-    if file_path.exists():
+    if file_path.exists() and not ParseCache(db).is_file_shared(analysis):
         file_path.unlink()
     
+    material_id = analysis.material_id
+    CompositeCalculator(db).forget_analysis(analysis)
     db.delete(analysis)
     db.commit()
+    invalidate_composite_previews(material_id, analysis_id)
     
     return None
 
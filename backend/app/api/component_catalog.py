@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.models.component_catalog import ComponentCatalogEntry, ComponentSynonym
+from app.schemas.component_catalog import (
+    ComponentCatalogEntryCreate,
+    ComponentCatalogEntryResponse,
+    ComponentSynonymsAdd,
+    ComponentResolution
+)
+from app.services.component_catalog import ComponentCatalog
+from app.services.component_identity import get_identity_index, invalidate_identity_index
+
+router = APIRouter(prefix="/component-catalog", tags=["component-catalog"])
+
+
+def _get_entry(db: Session, entry_id: int) -> ComponentCatalogEntry:
+    entry = db.query(ComponentCatalogEntry).filter(ComponentCatalogEntry.id == entry_id).first()
+    
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Catalog entry {entry_id} not found"
+        )
+    
+    return entry
+
+
+@router.post("", response_model=List[ComponentCatalogEntryResponse], status_code=status.HTTP_201_CREATED)
+def create_catalog_entries(
+    entries: List[ComponentCatalogEntryCreate],
+    db: Session = Depends(get_db)
+):
+    """Add components to the catalog (bulk); stored components they match are re-keyed"""
+    try:
+        db_entries = ComponentCatalog(db).create_entries([entry.model_dump() for entry in entries])
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    db.commit()
+    invalidate_identity_index()
+    
+    for entry in db_entries:
+        db.refresh(entry)
+    
+    return db_entries
+
+
+@router.get("", response_model=List[ComponentCatalogEntryResponse])
+def list_catalog_entries(
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """List catalog entries, optionally filtered by name or CAS number"""
+    query = db.query(ComponentCatalogEntry).options(selectinload(ComponentCatalogEntry.synonyms))
+    
+    if search:
+        query = query.filter(
+            (ComponentCatalogEntry.name.ilike(f"%{search}%")) |
+            (ComponentCatalogEntry.cas_number.ilike(f"%{search}%"))
+        )
+    
+    return query.order_by(ComponentCatalogEntry.name).offset(skip).limit(limit).all()
+
+
+@router.get("/resolve", response_model=ComponentResolution)
+def resolve_component(
+    name: Optional[str] = None,
+    cas_number: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Aggregation key a component name and/or CAS number resolve to"""
+    if not name and not cas_number:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give a name or a CAS number"
+        )
+    
+    index = get_identity_index(db)
+    key = index.component_key(cas_number, name)
+    canonical = index.canonical(key)
+    
+    return ComponentResolution(
+        component_key=key,
+        in_catalog=canonical is not None,
+        name=canonical[0] if canonical else None,
+        cas_number=canonical[1] if canonical else None
+    )
+
+
+@router.get("/{entry_id}", response_model=ComponentCatalogEntryResponse)
+def get_catalog_entry(entry_id: int, db: Session = Depends(get_db)):
+    """Get a catalog entry with its synonyms"""
+    return _get_entry(db, entry_id)
+
+
+@router.post("/{entry_id}/synonyms", response_model=ComponentCatalogEntryResponse)
+def add_catalog_synonyms(
+    entry_id: int,
+    request: ComponentSynonymsAdd,
+    db: Session = Depends(get_db)
+):
+    """Add names and CAS numbers to a catalog entry"""
+    entry = _get_entry(db, entry_id)
+    
+    try:
+        ComponentCatalog(db).add_synonyms(entry, request.synonyms, request.cas_aliases)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    db.commit()
+    invalidate_identity_index()
+    db.refresh(entry)
+    
+    return entry
+
+
+@router.delete("/{entry_id}/synonyms/{synonym_id}", response_model=ComponentCatalogEntryResponse)
+def remove_catalog_synonym(entry_id: int, synonym_id: int, db: Session = Depends(get_db)):
+    """Remove a name or CAS number from a catalog entry"""
+    entry = _get_entry(db, entry_id)
+    synonym = db.query(ComponentSynonym).filter(
+        ComponentSynonym.id == synonym_id,
+        ComponentSynonym.catalog_id == entry_id
+    ).first()
+    
+    if not synonym:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Synonym {synonym_id} not found in catalog entry {entry_id}"
+        )
+    
+    ComponentCatalog(db).remove_synonym(entry, synonym)
+    db.commit()
+    invalidate_identity_index()
+    db.refresh(entry)
+    
+    return entry
+
+
+@router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_catalog_entry(entry_id: int, db: Session = Depends(get_db)):
+    """Delete a catalog entry; its components go back to their CAS/name keys"""
+    entry = _get_entry(db, entry_id)
+    
+    ComponentCatalog(db).delete_entry(entry)
+    db.commit()
+    invalidate_identity_index()
+    
+    return None
@@ -10,10 +10,33 @@ from app.schemas.composite import (
     CompositeCreate,
     CompositeResponse,
     CompositeCalculateRequest,
-    CompositeCompareResponse
+    CompositePreviewRequest,
+    CompositePreviewResponse,
+    CompositeSensitivityRequest,
+    CompositeSensitivityResponse,
+    AnalysisOutlierScore,
+    CompositeCompareResponse,
+    CompositeVersionMatrixResponse,
+    CompositeSimilarityResponse,
+    ComparisonCacheStats,
+    CompositeDriftResponse,
+    CompositeBulkCalculateRequest,
+    CompositeBulkCalculateResult,
+    CompositeBulkCalculateResponse
 )
 from app.services.composite_calculator import CompositeCalculator
 from app.services.composite_comparator import CompositeComparator
+from app.services.composite_drift import CompositeDriftAnalyzer
+from app.services.comparison_cache import get_comparison_cache, invalidate_composite_comparisons
+from app.services.composite_preview import CompositePreviewer
+from app.services.composite_sensitivity import CompositeSensitivityAnalyzer
+from app.services.outlier_screening import OutlierScreener
+from app.services.composite_similarity import (
+    CompositeSimilarityIndex,
+    CompositeSimilarityFinder,
+    similarity_version,
+    update_similarity_index
+)
 
 router = APIRouter(prefix="/composites", tags=["composites"])
 
@@ -30,7 +53,9 @@ def calculate_composite(
         composite = calculator.calculate_from_lab_analyses(
             material_id=request.material_id,
             analysis_ids=request.analysis_ids,
-            notes=request.notes
+            notes=request.notes,
+            bootstrap=request.bootstrap,
+            outliers=request.outliers
         )
         
         db.add(composite)
@@ -38,7 +63,56 @@ def calculate_composite(
         db.refresh(composite)
         
         return composite
-        
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/preview", response_model=CompositePreviewResponse)
+def preview_composite(
+    request: CompositePreviewRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Preview the composite of some analyses without saving it
+    
+    Repeated previews of the same analysis set are served from a cache
+    until one of the analyses changes.
+    """
+    try:
+        return CompositePreviewer(db).preview(
+            material_id=request.material_id,
+            analysis_ids=request.analysis_ids,
+            bootstrap=request.bootstrap,
+            outliers=request.outliers
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/sensitivity", response_model=CompositeSensitivityResponse)
+def composite_sensitivity(
+    request: CompositeSensitivityRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Rank the analyses of a material by their influence on the composite
+    
+    For each analysis, reports how much the composite changes (sum of
+    absolute percentage point changes) when that analysis is left out.
+    """
+    try:
+        return CompositeSensitivityAnalyzer(db).analyze(
+            material_id=request.material_id,
+            analysis_ids=request.analysis_ids,
+            top_components=request.top_components
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,6 +120,69 @@ def calculate_composite(
         )
 
 
+@router.post("/calculate/bulk", response_model=CompositeBulkCalculateResponse)
+def calculate_composites_bulk(
+    request: CompositeBulkCalculateRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Calculate composites for many materials in one transaction
+    
+    Takes material IDs and/or filters, or all_materials to recalculate
+    every material. Outliers are handled as in /calculate. Materials that
+    cannot be calculated are reported in the results without aborting
+    the batch.
+    """
+    calculator = CompositeCalculator(db)
+    
+    try:
+        calculated = calculator.calculate_bulk(
+            material_ids=request.material_ids,
+            material_type=request.material_type,
+            supplier=request.supplier,
+            active_only=request.active_only,
+            notes=request.notes,
+            outliers=request.outliers,
+            all_materials=request.all_materials
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    composites = [item['composite'] for item in calculated if 'composite' in item]
+    db.add_all(composites)
+    db.flush()
+    
+    results = []
+    for item in calculated:
+        composite = item.get('composite')
+        if composite is None:
+            results.append(CompositeBulkCalculateResult(
+                material_id=item['material_id'],
+                success=False,
+                error=item['error']
+            ))
+        else:
+            results.append(CompositeBulkCalculateResult(
+                material_id=item['material_id'],
+                success=True,
+                composite_id=composite.id,
+                version=composite.version,
+                component_count=len(composite.components)
+            ))
+    
+    db.commit()
+    
+    return CompositeBulkCalculateResponse(
+        total=len(results),
+        created=len(composites),
+        failed=len(results) - len(composites),
+        results=results
+    )
+
+
 @router.post("", response_model=CompositeResponse, status_code=status.HTTP_201_CREATED)
 def create_composite(
     composite_data: CompositeCreate,
@@ -74,7 +211,27 @@ def create_composite(
         db.refresh(composite)
         
         return composite
-        
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/drift", response_model=CompositeDriftResponse)
+def get_composite_drift(
+    skip: int = 0,
+    limit: int = 50,
+    min_score: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Materials ranked by how far their newest draft composite drifted from
+    the latest approved one (highest change score first)
+    """
+    try:
+        return CompositeDriftAnalyzer(db).drift(skip=skip, limit=limit, min_score=min_score)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -115,6 +272,68 @@ def get_material_composites(
     return composites
 
 
+@router.get("/material/{material_id}/outliers", response_model=List[AnalysisOutlierScore])
+def get_material_outliers(material_id: int, db: Session = Depends(get_db)):
+    """
+    Outlier scores of the processed analyses of a material, highest first
+    
+    Scores are computed on the fly; the nightly screening records them on
+    the analyses.
+    """
+    try:
+        return OutlierScreener(db).screen_material(material_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/material/{material_id}/version-matrix", response_model=CompositeVersionMatrixResponse)
+def get_version_matrix(material_id: int, db: Session = Depends(get_db)):
+    """Compare all composite versions of a material pairwise, and each with the previous one"""
+    comparator = CompositeComparator(db)
+    
+    try:
+        return comparator.compare_history(material_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/{composite_id}/similar", response_model=CompositeSimilarityResponse)
+def find_similar_composites(
+    composite_id: int,
+    k: int = 10,
+    metric: str = "cosine",
+    db: Session = Depends(get_db)
+):
+    """
+    Materials whose latest approved composite is closest in composition
+    
+    metric is cosine (similarity, highest first) or l1 (distance in
+    percentage points, lowest first). The composite's own material is
+    left out.
+    """
+    if metric not in CompositeSimilarityIndex.METRICS or not 1 <= k <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"metric must be one of {', '.join(CompositeSimilarityIndex.METRICS)} and k between 1 and 100"
+        )
+    
+    try:
+        matches = CompositeSimilarityFinder(db).find_similar(composite_id, k=k, metric=metric)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    return CompositeSimilarityResponse(composite_id=composite_id, metric=metric, matches=matches)
+
+
 @router.get("/{composite_id}/compare/{other_composite_id}", response_model=CompositeCompareResponse)
 def compare_composites(
     composite_id: int,
@@ -134,6 +353,12 @@ def compare_composites(
         )
 
 
+@router.get("/comparison-cache/stats", response_model=ComparisonCacheStats)
+def get_comparison_cache_stats():
+    """Hit and miss counters of the comparison cache of this worker process"""
+    return get_comparison_cache().stats()
+
+
 @router.put("/{composite_id}/submit-for-approval", response_model=CompositeResponse)
 def submit_for_approval(
     composite_id: int,
@@ -204,6 +429,9 @@ def approve_composite(
             detail="Only PENDING_APPROVAL composites can be approved"
         )
     
+    # Taken before the change, so the similarity index is only patched if it was current
+    previous_similarity_version = similarity_version(db)
+    
     # Update composite
     composite.status = CompositeStatus.APPROVED
     composite.approved_at = datetime.now()
@@ -221,6 +449,7 @@ def approve_composite(
     
     db.commit()
     db.refresh(composite)
+    update_similarity_index(db, composite.material_id, previous_similarity_version)
     
     return composite
 
@@ -288,5 +517,7 @@ def delete_composite(composite_id: int, db: Session = Depends(get_db)):
     db.delete(composite)
     db.commit()
     
+    invalidate_composite_comparisons(composite_id)
+    
     return None
 
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.models.reference_compound import ReferenceCompound
+from app.schemas.reference_compound import (
+    ReferenceCompoundCreate,
+    ReferenceCompoundResponse,
+    RetentionIndexIdentifyRequest,
+    RetentionIndexMatch
+)
+from app.services.retention_index import get_reference_library, invalidate_reference_library
+
+router = APIRouter(prefix="/reference-compounds", tags=["reference-compounds"])
+
+
+@router.post("", response_model=List[ReferenceCompoundResponse], status_code=status.HTTP_201_CREATED)
+def create_reference_compounds(
+    compounds: List[ReferenceCompoundCreate],
+    db: Session = Depends(get_db)
+):
+    """Add compounds to the retention index reference library (bulk)"""
+    db_compounds = [ReferenceCompound(**compound.model_dump()) for compound in compounds]
+    db.add_all(db_compounds)
+    db.commit()
+    
+    invalidate_reference_library()
+    
+    for compound in db_compounds:
+        db.refresh(compound)
+    
+    return db_compounds
+
+
+@router.get("", response_model=List[ReferenceCompoundResponse])
+def list_reference_compounds(
+    ri_min: Optional[float] = None,
+    ri_max: Optional[float] = None,
+    column_phase: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """List reference compounds, optionally within a retention index range"""
+    query = db.query(ReferenceCompound)
+    
+    if ri_min is not None:
+        query = query.filter(ReferenceCompound.retention_index >= ri_min)
+    if ri_max is not None:
+        query = query.filter(ReferenceCompound.retention_index <= ri_max)
+    if column_phase:
+        query = query.filter(ReferenceCompound.column_phase == column_phase)
+    
+    return query.order_by(ReferenceCompound.retention_index).offset(skip).limit(limit).all()
+
+
+@router.post("/identify", response_model=List[RetentionIndexMatch])
+def identify_retention_indices(
+    request: RetentionIndexIdentifyRequest,
+    db: Session = Depends(get_db)
+):
+    """Identify peaks by retention index against the reference library"""
+    library = get_reference_library(db, request.column_phase)
+    
+    matches = []
+    for retention_index in request.retention_indices:
+        candidates = library.lookup(retention_index, request.tolerance)
+        matches.append(RetentionIndexMatch(
+            retention_index=retention_index,
+            best_match=candidates[0] if candidates else None,
+            candidates=candidates
+        ))
+    
+    return matches
+
+
+@router.delete("/{compound_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_reference_compound(compound_id: int, db: Session = Depends(get_db)):
+    """Delete a reference compound"""
+    compound = db.query(ReferenceCompound).filter(ReferenceCompound.id == compound_id).first()
+    
+    if not compound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Reference compound {compound_id} not found"
+        )
+    
+    db.delete(compound)
+    db.commit()
+    
+    invalidate_reference_library()
+    
+    return None
+
+
+
+
+
+
+
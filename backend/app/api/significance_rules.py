@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.models.significance_rule import SignificanceRule
+from app.schemas.significance_rule import SignificanceRuleCreate, SignificanceRuleResponse
+from app.services.component_identity import normalize_cas
+from app.services.significance import invalidate_significance_engine
+
+router = APIRouter(prefix="/significance-rules", tags=["significance-rules"])
+
+
+def _get_rule(db: Session, rule_id: int) -> SignificanceRule:
+    rule = db.query(SignificanceRule).filter(SignificanceRule.id == rule_id).first()
+    
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Significance rule {rule_id} not found"
+        )
+    
+    return rule
+
+
+def _rule_data(rule: SignificanceRuleCreate) -> dict:
+    """Rule fields with a normalized CAS number; a rule has a CAS number or a type, not both"""
+    data = rule.model_dump()
+    data['cas_number'] = normalize_cas(data['cas_number']) or None
+    
+    if data['cas_number'] and data['component_type'] is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A rule applies to a CAS number or to a component type, not both"
+        )
+    
+    return data
+
+
+def _check_scope(db: Session, data: dict, seen: set, rule_id: Optional[int] = None):
+    """Reject a second rule for the same CAS number, type or default"""
+    scope = (data['cas_number'], data['component_type'])
+    query = db.query(SignificanceRule.id).filter(
+        SignificanceRule.cas_number.is_(None) if scope[0] is None else SignificanceRule.cas_number == scope[0],
+        SignificanceRule.component_type.is_(None) if scope[1] is None else SignificanceRule.component_type == scope[1]
+    )
+    if rule_id is not None:
+        query = query.filter(SignificanceRule.id != rule_id)
+    
+    if scope in seen or query.first():
+        described = scope[0] or (scope[1].value if scope[1] is not None else "the default")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A significance rule for {described} already exists"
+        )
+    seen.add(scope)
+
+
+@router.post("", response_model=List[SignificanceRuleResponse], status_code=status.HTTP_201_CREATED)
+def create_significance_rules(
+    rules: List[SignificanceRuleCreate],
+    db: Session = Depends(get_db)
+):
+    """Add significance rules (bulk); they apply to comparisons from now on"""
+    seen = set()
+    db_rules = []
+    for rule in rules:
+        data = _rule_data(rule)
+        _check_scope(db, data, seen)
+        db_rules.append(SignificanceRule(**data))
+    
+    db.add_all(db_rules)
+    db.commit()
+    invalidate_significance_engine()
+    
+    for rule in db_rules:
+        db.refresh(rule)
+    
+    return db_rules
+
+
+@router.get("", response_model=List[SignificanceRuleResponse])
+def list_significance_rules(db: Session = Depends(get_db)):
+    """List all significance rules"""
+    return db.query(SignificanceRule).order_by(SignificanceRule.id).all()
+
+
+@router.get("/{rule_id}", response_model=SignificanceRuleResponse)
+def get_significance_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Get a significance rule"""
+    return _get_rule(db, rule_id)
+
+
+@router.put("/{rule_id}", response_model=SignificanceRuleResponse)
+def update_significance_rule(
+    rule_id: int,
+    rule: SignificanceRuleCreate,
+    db: Session = Depends(get_db)
+):
+    """Replace a significance rule"""
+    db_rule = _get_rule(db, rule_id)
+    data = _rule_data(rule)
+    _check_scope(db, data, set(), rule_id=rule_id)
+    
+    for field, value in data.items():
+        setattr(db_rule, field, value)
+    
+    db.commit()
+    invalidate_significance_engine()
+    db.refresh(db_rule)
+    
+    return db_rule
+
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_significance_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Delete a significance rule; its components fall back to the type or default rule"""
+    rule = _get_rule(db, rule_id)
+    
+    db.delete(rule)
+    db.commit()
+    invalidate_significance_engine()
+    
+    return None
@@ -21,8 +21,18 @@ celery_app.conf.update(
     task_soft_time_limit=3000,  # 50 minutes
 )
 
+# Dedicated queue for CSV parsing, so ingestion scales with its own workers:
+#   celery -A app.core.celery_app worker -Q ingestion
+celery_app.conf.task_routes = {
+    "app.tasks.parse_analysis": {"queue": settings.INGESTION_QUEUE},
+}
+
 # Periodic tasks schedule
 celery_app.conf.beat_schedule = {
+    "screen-outliers-nightly": {
+        "task": "app.tasks.screen_outliers",
+        "schedule": crontab(hour=1, minute=30),  # Before the composite review
+    },
     "review-composites-daily": {
         "task": "app.tasks.review_composites",
         "schedule": crontab(hour=2, minute=0),  # Run at 2 AM daily
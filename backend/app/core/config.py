@@ -31,11 +31,22 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    INGESTION_QUEUE: str = "ingestion"  # Celery queue for queued CSV parsing
+    ASYNC_INGESTION: bool = False  # Default for uploads: parse in a worker instead of the request
     
     # File Upload
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     UPLOAD_DIR: str = "../data/uploads"
     
+    # CSV Parsing
+    PARSER_STREAMING_THRESHOLD: int = 52428800  # 50MB, larger files are parsed in chunks
+    PARSER_CHUNK_SIZE: int = 50000  # Rows per chunk in streaming mode
+    PARSER_POOL_WORKERS: int = 0  # Processes for batch parsing, 0 = one per CPU
+    
+    # Retention index identification
+    RI_MATCH_TOLERANCE: float = 10.0  # Max retention index difference for a match
+    RI_COLUMN_PHASE: str = ""  # Reference library column phase, empty = all
+    
     # Email
     SMTP_HOST: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
@@ -52,8 +63,19 @@ class Settings(BaseSettings):
     CRM_API_KEY: str = ""
     
     # Composite Settings
-    COMPOSITE_THRESHOLD_PERCENT: float = 5.0
+    COMPOSITE_THRESHOLD_PERCENT: float = 5.0  # Summed absolute change that makes a comparison significant
+    COMPONENT_CHANGE_TOLERANCE: float = 0.01  # Percentage points a component may move without being reported as changed (see SignificanceRule)
     REVIEW_PERIOD_DAYS: int = 90
+    COMPOSITE_AGGREGATION_BACKEND: str = "sql"  # sql: aggregate in PostgreSQL when available, python: always in Python
+    COMPOSITE_PREVIEW_CACHE_SIZE: int = 256  # Previews kept per process, 0 = no caching
+    COMPOSITE_PREVIEW_CACHE_TTL: int = 300  # Seconds a cached preview stays valid
+    COMPARISON_CACHE_SIZE: int = 4096  # Comparisons kept per process, 0 = no caching
+    COMPARISON_CACHE_DRAFT_TTL: int = 300  # Seconds a comparison involving a non-final composite stays valid
+    COMPARISON_CACHE_BACKEND: str = "memory"  # memory, or redis: also share comparisons through REDIS_URL
+    BOOTSTRAP_RESAMPLES: int = 2000  # Resamples for composite confidence intervals
+    BOOTSTRAP_SEED: int = 42  # Fixed seed, so intervals are reproducible
+    OUTLIER_HANDLING: str = "none"  # Default for flagged analyses: none, exclude or downweight
+    OUTLIER_THRESHOLD: float = 3.5  # Robust z-score above which an analysis is an outlier
     
     class Config:
         env_file = ".env"
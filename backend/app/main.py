@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base
-from app.api import materials, chromatographic_analyses, composites, workflows
+from app.api import materials, chromatographic_analyses, composites, workflows, reference_compounds, component_catalog, significance_rules
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -31,6 +31,9 @@ app.include_router(materials.router, prefix=settings.API_V1_PREFIX)
 app.include_router(chromatographic_analyses.router, prefix=settings.API_V1_PREFIX)
 app.include_router(composites.router, prefix=settings.API_V1_PREFIX)
 app.include_router(workflows.router, prefix=settings.API_V1_PREFIX)
+app.include_router(reference_compounds.router, prefix=settings.API_V1_PREFIX)
+app.include_router(component_catalog.router, prefix=settings.API_V1_PREFIX)
+app.include_router(significance_rules.router, prefix=settings.API_V1_PREFIX)
 
 
 @app.get("/")
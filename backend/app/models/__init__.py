@@ -1,16 +1,31 @@
 from .material import Material
-from .composite import Composite, CompositeComponent
+from .composite import Composite, CompositeComponent, CompositeVersionCounter
 from .chromatographic_analysis import ChromatographicAnalysis
 from .approval_workflow import ApprovalWorkflow
 from .user import User
+from .parse_cache import ParseCacheEntry
+from .reference_compound import ReferenceCompound
+from .component_statistics import ComponentStatistics, ComponentStatisticsSource
+from .analysis_component import AnalysisComponent
+from .component_catalog import ComponentCatalogEntry, ComponentSynonym
+from .significance_rule import SignificanceRule
 
 __all__ = [
     "Material",
     "Composite",
     "CompositeComponent",
+    "CompositeVersionCounter",
     "ChromatographicAnalysis",
     "ApprovalWorkflow",
     "User",
+    "ParseCacheEntry",
+    "ReferenceCompound",
+    "ComponentStatistics",
+    "ComponentStatisticsSource",
+    "AnalysisComponent",
+    "ComponentCatalogEntry",
+    "ComponentSynonym",
+    "SignificanceRule",
 ]
 
 
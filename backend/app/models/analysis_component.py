@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+
+class AnalysisComponent(Base):
+    """
+    One parsed peak of a chromatographic analysis
+    
+    Same data as the components list in ChromatographicAnalysis.parsed_data,
+    one row per peak, so components can be filtered and indexed in SQL
+    (component search, re-keying after catalog changes). Composite
+    aggregation still reads parsed_data and the component statistics.
+    """
+    __tablename__ = "analysis_components"
+    __table_args__ = (
+        Index("ix_analysis_components_material_cas", "material_id", "cas_number"),
+        Index("ix_analysis_components_material_key", "material_id", "component_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey("chromatographic_analyses.id", ondelete="CASCADE"), nullable=False, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Index in parsed_data['components']
+    
+    # Component identity (component_key: catalog entry key, else cas_<cas> or name_<name>;
+    # see ComponentIdentityIndex.component_key)
+    component_key = Column(String(255), nullable=False)
+    component_name = Column(String(255), nullable=False)
+    cas_number = Column(String(50))
+    
+    percentage = Column(Float, nullable=False)
+    component_type = Column(String(20))  # COMPONENT or IMPURITY
+    retention_index = Column(Float)
+    
+    # Relationships
+    analysis = relationship("ChromatographicAnalysis", back_populates="components")
+
+    def __repr__(self):
+        return f"<AnalysisComponent(analysis_id={self.analysis_id}, component_name='{self.component_name}', percentage={self.percentage})>"
+
+
+
+
+
+
+
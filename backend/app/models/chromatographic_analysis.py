@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, JSON, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -14,6 +14,7 @@ class ChromatographicAnalysis(Base):
     # File information
     filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
+    file_hash = Column(String(64), index=True)  # SHA-256 of the file bytes
     
     # Analysis details
     batch_number = Column(String(100))
@@ -31,12 +32,23 @@ class ChromatographicAnalysis(Base):
     # Weight for aggregation (batch size or quantity)
     weight = Column(Float, default=1.0)
     
+    # Last outlier screening against the other analyses of the material
+    outlier_score = Column(Float)  # Robust z-score, None if never screened
+    is_outlier = Column(Boolean, default=False)
+    outlier_screened_at = Column(DateTime(timezone=True))
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     material = relationship("Material", back_populates="chromatographic_analyses")
+    components = relationship(
+        "AnalysisComponent",
+        back_populates="analysis",
+        cascade="all, delete-orphan",
+        order_by="AnalysisComponent.position"
+    )
 
     def __repr__(self):
         return f"<ChromatographicAnalysis(id={self.id}, material_id={self.material_id}, filename='{self.filename}')>"
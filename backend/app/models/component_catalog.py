@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ComponentCatalogEntry(Base):
+    """
+    Canonical identity of a component
+    
+    Components whose CAS number or name is one of the entry's synonyms are
+    aggregated and compared under the entry's component_key.
+    """
+    __tablename__ = "component_catalog"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    cas_number = Column(String(50))
+    component_key = Column(String(255), nullable=False, unique=True)  # cas_<cas> or name_<name> of the entry
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    synonyms = relationship("ComponentSynonym", back_populates="entry", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<ComponentCatalogEntry(id={self.id}, name='{self.name}', cas_number='{self.cas_number}')>"
+
+
+class ComponentSynonym(Base):
+    """CAS number or name resolving to a catalog entry"""
+    __tablename__ = "component_synonyms"
+    __table_args__ = (
+        UniqueConstraint("kind", "value", name="uq_component_synonyms_kind_value"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    catalog_id = Column(Integer, ForeignKey("component_catalog.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(10), nullable=False)  # cas or name
+    value = Column(String(255), nullable=False)  # Stripped CAS number or lowercased, stripped name
+    
+    # Relationships
+    entry = relationship("ComponentCatalogEntry", back_populates="synonyms")
+
+    def __repr__(self):
+        return f"<ComponentSynonym(catalog_id={self.catalog_id}, kind='{self.kind}', value='{self.value}')>"
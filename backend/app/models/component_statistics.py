@@ -0,0 +1,76 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ComponentStatistics(Base):
+    """
+    Running sums of one component over the processed analyses of a material
+    
+    Updated incrementally as analyses are added, reprocessed or deleted, so
+    a composite can be calculated without reading parsed_data.
+    """
+    __tablename__ = "component_statistics"
+    __table_args__ = (
+        UniqueConstraint("material_id", "component_key", name="uq_component_statistics_material_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=False, index=True)
+    component_key = Column(String(255), nullable=False)  # cas_<cas> or name_<name>
+    
+    component_name = Column(String(255), nullable=False)
+    cas_number = Column(String(50))
+    name_analysis_id = Column(Integer)  # Analysis the name was taken from (latest wins)
+    
+    # Sufficient statistics, one observation per reported row
+    observation_count = Column(Integer, nullable=False, default=0)
+    sum_weight = Column(Float, nullable=False, default=0.0)  # Σw
+    sum_weighted_percentage = Column(Float, nullable=False, default=0.0)  # Σw·p
+    sum_percentage = Column(Float, nullable=False, default=0.0)  # Σp
+    sum_squared_percentage = Column(Float, nullable=False, default=0.0)  # Σp²
+    type_counts = Column(JSON, nullable=False)  # {component_type: observations}
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    material = relationship("Material", back_populates="component_statistics")
+
+    def __repr__(self):
+        return f"<ComponentStatistics(material_id={self.material_id}, component_key='{self.component_key}', n={self.observation_count})>"
+
+
+class ComponentStatisticsSource(Base):
+    """
+    Analysis included in the component statistics of its material
+    
+    Makes recording an analysis idempotent and shows which processed
+    analyses still have to be added. There is deliberately no foreign key
+    to the analysis: a source whose analysis is gone means the statistics
+    are stale.
+    """
+    __tablename__ = "component_statistics_sources"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=False, index=True)
+    analysis_id = Column(Integer, nullable=False, unique=True, index=True)
+    weight = Column(Float, nullable=False)  # Weight the analysis was recorded with
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    material = relationship("Material", back_populates="component_statistics_sources")
+
+    def __repr__(self):
+        return f"<ComponentStatisticsSource(material_id={self.material_id}, analysis_id={self.analysis_id})>"
+
+
+
+
+
+
+
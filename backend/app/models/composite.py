@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -30,6 +30,10 @@ class ComponentType(str, enum.Enum):
 class Composite(Base):
     """Composite table describing material composition"""
     __tablename__ = "composites"
+    __table_args__ = (
+        # Versions are allocated through CompositeVersionCounter
+        Index("uq_composites_material_version", "material_id", "version", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     material_id = Column(Integer, ForeignKey("materials.id"), nullable=False)
@@ -57,6 +61,17 @@ class Composite(Base):
         return f"<Composite(id={self.id}, material_id={self.material_id}, version={self.version}, status={self.status})>"
 
 
+class CompositeVersionCounter(Base):
+    """Last composite version allocated per material"""
+    __tablename__ = "composite_version_counters"
+
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True)
+    last_version = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CompositeVersionCounter(material_id={self.material_id}, last_version={self.last_version})>"
+
+
 class CompositeComponent(Base):
     """Individual component in a composite"""
     __tablename__ = "composite_components"
@@ -71,6 +86,8 @@ class CompositeComponent(Base):
     
     # Additional info
     confidence_level = Column(Float)  # 0-100, for LAB origin
+    ci_lower = Column(Float)  # Bootstrap 95% interval of the percentage, for LAB origin
+    ci_upper = Column(Float)
     notes = Column(Text)
     
     # Timestamps
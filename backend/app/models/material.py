@@ -24,6 +24,8 @@ class Material(Base):
     # Relationships
     composites = relationship("Composite", back_populates="material", cascade="all, delete-orphan")
     chromatographic_analyses = relationship("ChromatographicAnalysis", back_populates="material", cascade="all, delete-orphan")
+    component_statistics = relationship("ComponentStatistics", back_populates="material", cascade="all, delete-orphan")
+    component_statistics_sources = relationship("ComponentStatisticsSource", back_populates="material", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Material(id={self.id}, reference_code='{self.reference_code}', name='{self.name}')>"
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ParseCacheEntry(Base):
+    """Parse result cached by file content hash and parser version"""
+    __tablename__ = "parse_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "parser_version", name="uq_parse_cache_hash_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA-256 of the file bytes
+    parser_version = Column(String(20), nullable=False)
+    
+    # Parser output, same structure as ChromatographicAnalysis.parsed_data
+    parsed_data = Column(JSON, nullable=False)
+    file_size = Column(Integer)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ParseCacheEntry(id={self.id}, content_hash='{self.content_hash[:12]}', parser_version='{self.parser_version}')>"
+
+
+
+
+
+
+
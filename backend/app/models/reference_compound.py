@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ReferenceCompound(Base):
+    """Reference compound with a known retention index, for peak identification"""
+    __tablename__ = "reference_compounds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False)
+    cas_number = Column(String(50), index=True)
+    retention_index = Column(Float, nullable=False, index=True)
+    
+    # GC column stationary phase the index was measured on (DB-5, DB-WAX, ...)
+    column_phase = Column(String(50), index=True)
+    source = Column(String(200))  # Literature or in-house library
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ReferenceCompound(id={self.id}, name='{self.name}', retention_index={self.retention_index})>"
+
+
+
+
+
+
+
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Enum
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.composite import ComponentType
+
+
+class SignificanceRule(Base):
+    """
+    Rule deciding when a component change between composites is significant
+    
+    A rule applies to one CAS number (and its catalog synonyms), to every
+    component of a type, or to all components when both are empty. The most
+    specific rule of a component wins: CAS, then type, then the default.
+    """
+    __tablename__ = "significance_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cas_number = Column(String(50), index=True)
+    component_type = Column(Enum(ComponentType))
+    
+    # Thresholds, None = not checked (min_change: COMPONENT_CHANGE_TOLERANCE)
+    min_change = Column(Float)  # Percentage points a component may move without being reported as changed
+    absolute_threshold = Column(Float)  # Change in percentage points that is significant
+    relative_threshold = Column(Float)  # Change in percent of the old percentage that is significant
+    max_percentage = Column(Float)  # Restricted substance: exceeding this percentage is significant
+    
+    description = Column(String(255))
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SignificanceRule(id={self.id}, cas_number='{self.cas_number}', component_type={self.component_type})>"
@@ -1,6 +1,7 @@
-from .csv_parser import ChromatographicCSVParser
+from .csv_parser import ChromatographicCSVParser, parse_csv_content
+from .raw_trace_parser import RawTraceParser, retention_indices_from_alkanes
 
-__all__ = ["ChromatographicCSVParser"]
+__all__ = ["ChromatographicCSVParser", "RawTraceParser", "parse_csv_content", "retention_indices_from_alkanes"]
 
 
 
@@ -1,28 +1,136 @@
 import pandas as pd
+import numpy as np
 import re
-from typing import List, Dict, Any, Optional
+import io
+import csv
+import codecs
+from typing import List, Dict, Any, Optional, Tuple, Union, BinaryIO
 from pathlib import Path
 
+from app.core.config import settings
+
+# A CSV source is either a path on disk or the raw file bytes
+CSVSource = Union[str, bytes]
+
+
+def parse_csv_content(content: bytes, reference_library=None, identity_index=None) -> Dict[str, Any]:
+    """
+    Parse CSV bytes with a new parser for their format (see ChromatographicCSVParser.for_content)
+    
+    Module-level so it can be sent to a process pool.
+    """
+    return ChromatographicCSVParser.for_content(
+        content,
+        reference_library=reference_library,
+        identity_index=identity_index
+    ).parse_buffer(content)
+
+
+# Parsing context of a pool worker process, set once by init_parse_worker
+_worker_context: Dict[str, Any] = {}
+
+
+def init_parse_worker(context: Dict[str, Any]):
+    """
+    Process pool initializer: keep the parsing context for the worker's lifetime
+    
+    The context (keyword arguments of parse_csv_content) is pickled once
+    per worker instead of with every file sent to parse_csv_in_worker.
+    """
+    _worker_context.clear()
+    _worker_context.update(context)
+
+
+def parse_csv_in_worker(content: bytes) -> Dict[str, Any]:
+    """Parse CSV bytes in a pool worker started with init_parse_worker"""
+    return parse_csv_content(content, **_worker_context)
+
 
 class ChromatographicCSVParser:
     """Parser for chromatographic analysis CSV files"""
     
+    # Bump when parsing rules change, for peak tables or raw traces, so cached
+    # parse results are not reused
+    PARSER_VERSION = "1.2"
+    
     # Common column name variations
     CAS_COLUMNS = ['cas', 'cas_number', 'cas number', 'cas no', 'cas_no', 'casnumber']
     COMPONENT_COLUMNS = ['component', 'compound', 'name', 'component_name', 'substance', 'chemical']
     PERCENTAGE_COLUMNS = ['percentage', '%', 'percent', 'concentration', 'amount', 'area%', 'area_percent']
+    RETENTION_INDEX_COLUMNS = ['ri', 'retention index', 'retention_index', 'kovats', 'lri']
+    
+    # CAS number pattern: XXX-XX-X or XXXX-XX-X, etc.
+    CAS_SEARCH_PATTERN = r'(\d{2,7}-\d{2}-\d)'
+    
+    # Format detection
+    SNIFF_SAMPLE_SIZE = 65536  # Bytes read to detect encoding and dialect
+    SNIFF_DELIMITERS = ',;\t|'
+    FALLBACK_ENCODING = 'latin1'  # Decodes any byte sequence
     
     # Thresholds
     IMPURITY_THRESHOLD = 1.0  # Components < 1% considered impurities by default
     
-    def __init__(self):
+    def __init__(self, reference_library=None, identity_index=None):
+        """
+        Args:
+            reference_library: Optional RetentionIndexLibrary used to fill in
+                the CAS number and name of components that have a retention index
+            identity_index: Optional ComponentIdentityIndex used to fill in
+                the CAS number of components named after a catalog synonym
+        """
         self.data = None
         self.parsed_components = []
+        self.file_format = None
+        self.reference_library = reference_library
+        self.identity_index = identity_index
+    
+    @classmethod
+    def for_content(cls, content: bytes, **kwargs) -> 'ChromatographicCSVParser':
+        """
+        New parser for some file content, chosen from its header
+        
+        Files whose header columns a subclass handles (raw traces with time
+        and intensity columns, see RawTraceParser) get that subclass; any
+        other file is parsed as a peak table.
+        
+        Args:
+            content: File content
+            **kwargs: Parser arguments (reference_library, identity_index)
+            
+        Returns:
+            Parser instance
+        """
+        columns = cls.header_columns(content[:cls.SNIFF_SAMPLE_SIZE])
+        
+        for parser_class in cls.__subclasses__():
+            if parser_class.handles_columns(columns):
+                return parser_class(**kwargs)
+        
+        return cls(**kwargs)
+    
+    @classmethod
+    def header_columns(cls, sample: bytes) -> List[str]:
+        """Lowercase column names from the first line of a file sample"""
+        file_format = cls.sniff_format(sample)
+        lines = sample.decode(file_format['encoding'], errors='replace').lstrip('\ufeff').splitlines()
+        if not lines:
+            return []
+        
+        header = next(csv.reader(lines[:1], delimiter=file_format['delimiter'], quotechar=file_format['quotechar']), [])
+        return [col.lower().strip() for col in header]
+    
+    @classmethod
+    def handles_columns(cls, columns: List[str]) -> bool:
+        """Whether files with these header columns are for this subclass (see for_content)"""
+        return False
     
     def parse_file(self, file_path: str) -> Dict[str, Any]:
         """
         Parse a chromatographic CSV file
         
+        Files larger than PARSER_STREAMING_THRESHOLD are parsed in chunks
+        (see parse_file_streaming) to keep memory bounded.
+        
         Args:
             file_path: Path to the CSV file
             
@@ -30,66 +138,262 @@ class ChromatographicCSVParser:
             Dictionary with parsed data and metadata
         """
         try:
-            # Try different encodings
-            for encoding in ['utf-8', 'latin1', 'iso-8859-1']:
-                try:
-                    self.data = pd.read_csv(file_path, encoding=encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            size = Path(file_path).stat().st_size
+        except OSError as e:
+            return self._error_result(str(e))
+        
+        return self._parse_source(str(file_path), size)
+    
+    def parse_buffer(self, data: Union[bytes, bytearray, BinaryIO]) -> Dict[str, Any]:
+        """
+        Parse chromatographic CSV content that is already in memory
+        
+        Same rules as parse_file, without writing the content to disk
+        first (e.g. an uploaded file).
+        
+        Args:
+            data: File content as bytes or a binary file-like object
+            
+        Returns:
+            Dictionary with parsed data and metadata
+        """
+        if not isinstance(data, (bytes, bytearray)):
+            data = data.read()
+        data = bytes(data)
+        
+        return self._parse_source(data, len(data))
+    
+    def _parse_source(self, source: CSVSource, size: int) -> Dict[str, Any]:
+        """Parse a path or bytes source, streaming it when it is large"""
+        if size > settings.PARSER_STREAMING_THRESHOLD:
+            return self._parse_streaming(source)
+        
+        try:
+            self.file_format = self.sniff_format(self._read_sample(source))
             
-            if self.data is None:
-                raise ValueError("Could not read CSV file with any common encoding")
+            try:
+                self.data = pd.read_csv(self._open(source), **self._read_options())
+            except UnicodeDecodeError:
+                # The sample looked like UTF-8 but a later byte is not
+                self.file_format['encoding'] = self.FALLBACK_ENCODING
+                self.data = pd.read_csv(self._open(source), **self._read_options())
             
             # Normalize column names
             self.data.columns = [col.lower().strip() for col in self.data.columns]
             
-            # Identify columns
-            cas_col = self._find_column(self.CAS_COLUMNS)
-            component_col = self._find_column(self.COMPONENT_COLUMNS)
-            percentage_col = self._find_column(self.PERCENTAGE_COLUMNS)
-            
-            if not component_col or not percentage_col:
-                raise ValueError("Could not identify required columns (component and percentage)")
+            # Parse components (whole-column pass)
+            self.parsed_components, total_percentage = self._parse_components(
+                *self._identify_columns()
+            )
             
-            # Parse components
-            self.parsed_components = []
-            total_percentage = 0.0
+            return self._build_result(total_percentage, parse_mode='in_memory')
             
-            for _, row in self.data.iterrows():
-                component = self._parse_component(row, cas_col, component_col, percentage_col)
-                if component:
-                    self.parsed_components.append(component)
-                    total_percentage += component['percentage']
+        except Exception as e:
+            return self._error_result(str(e))
+    
+    def parse_file_streaming(self, file_path: str, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Parse a chromatographic CSV file in fixed-size chunks
+        
+        Only one chunk of the file is held in memory at a time; the parsed
+        components are kept, one per row as in parse_file, so the result
+        does not depend on the parsing mode. Validation and normalization
+        are the same as for parse_file.
+        
+        Args:
+            file_path: Path to the CSV file
+            chunk_size: Rows per chunk (defaults to PARSER_CHUNK_SIZE)
             
-            # Validate total percentage
-            validation_errors = []
-            if not (95.0 <= total_percentage <= 105.0):
-                validation_errors.append(f"Total percentage {total_percentage:.2f}% is outside valid range (95-105%)")
+        Returns:
+            Dictionary with parsed data and metadata
+        """
+        return self._parse_streaming(str(file_path), chunk_size)
+    
+    def _parse_streaming(self, source: CSVSource, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Chunked parsing of a path or bytes source"""
+        chunk_size = chunk_size or settings.PARSER_CHUNK_SIZE
+        
+        try:
+            self.file_format = self.sniff_format(self._read_sample(source))
             
-            # Normalize to 100% if close enough
-            if 98.0 <= total_percentage <= 102.0:
-                normalization_factor = 100.0 / total_percentage
-                for component in self.parsed_components:
-                    component['percentage'] *= normalization_factor
-                total_percentage = 100.0
+            try:
+                self.parsed_components, total_percentage = self._stream_components(source, chunk_size)
+            except UnicodeDecodeError:
+                # The sample looked like UTF-8 but a later byte is not
+                self.file_format['encoding'] = self.FALLBACK_ENCODING
+                self.parsed_components, total_percentage = self._stream_components(source, chunk_size)
             
-            return {
-                'components': self.parsed_components,
-                'total_percentage': total_percentage,
-                'component_count': len(self.parsed_components),
-                'validation_errors': validation_errors,
-                'success': len(validation_errors) == 0
-            }
+            return self._build_result(total_percentage, parse_mode='streaming')
             
         except Exception as e:
-            return {
-                'components': [],
-                'total_percentage': 0.0,
-                'component_count': 0,
-                'validation_errors': [str(e)],
-                'success': False
+            return self._error_result(str(e))
+    
+    def _stream_components(self, source: CSVSource, chunk_size: int) -> Tuple[List[Dict[str, Any]], float]:
+        """Read the file chunk by chunk, collecting the components of every chunk"""
+        parsed = []
+        total_percentage = 0.0
+        columns = None
+        
+        with pd.read_csv(self._open(source), chunksize=chunk_size, **self._read_options()) as reader:
+            for chunk in reader:
+                chunk.columns = [col.lower().strip() for col in chunk.columns]
+                self.data = chunk
+                
+                if columns is None:
+                    columns = self._identify_columns()
+                
+                components, chunk_total = self._parse_components(*columns)
+                total_percentage += chunk_total
+                parsed.extend(components)
+        
+        if columns is None:
+            raise ValueError("CSV file contains no data rows")
+        
+        return parsed, total_percentage
+    
+    def _read_sample(self, source: CSVSource) -> bytes:
+        """Read the leading bytes used for format detection"""
+        if isinstance(source, bytes):
+            return source[:self.SNIFF_SAMPLE_SIZE]
+        with open(source, 'rb') as f:
+            return f.read(self.SNIFF_SAMPLE_SIZE)
+    
+    @staticmethod
+    def _open(source: CSVSource) -> Union[str, io.BytesIO]:
+        """Something pd.read_csv can read from"""
+        if isinstance(source, bytes):
+            return io.BytesIO(source)
+        return source
+    
+    @classmethod
+    def sniff_format(cls, sample: bytes) -> Dict[str, Any]:
+        """
+        Detect encoding and CSV dialect from a byte sample
+        
+        Checks for a BOM first, then whether the sample is valid UTF-8,
+        falling back to latin1. The delimiter is sniffed among , ; tab and |.
+        Files using ; as delimiter with digits around commas are read with
+        decimal commas (Spanish lab exports).
+        
+        Args:
+            sample: Leading bytes of the file
+            
+        Returns:
+            Dictionary with encoding, delimiter, decimal and quotechar
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            encoding = 'utf-8-sig'
+        elif sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            encoding = 'utf-16'
+        else:
+            encoding = 'utf-8'
+        
+        complete = len(sample) < cls.SNIFF_SAMPLE_SIZE
+        try:
+            # Incremental decoder tolerates a multi-byte character cut at the end of the sample
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=complete)
+        except UnicodeDecodeError:
+            encoding = cls.FALLBACK_ENCODING
+            text = sample.decode(encoding)
+        
+        lines = text.lstrip('\ufeff').splitlines()
+        if not complete and len(lines) > 1:
+            lines = lines[:-1]  # Last line may be cut
+        head = '\n'.join(lines[:50])
+        
+        delimiter = ','
+        quotechar = '"'
+        try:
+            dialect = csv.Sniffer().sniff(head, delimiters=cls.SNIFF_DELIMITERS)
+            delimiter = dialect.delimiter
+            quotechar = dialect.quotechar or '"'
+        except csv.Error:
+            pass
+        
+        decimal = '.'
+        if delimiter != ',' and re.search(r'\d,\d', head):
+            decimal = ','
+        
+        return {
+            'encoding': encoding,
+            'delimiter': delimiter,
+            'decimal': decimal,
+            'quotechar': quotechar
+        }
+    
+    def _read_options(self) -> Dict[str, Any]:
+        """pd.read_csv keyword arguments for the detected format"""
+        return {
+            'encoding': self.file_format['encoding'],
+            'sep': self.file_format['delimiter'],
+            'decimal': self.file_format['decimal'],
+            'quotechar': self.file_format['quotechar']
+        }
+    
+    def _identify_columns(self) -> Tuple[Optional[str], str, str, Optional[str]]:
+        """Identify the CAS, component, percentage and retention index columns"""
+        cas_col = self._find_column(self.CAS_COLUMNS)
+        component_col = self._find_column(self.COMPONENT_COLUMNS)
+        percentage_col = self._find_column(self.PERCENTAGE_COLUMNS)
+        retention_index_col = self._find_column(self.RETENTION_INDEX_COLUMNS)
+        
+        if not component_col or not percentage_col:
+            raise ValueError("Could not identify required columns (component and percentage)")
+        
+        return cas_col, component_col, percentage_col, retention_index_col
+    
+    def _build_result(self, total_percentage: float, parse_mode: str) -> Dict[str, Any]:
+        """Identify, validate and normalize self.parsed_components and build the result"""
+        identified_count = 0
+        if self.reference_library is not None:
+            identified_count = self.reference_library.identify_components(self.parsed_components)
+        if self.identity_index is not None:
+            identified_count += self.identity_index.identify_components(self.parsed_components)
+        
+        # Validate total percentage
+        validation_errors = []
+        if not (95.0 <= total_percentage <= 105.0):
+            validation_errors.append(f"Total percentage {total_percentage:.2f}% is outside valid range (95-105%)")
+        
+        # Normalize to 100% if close enough
+        if 98.0 <= total_percentage <= 102.0:
+            normalization_factor = 100.0 / total_percentage
+            for component in self.parsed_components:
+                component['percentage'] *= normalization_factor
+            total_percentage = 100.0
+        
+        result = {
+            'components': self.parsed_components,
+            'total_percentage': total_percentage,
+            'component_count': len(self.parsed_components),
+            'validation_errors': validation_errors,
+            'success': len(validation_errors) == 0,
+            'parse_mode': parse_mode
+        }
+        
+        if self.reference_library is not None or self.identity_index is not None:
+            result['identified_count'] = identified_count
+        
+        if self.file_format:
+            result['encoding'] = self.file_format['encoding']
+            result['dialect'] = {
+                'delimiter': self.file_format['delimiter'],
+                'decimal': self.file_format['decimal'],
+                'quotechar': self.file_format['quotechar']
             }
+        
+        return result
+    
+    @staticmethod
+    def _error_result(message: str) -> Dict[str, Any]:
+        """Result returned when the file cannot be parsed"""
+        return {
+            'components': [],
+            'total_percentage': 0.0,
+            'component_count': 0,
+            'validation_errors': [message],
+            'success': False
+        }
     
     def _find_column(self, possible_names: List[str]) -> Optional[str]:
         """Find a column by trying multiple possible names"""
@@ -98,63 +402,124 @@ class ChromatographicCSVParser:
                 return col_name
         return None
     
-    def _parse_component(
-        self, 
-        row: pd.Series, 
-        cas_col: Optional[str], 
-        component_col: str, 
-        percentage_col: str
-    ) -> Optional[Dict[str, Any]]:
-        """Parse a single component from a row"""
-        try:
-            # Get component name
-            component_name = str(row[component_col]).strip()
-            if pd.isna(row[component_col]) or component_name in ['', 'nan', 'None']:
-                return None
-            
-            # Get percentage
-            percentage_str = str(row[percentage_col]).strip()
-            # Remove % sign if present
-            percentage_str = percentage_str.replace('%', '').strip()
-            percentage = float(percentage_str)
-            
-            if percentage <= 0:
-                return None
-            
-            # Get CAS number if available
-            cas_number = None
-            if cas_col and not pd.isna(row[cas_col]):
-                cas_number = self._clean_cas_number(str(row[cas_col]))
-            
-            # Determine component type
-            component_type = 'IMPURITY' if percentage < self.IMPURITY_THRESHOLD else 'COMPONENT'
-            
-            return {
+    def _parse_components(
+        self,
+        cas_col: Optional[str],
+        component_col: str,
+        percentage_col: str,
+        retention_index_col: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Parse all components column-wise instead of row by row
+        
+        Produces exactly the same components as the former row-by-row parsing
+        (see scripts/benchmark_csv_parser.py), but does the cleaning,
+        filtering, CAS extraction and type classification once per column.
+        
+        With a retention index column, each component gets a retention_index
+        and rows without a name are kept (flagged unidentified) so they can
+        be identified against the reference library.
+        
+        Returns:
+            Tuple of (components, total percentage)
+        """
+        names_raw = self.data[component_col]
+        names = names_raw.astype(str).str.strip()
+        valid = names_raw.notna().to_numpy() & ~names.isin(['', 'nan', 'None']).to_numpy()
+        
+        unnamed = None
+        if retention_index_col:
+            retention_indices, has_index = self._parse_numbers(self.data[retention_index_col])
+            has_index &= np.isfinite(retention_indices)
+            unnamed = ~valid & has_index
+            valid |= unnamed
+        
+        percentages, parsed = self._parse_numbers(self.data[percentage_col])
+        valid &= parsed
+        # NaN compares False, so NaN percentages are kept like the row parser does
+        valid &= ~(percentages <= 0)
+        
+        percentages = percentages[valid]
+        names = names[valid]
+        
+        if cas_col:
+            cas_raw = self.data[cas_col][valid]
+            cas_numbers = cas_raw.astype(str).str.strip().str.extract(
+                self.CAS_SEARCH_PATTERN, expand=False
+            )
+            cas_numbers = cas_numbers.where(cas_raw.notna() & cas_numbers.notna(), None)
+            cas_list = cas_numbers.tolist()
+        else:
+            cas_list = [None] * len(percentages)
+        
+        component_types = np.where(
+            percentages < self.IMPURITY_THRESHOLD, 'IMPURITY', 'COMPONENT'
+        ).tolist()
+        
+        components = [
+            {
                 'cas_number': cas_number,
-                'component_name': component_name,
+                'component_name': name,
                 'percentage': percentage,
                 'component_type': component_type
             }
-            
-        except (ValueError, KeyError) as e:
-            return None
+            for cas_number, name, percentage, component_type in zip(
+                cas_list, names.tolist(), percentages.tolist(), component_types
+            )
+        ]
+        
+        if retention_index_col:
+            for component, retention_index, has, missing_name in zip(
+                components,
+                retention_indices[valid].tolist(),
+                has_index[valid].tolist(),
+                unnamed[valid].tolist()
+            ):
+                component['retention_index'] = retention_index if has else None
+                if missing_name:
+                    component['component_name'] = f"Unknown RI {retention_index:.0f}"
+                    component['unidentified'] = True
+        
+        # cumsum adds left to right, matching the row-by-row running total bit for bit
+        total_percentage = float(np.cumsum(percentages)[-1]) if len(percentages) else 0.0
+        
+        return components, total_percentage
     
-    def _clean_cas_number(self, cas: str) -> Optional[str]:
-        """Clean and validate CAS number"""
-        # Remove whitespace
-        cas = cas.strip()
+    def _parse_numbers(self, column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert a numeric column (percentages, retention indices) to floats
+        
+        Returns:
+            Tuple of (float values, mask of values that could be parsed)
+        """
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            values = column.to_numpy(dtype=np.float64)
+            return values, np.ones(len(values), dtype=bool)
+        
+        strings = column.astype(str).str.strip().str.replace('%', '', regex=False).str.strip()
+        if self.file_format and self.file_format['decimal'] != '.':
+            strings = strings.str.replace(self.file_format['decimal'], '.', regex=False)
+        strings = strings.to_numpy(dtype=object)
+        values = np.full(len(strings), np.nan)
+        parsed = np.zeros(len(strings), dtype=bool)
         
-        # CAS number pattern: XXX-XX-X or XXXX-XX-X, etc.
-        pattern = r'^\d{2,7}-\d{2}-\d$'
-        if re.match(pattern, cas):
-            return cas
+        # Fast path for the clean rows; float() keeps Python's exact parsing
+        numeric = pd.to_numeric(pd.Series(strings), errors='coerce').notna().to_numpy()
+        try:
+            values[numeric] = strings[numeric].astype(np.float64)
+            parsed[numeric] = True
+        except ValueError:
+            numeric[:] = False
         
-        # Try to extract CAS pattern from string
-        match = re.search(r'(\d{2,7}-\d{2}-\d)', cas)
-        if match:
-            return match.group(1)
+        # Whatever is left (blank cells, 'nan', odd spellings) goes through float() one by one
+        for i in np.flatnonzero(~numeric):
+            try:
+                values[i] = float(strings[i])
+                parsed[i] = True
+            except ValueError:
+                pass
         
-        return None
+        return values, parsed
     
     @staticmethod
     def validate_csv_structure(file_path: str) -> Dict[str, Any]:
@@ -165,7 +530,9 @@ class ChromatographicCSVParser:
             Dictionary with validation results
         """
         try:
-            df = pd.read_csv(file_path, nrows=5)
+            parser = ChromatographicCSVParser()
+            parser.file_format = parser.sniff_format(parser._read_sample(file_path))
+            df = pd.read_csv(file_path, nrows=5, **parser._read_options())
             columns = [col.lower().strip() for col in df.columns]
             
             has_component = any(
@@ -0,0 +1,318 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+from .csv_parser import ChromatographicCSVParser, CSVSource
+
+
+def retention_indices_from_alkanes(retention_times: np.ndarray, alkane_retention_times: Dict[int, float]) -> np.ndarray:
+    """
+    Linear (van den Dool and Kratz) retention indices from an n-alkane ladder
+    
+    Args:
+        retention_times: Retention times of the peaks
+        alkane_retention_times: Carbon number -> retention time of the n-alkane
+    
+    Returns:
+        Retention indices, NaN outside the ladder
+    """
+    carbons = np.array(sorted(alkane_retention_times), dtype=np.float64)
+    times = np.array([alkane_retention_times[int(c)] for c in carbons], dtype=np.float64)
+    retention_times = np.asarray(retention_times, dtype=np.float64)
+    
+    if len(carbons) < 2:
+        return np.full(len(retention_times), np.nan)
+    
+    indices = np.interp(retention_times, times, carbons * 100.0)
+    outside = (retention_times < times[0]) | (retention_times > times[-1])
+    indices[outside] = np.nan
+    return indices
+
+
+class RawTraceParser(ChromatographicCSVParser):
+    """
+    Parser for raw chromatogram traces (retention time, intensity)
+    
+    Integrates the trace itself instead of relying on vendor software:
+    smoothing, baseline correction, peak detection and area integration
+    are all done with whole-array NumPy operations. The result has the
+    same structure as ChromatographicCSVParser (area percent per peak),
+    with retention_time and area added to each component.
+    
+    Given the retention times of an n-alkane ladder, peaks also get a
+    retention index and can be identified against a reference library.
+    
+    Ingestion picks this parser for files with time and intensity columns
+    and no component column (see ChromatographicCSVParser.for_content).
+    """
+    
+    # Common column name variations
+    TIME_COLUMNS = ['time', 'rt', 'retention time', 'retention_time', 'minutes', 'min', 'time (min)']
+    INTENSITY_COLUMNS = ['intensity', 'signal', 'abundance', 'response', 'counts', 'tic', 'area']
+    
+    # Processing parameters
+    SMOOTHING_POINTS = 5  # Moving average width
+    BASELINE_WINDOW = 1.0  # Time units per baseline block (minutes)
+    NOISE_FACTOR = 5.0  # Detection threshold in noise standard deviations
+    MIN_PEAK_POINTS = 3  # Points above threshold for a peak
+    MIN_AREA_PERCENT = 0.01  # Peaks below this area% are not reported
+    
+    def __init__(
+        self,
+        reference_library=None,
+        alkane_retention_times: Optional[Dict[int, float]] = None,
+        identity_index=None
+    ):
+        """
+        Args:
+            reference_library: Optional RetentionIndexLibrary for peak identification
+            alkane_retention_times: Carbon number -> retention time of the n-alkanes
+            identity_index: Optional ComponentIdentityIndex for catalog synonyms
+        """
+        super().__init__(reference_library=reference_library, identity_index=identity_index)
+        self.alkane_retention_times = alkane_retention_times
+    
+    @classmethod
+    def handles_columns(cls, columns: List[str]) -> bool:
+        """Traces have time and intensity columns and no component names"""
+        return (
+            any(col in cls.TIME_COLUMNS for col in columns)
+            and any(col in cls.INTENSITY_COLUMNS for col in columns)
+            and not any(col in cls.COMPONENT_COLUMNS for col in columns)
+        )
+    
+    def _parse_source(self, source: CSVSource, size: int) -> Dict[str, Any]:
+        """Read a trace from a path or bytes source and integrate it"""
+        try:
+            self.file_format = self.sniff_format(self._read_sample(source))
+            
+            try:
+                self.data = pd.read_csv(self._open(source), **self._read_options())
+            except UnicodeDecodeError:
+                # The sample looked like UTF-8 but a later byte is not
+                self.file_format['encoding'] = self.FALLBACK_ENCODING
+                self.data = pd.read_csv(self._open(source), **self._read_options())
+            
+            self.data.columns = [str(col).lower().strip() for col in self.data.columns]
+            
+            time_col = self._find_column(self.TIME_COLUMNS)
+            intensity_col = self._find_column(self.INTENSITY_COLUMNS)
+            
+            if not time_col or not intensity_col:
+                raise ValueError("Could not identify required columns (time and intensity)")
+            
+            times = pd.to_numeric(self.data[time_col], errors='coerce').to_numpy(dtype=np.float64)
+            intensities = pd.to_numeric(self.data[intensity_col], errors='coerce').to_numpy(dtype=np.float64)
+            
+            # The columns are copied out, the frame is no longer needed
+            self.data = None
+            
+            return self._integrate(times, intensities)
+        
+        except Exception as e:
+            return self._error_result(str(e))
+    
+    def _parse_streaming(self, source: CSVSource, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Baseline and peaks need the whole trace, so traces are always read in one go"""
+        return self._parse_source(source, 0)
+    
+    def parse_arrays(self, times: np.ndarray, intensities: np.ndarray) -> Dict[str, Any]:
+        """
+        Integrate a trace that is already in memory
+        
+        Args:
+            times: Retention times
+            intensities: Detector intensities
+        
+        Returns:
+            Dictionary with parsed data and metadata
+        """
+        self.file_format = None
+        
+        try:
+            return self._integrate(
+                np.asarray(times, dtype=np.float64),
+                np.asarray(intensities, dtype=np.float64)
+            )
+        except Exception as e:
+            return self._error_result(str(e))
+    
+    def _integrate(self, times: np.ndarray, intensities: np.ndarray) -> Dict[str, Any]:
+        """Smooth, baseline-correct, detect and integrate peaks"""
+        finite = np.isfinite(times) & np.isfinite(intensities)
+        times = times[finite]
+        intensities = intensities[finite]
+        
+        if len(times) < max(self.SMOOTHING_POINTS, self.MIN_PEAK_POINTS) + 2:
+            raise ValueError("Trace has too few points to integrate")
+        
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            intensities = intensities[order]
+        
+        signal = self._smooth(intensities)
+        signal = signal - self._baseline(times, signal)
+        
+        # Robust noise estimate: most of a chromatogram is baseline
+        floor = np.median(signal)
+        signal -= floor
+        noise = 1.4826 * np.median(np.abs(signal))
+        if noise <= 0:
+            noise = np.finfo(np.float64).eps
+        
+        starts, ends = self._detect_peaks(signal, noise)
+        apexes = self._apex_indices(signal, starts, ends)
+        areas = self._peak_areas(times, signal, starts, ends)
+        
+        keep = areas > 0
+        starts, ends, apexes, areas = starts[keep], ends[keep], apexes[keep], areas[keep]
+        
+        total_area = areas.sum()
+        percentages = areas / total_area * 100.0 if total_area > 0 else areas
+        
+        reported = percentages >= self.MIN_AREA_PERCENT
+        retention_times = times[apexes[reported]]
+        areas = areas[reported]
+        percentages = percentages[reported]
+        
+        component_types = np.where(
+            percentages < self.IMPURITY_THRESHOLD, 'IMPURITY', 'COMPONENT'
+        ).tolist()
+        
+        if self.alkane_retention_times:
+            retention_indices = retention_indices_from_alkanes(retention_times, self.alkane_retention_times)
+            retention_indices = [None if np.isnan(ri) else ri for ri in retention_indices.tolist()]
+        else:
+            retention_indices = [None] * len(retention_times)
+        
+        self.parsed_components = [
+            {
+                'cas_number': None,
+                'component_name': f"Peak RT {retention_time:.3f}",
+                'percentage': percentage,
+                'component_type': component_type,
+                'retention_time': retention_time,
+                'retention_index': retention_index,
+                'area': area,
+                'unidentified': True
+            }
+            for retention_time, retention_index, percentage, area, component_type in zip(
+                retention_times.tolist(), retention_indices, percentages.tolist(), areas.tolist(), component_types
+            )
+        ]
+        
+        result = self._build_result(float(percentages.sum()), parse_mode='raw_trace')
+        result['point_count'] = int(len(times))
+        result['noise_level'] = float(noise)
+        
+        return result
+    
+    def _smooth(self, values: np.ndarray) -> np.ndarray:
+        """Centered moving average, computed from a cumulative sum"""
+        width = self.SMOOTHING_POINTS
+        if width <= 1:
+            return values.copy()
+        
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        averaged = (cumulative[width:] - cumulative[:-width]) / width
+        
+        # Edges keep the raw values
+        left = width // 2
+        right = width - 1 - left
+        return np.concatenate((values[:left], averaged, values[len(values) - right:]))
+    
+    def _baseline(self, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        Baseline from the minimum of fixed-width blocks, interpolated
+        
+        Blocks span BASELINE_WINDOW time units, so peaks narrower than the
+        window do not lift the baseline.
+        """
+        n = len(values)
+        spacing = (times[-1] - times[0]) / (n - 1)
+        block = int(self.BASELINE_WINDOW / spacing) if spacing > 0 else n
+        block = min(max(block, 1), n)
+        
+        block_starts = np.arange(0, n, block)
+        block_minima = np.minimum.reduceat(values, block_starts)
+        block_centers = times[np.minimum(block_starts + block // 2, n - 1)]
+        
+        if len(block_starts) == 1:
+            return np.full(n, block_minima[0])
+        
+        return np.interp(times, block_centers, block_minima)
+    
+    def _detect_peaks(self, signal: np.ndarray, noise: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find peak regions
+        
+        A peak is a run of at least MIN_PEAK_POINTS above NOISE_FACTOR times
+        the noise, widened to where the signal falls back to the noise level.
+        Runs not separated by a return to the noise level (co-eluting
+        peaks) end up as one region.
+        
+        Returns:
+            Tuple of (start indices, end indices exclusive)
+        """
+        above = signal > self.NOISE_FACTOR * noise
+        edges = np.diff(above.astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        
+        core = (ends - starts) >= self.MIN_PEAK_POINTS
+        starts, ends = starts[core], ends[core]
+        
+        if len(starts) == 0:
+            return starts, ends
+        
+        # Extend each region to the surrounding points at noise level
+        quiet = np.flatnonzero(signal <= noise)
+        if len(quiet):
+            before = np.searchsorted(quiet, starts) - 1
+            after = np.searchsorted(quiet, ends)
+            starts = np.where(before >= 0, quiet[np.maximum(before, 0)], 0)
+            ends = np.where(after < len(quiet), quiet[np.minimum(after, len(quiet) - 1)] + 1, len(signal))
+        else:
+            starts = np.zeros(1, dtype=np.int64)
+            ends = np.full(1, len(signal))
+        
+        starts, first = np.unique(starts, return_index=True)
+        return starts, ends[first]
+    
+    @staticmethod
+    def _apex_indices(signal: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Index of the maximum of each region"""
+        if len(starts) == 0:
+            return starts
+        
+        lengths = ends - starts
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        
+        # Indices of all points inside a region, region by region
+        region = np.repeat(np.arange(len(starts)), lengths)
+        indices = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+        values = signal[indices]
+        
+        maxima = np.maximum.reduceat(values, offsets)
+        at_max = np.flatnonzero(values == maxima[region])
+        _, first = np.unique(region[at_max], return_index=True)
+        
+        return indices[at_max[first]]
+    
+    @staticmethod
+    def _peak_areas(times: np.ndarray, signal: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Trapezoidal area of each region from a cumulative integral"""
+        if len(starts) == 0:
+            return np.zeros(0)
+        
+        steps = (signal[1:] + signal[:-1]) * 0.5 * np.diff(times)
+        cumulative = np.concatenate(([0.0], np.cumsum(steps)))
+        
+        return cumulative[ends - 1] - cumulative[starts]
+
+
+
+
+
+
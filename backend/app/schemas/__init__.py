@@ -4,11 +4,50 @@ from .composite import (
     CompositeResponse,
     CompositeComponentResponse,
     CompositeCalculateRequest,
-    CompositeCompareResponse
+    CompositeCompareResponse,
+    CompositeVersionSummary,
+    CompositeVersionMatrixResponse,
+    ComparisonCacheStats,
+    CompositeDriftEntry,
+    CompositeDriftResponse,
+    CompositeSimilarityMatch,
+    CompositeSimilarityResponse,
+    CompositePreviewRequest,
+    CompositePreviewResponse,
+    CompositeSensitivityRequest,
+    CompositeSensitivityResponse,
+    AnalysisInfluence,
+    ComponentShift,
+    AnalysisOutlierScore,
+    CompositeBulkCalculateRequest,
+    CompositeBulkCalculateResult,
+    CompositeBulkCalculateResponse
+)
+from .chromatographic_analysis import (
+    ChromatographicAnalysisCreate,
+    ChromatographicAnalysisResponse,
+    BatchFileMetadata,
+    BatchUploadFileResult,
+    BatchUploadResponse,
+    AnalysisProcessingStatus,
+    AnalysisComponentResponse
 )
-from .chromatographic_analysis import ChromatographicAnalysisCreate, ChromatographicAnalysisResponse
 from .approval_workflow import ApprovalWorkflowResponse, ApprovalActionRequest
 from .user import UserCreate, UserResponse, UserLogin, Token
+from .reference_compound import (
+    ReferenceCompoundCreate,
+    ReferenceCompoundResponse,
+    RetentionIndexIdentifyRequest,
+    RetentionIndexMatch
+)
+from .component_catalog import (
+    ComponentCatalogEntryCreate,
+    ComponentCatalogEntryResponse,
+    ComponentSynonymsAdd,
+    ComponentSynonymResponse,
+    ComponentResolution
+)
+from .significance_rule import SignificanceRuleCreate, SignificanceRuleResponse
 
 __all__ = [
     "MaterialCreate",
@@ -18,15 +57,48 @@ __all__ = [
     "CompositeResponse",
     "CompositeComponentResponse",
     "CompositeCalculateRequest",
+    "CompositePreviewRequest",
+    "CompositePreviewResponse",
+    "CompositeSensitivityRequest",
+    "CompositeSensitivityResponse",
+    "AnalysisInfluence",
+    "ComponentShift",
+    "AnalysisOutlierScore",
     "CompositeCompareResponse",
+    "CompositeVersionSummary",
+    "CompositeVersionMatrixResponse",
+    "ComparisonCacheStats",
+    "CompositeDriftEntry",
+    "CompositeDriftResponse",
+    "CompositeSimilarityMatch",
+    "CompositeSimilarityResponse",
+    "CompositeBulkCalculateRequest",
+    "CompositeBulkCalculateResult",
+    "CompositeBulkCalculateResponse",
     "ChromatographicAnalysisCreate",
     "ChromatographicAnalysisResponse",
+    "BatchFileMetadata",
+    "BatchUploadFileResult",
+    "BatchUploadResponse",
+    "AnalysisProcessingStatus",
+    "AnalysisComponentResponse",
     "ApprovalWorkflowResponse",
     "ApprovalActionRequest",
     "UserCreate",
     "UserResponse",
     "UserLogin",
     "Token",
+    "ReferenceCompoundCreate",
+    "ReferenceCompoundResponse",
+    "RetentionIndexIdentifyRequest",
+    "RetentionIndexMatch",
+    "ComponentCatalogEntryCreate",
+    "ComponentCatalogEntryResponse",
+    "ComponentSynonymsAdd",
+    "ComponentSynonymResponse",
+    "ComponentResolution",
+    "SignificanceRuleCreate",
+    "SignificanceRuleResponse",
 ]
 
 
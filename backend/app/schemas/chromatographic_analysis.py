@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -23,9 +23,13 @@ class ChromatographicAnalysisResponse(ChromatographicAnalysisBase):
     id: int
     filename: str
     file_path: str
+    file_hash: Optional[str] = None
     parsed_data: Optional[Dict[str, Any]]
     is_processed: int
     processing_notes: Optional[str]
+    outlier_score: Optional[float] = None
+    is_outlier: Optional[bool] = None
+    outlier_screened_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
@@ -33,6 +37,64 @@ class ChromatographicAnalysisResponse(ChromatographicAnalysisBase):
         from_attributes = True
 
 
+class BatchFileMetadata(BaseModel):
+    """Metadata for one file of a batch upload"""
+    filename: Optional[str] = None  # Match by filename; entries without it match by position
+    material_id: Optional[int] = None  # Defaults to the request material_id
+    batch_number: Optional[str] = Field(None, max_length=100)
+    supplier: Optional[str] = Field(None, max_length=200)
+    analysis_date: Optional[datetime] = None
+    lab_technician: Optional[str] = Field(None, max_length=200)
+    weight: float = Field(1.0, ge=0)
+
+
+class BatchUploadFileResult(BaseModel):
+    """Result for one file of a batch upload"""
+    filename: str
+    material_id: Optional[int] = None
+    success: bool
+    analysis_id: Optional[int] = None
+    is_processed: Optional[int] = None
+    component_count: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResponse(BaseModel):
+    """Schema for batch upload response"""
+    total: int
+    created: int
+    failed: int
+    results: List[BatchUploadFileResult]
+
+
+class AnalysisProcessingStatus(BaseModel):
+    """Processing status of a chromatographic analysis"""
+    analysis_id: int
+    is_processed: int
+    state: str  # QUEUED, PROCESSING, PROCESSED or ERROR
+    progress: float = Field(0.0, ge=0, le=1)
+    stage: Optional[str] = None
+    task_id: Optional[str] = None
+    task_state: Optional[str] = None  # Raw Celery state
+    processing_notes: Optional[str] = None
+
+
+class AnalysisComponentResponse(BaseModel):
+    """Schema for one parsed component of an analysis"""
+    id: int
+    analysis_id: int
+    material_id: int
+    position: int
+    component_key: str
+    component_name: str
+    cas_number: Optional[str] = None
+    percentage: float
+    component_type: Optional[str] = None
+    retention_index: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
 
 
 
@@ -0,0 +1,51 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class ComponentCatalogEntryBase(BaseModel):
+    """Base component catalog entry schema"""
+    name: str = Field(..., max_length=255)
+    cas_number: Optional[str] = Field(None, max_length=50)
+
+
+class ComponentCatalogEntryCreate(ComponentCatalogEntryBase):
+    """Schema for creating a catalog entry; its name and CAS number are synonyms too"""
+    synonyms: List[str] = []  # Other names of the component
+    cas_aliases: List[str] = []  # Other CAS numbers of the component
+
+
+class ComponentSynonymsAdd(BaseModel):
+    """Schema for adding synonyms to a catalog entry"""
+    synonyms: List[str] = []
+    cas_aliases: List[str] = []
+
+
+class ComponentSynonymResponse(BaseModel):
+    """Schema for component synonym response"""
+    id: int
+    kind: str  # cas or name
+    value: str
+
+    class Config:
+        from_attributes = True
+
+
+class ComponentCatalogEntryResponse(ComponentCatalogEntryBase):
+    """Schema for component catalog entry response"""
+    id: int
+    component_key: str
+    synonyms: List[ComponentSynonymResponse]
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ComponentResolution(BaseModel):
+    """Aggregation key a CAS number and name resolve to"""
+    component_key: str
+    in_catalog: bool
+    name: Optional[str] = None  # Canonical name and CAS number of the catalog entry
+    cas_number: Optional[str] = None
@@ -11,6 +11,8 @@ class CompositeComponentBase(BaseModel):
     percentage: float = Field(..., ge=0, le=100)
     component_type: ComponentType = ComponentType.COMPONENT
     confidence_level: Optional[float] = Field(None, ge=0, le=100)
+    ci_lower: Optional[float] = None  # Bootstrap 95% confidence interval
+    ci_upper: Optional[float] = None
     notes: Optional[str] = None
 
 
@@ -50,6 +52,98 @@ class CompositeCalculateRequest(BaseModel):
     origin: CompositeOrigin = CompositeOrigin.LAB
     analysis_ids: Optional[List[int]] = None  # Specific analyses to use, or all if None
     notes: Optional[str] = None
+    bootstrap: bool = False  # Add bootstrap confidence intervals to the components
+    outliers: Optional[str] = None  # none, exclude or downweight flagged analyses; server default if None
+
+
+class CompositePreviewRequest(BaseModel):
+    """Schema for previewing a composite without saving it"""
+    material_id: int
+    analysis_ids: Optional[List[int]] = None  # Specific analyses to use, or all if None
+    bootstrap: bool = False
+    outliers: Optional[str] = None
+
+
+class CompositePreviewResponse(BaseModel):
+    """Schema for composite preview response"""
+    material_id: int
+    fingerprint: str  # Identifies the analysis set and their last changes
+    cached: bool
+    composite_metadata: Dict[str, Any]
+    components: List[CompositeComponentBase]
+
+
+class CompositeSensitivityRequest(BaseModel):
+    """Schema for a leave-one-out sensitivity analysis"""
+    material_id: int
+    analysis_ids: Optional[List[int]] = None  # Specific analyses to use, or all if None
+    top_components: int = Field(5, ge=0, le=100)  # Largest component shifts reported per analysis
+
+
+class ComponentShift(BaseModel):
+    """Change of one component when an analysis is left out"""
+    component_name: str
+    cas_number: Optional[str]
+    percentage: float  # In the composite of all analyses
+    percentage_without: float  # In the composite without the analysis
+    change: float  # Percentage point change
+
+
+class AnalysisInfluence(BaseModel):
+    """Influence of one analysis on the composite"""
+    analysis_id: int
+    batch_number: Optional[str]
+    supplier: Optional[str]
+    weight: Optional[float]
+    change_score: float  # Sum of absolute component changes when left out
+    top_components: List[ComponentShift]
+
+
+class CompositeSensitivityResponse(BaseModel):
+    """Schema for leave-one-out sensitivity analysis, most influential analyses first"""
+    material_id: int
+    analysis_count: int
+    component_count: int
+    influences: List[AnalysisInfluence]
+
+
+class AnalysisOutlierScore(BaseModel):
+    """Outlier score of one analysis against the other analyses of its material"""
+    analysis_id: int
+    batch_number: Optional[str]
+    supplier: Optional[str]
+    distance: float  # L1 distance to the median profile, in percentage points
+    score: float  # Robust z-score of the distance
+    is_outlier: bool
+
+
+class CompositeBulkCalculateRequest(BaseModel):
+    """Schema for calculating composites of many materials (IDs, a filter or all_materials required)"""
+    material_ids: Optional[List[int]] = None  # Materials to recalculate, or all matching the filters if None
+    material_type: Optional[str] = None
+    supplier: Optional[str] = None
+    active_only: bool = True
+    all_materials: bool = False  # Recalculate every material when no IDs or filters are given
+    notes: Optional[str] = None
+    outliers: Optional[str] = None  # none, exclude or downweight flagged analyses; server default if None
+
+
+class CompositeBulkCalculateResult(BaseModel):
+    """Result for one material of a bulk calculation"""
+    material_id: int
+    success: bool
+    composite_id: Optional[int] = None
+    version: Optional[int] = None
+    component_count: Optional[int] = None
+    error: Optional[str] = None
+
+
+class CompositeBulkCalculateResponse(BaseModel):
+    """Schema for bulk calculation response"""
+    total: int
+    created: int
+    failed: int
+    results: List[CompositeBulkCalculateResult]
 
 
 class CompositeResponse(CompositeBase):
@@ -74,6 +168,8 @@ class ComponentComparison(BaseModel):
     new_percentage: Optional[float]
     change: float  # Percentage point change
     change_percent: Optional[float]  # Percent change relative to old value
+    significant: bool = False  # Breaks its significance rule
+    significance: Optional[str] = None  # Threshold broken: limit, absolute or relative
 
 
 class CompositeCompareResponse(BaseModel):
@@ -88,3 +184,74 @@ class CompositeCompareResponse(BaseModel):
     significant_changes: bool
     total_change_score: float
 
+
+class CompositeDriftEntry(BaseModel):
+    """Drift of a material's newest draft composite from its latest approved one"""
+    material_id: int
+    reference_code: str
+    material_name: str
+    approved_composite_id: int
+    approved_version: int
+    draft_composite_id: int
+    draft_version: int
+    change_score: float  # total_change_score of comparing the two composites
+    components_added: int
+    components_removed: int
+    components_changed: int
+    significant_components: int  # Components breaking their significance rule
+    significant_changes: bool
+
+
+class CompositeDriftResponse(BaseModel):
+    """Schema for one page of the drift ranking"""
+    total: int  # Materials ranked (after min_score)
+    skip: int
+    limit: int
+    items: List[CompositeDriftEntry]  # Highest change score first
+
+
+class ComparisonCacheStats(BaseModel):
+    """Counters of the composite comparison cache of one process"""
+    backend: str  # memory or redis
+    entries: int
+    max_entries: int
+    hits: int
+    shared_hits: int  # Found in the shared backend after a local miss
+    misses: int
+    hit_rate: Optional[float]
+
+
+class CompositeSimilarityMatch(BaseModel):
+    """Material close in composition to a composite"""
+    material_id: int
+    reference_code: str
+    material_name: str
+    composite_id: int  # Latest approved composite of the material
+    version: int
+    score: float  # Cosine similarity (0-1) or L1 distance in percentage points
+
+
+class CompositeSimilarityResponse(BaseModel):
+    """Schema for a composition similarity search"""
+    composite_id: int
+    metric: str
+    matches: List[CompositeSimilarityMatch]  # Closest first
+
+
+class CompositeVersionSummary(BaseModel):
+    """Composite version in a version matrix"""
+    composite_id: int
+    version: int
+    status: CompositeStatus
+    origin: CompositeOrigin
+    approved_at: Optional[datetime]
+    component_count: int
+
+
+class CompositeVersionMatrixResponse(BaseModel):
+    """Schema for comparing all composite versions of a material"""
+    material_id: int
+    versions: List[CompositeVersionSummary]  # Oldest first
+    change_scores: List[List[float]]  # total_change_score of every pair of versions, in versions order
+    consecutive: List[CompositeCompareResponse]  # Every version against the previous one
+
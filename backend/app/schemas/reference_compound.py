@@ -0,0 +1,56 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class ReferenceCompoundBase(BaseModel):
+    """Base reference compound schema"""
+    name: str = Field(..., max_length=200)
+    cas_number: Optional[str] = Field(None, max_length=50)
+    retention_index: float = Field(..., ge=0)
+    column_phase: Optional[str] = Field(None, max_length=50)
+    source: Optional[str] = Field(None, max_length=200)
+
+
+class ReferenceCompoundCreate(ReferenceCompoundBase):
+    """Schema for creating a reference compound"""
+    pass
+
+
+class ReferenceCompoundResponse(ReferenceCompoundBase):
+    """Schema for reference compound response"""
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class RetentionIndexIdentifyRequest(BaseModel):
+    """Schema for identifying peaks by retention index"""
+    retention_indices: List[float]
+    tolerance: Optional[float] = Field(None, gt=0)  # Defaults to RI_MATCH_TOLERANCE
+    column_phase: Optional[str] = None  # Defaults to RI_COLUMN_PHASE
+
+
+class RetentionIndexCandidate(BaseModel):
+    """Reference compound matching a retention index"""
+    name: str
+    cas_number: Optional[str]
+    retention_index: float
+    delta: float  # Distance to the queried retention index
+
+
+class RetentionIndexMatch(BaseModel):
+    """Identification result for one retention index"""
+    retention_index: float
+    best_match: Optional[RetentionIndexCandidate]
+    candidates: List[RetentionIndexCandidate]
+
+
+
+
+
+
+
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from app.models.composite import ComponentType
+
+
+class SignificanceRuleBase(BaseModel):
+    """Base significance rule schema; a rule has a CAS number, a component type or neither (default rule)"""
+    cas_number: Optional[str] = Field(None, max_length=50)
+    component_type: Optional[ComponentType] = None
+    min_change: Optional[float] = Field(None, ge=0)  # Defaults to COMPONENT_CHANGE_TOLERANCE
+    absolute_threshold: Optional[float] = Field(None, ge=0)  # Percentage points
+    relative_threshold: Optional[float] = Field(None, ge=0)  # Percent of the old percentage
+    max_percentage: Optional[float] = Field(None, ge=0)  # Restricted substance limit
+    description: Optional[str] = Field(None, max_length=255)
+
+
+class SignificanceRuleCreate(SignificanceRuleBase):
+    """Schema for creating or replacing a significance rule"""
+    pass
+
+
+class SignificanceRuleResponse(SignificanceRuleBase):
+    """Schema for significance rule response"""
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
@@ -1,7 +1,31 @@
 from .composite_calculator import CompositeCalculator
 from .composite_comparator import CompositeComparator
-
-__all__ = ["CompositeCalculator", "CompositeComparator"]
+from .parse_cache import ParseCache
+from .analysis_components import AnalysisComponentIndex
+from .composite_preview import CompositePreviewer
+from .composite_sensitivity import CompositeSensitivityAnalyzer
+from .outlier_screening import OutlierScreener
+from .component_identity import ComponentIdentityIndex
+from .component_catalog import ComponentCatalog
+from .composite_similarity import CompositeSimilarityIndex, CompositeSimilarityFinder
+from .composite_drift import CompositeDriftAnalyzer
+from .significance import SignificanceEngine
+
+__all__ = [
+    "CompositeCalculator",
+    "CompositeComparator",
+    "ParseCache",
+    "AnalysisComponentIndex",
+    "CompositePreviewer",
+    "CompositeSensitivityAnalyzer",
+    "OutlierScreener",
+    "ComponentIdentityIndex",
+    "ComponentCatalog",
+    "CompositeSimilarityIndex",
+    "CompositeSimilarityFinder",
+    "CompositeDriftAnalyzer",
+    "SignificanceEngine",
+]
 
 
 
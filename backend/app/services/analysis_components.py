@@ -0,0 +1,182 @@
+from typing import List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import insert, text, update, bindparam, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.chromatographic_analysis import ChromatographicAnalysis
+from app.models.analysis_component import AnalysisComponent
+from app.models.component_statistics import ComponentStatistics
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex, component_key_sql
+
+
+# Backfill in one statement on PostgreSQL: unnest parsed_data->'components'
+# with the same component key rules as CompositeCalculator._get_component_key
+BACKFILL_SQL = """
+INSERT INTO analysis_components (
+    analysis_id, material_id, position, component_key, component_name,
+    cas_number, percentage, component_type, retention_index
+)
+SELECT
+    a.id,
+    a.material_id,
+    (e.ordinality - 1)::int,
+    {component_key},
+    coalesce(e.value ->> 'component_name', ''),
+    nullif(e.value ->> 'cas_number', ''),
+    (e.value ->> 'percentage')::float8,
+    coalesce(e.value ->> 'component_type', 'COMPONENT'),
+    (e.value ->> 'retention_index')::float8
+FROM chromatographic_analyses a
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(a.parsed_data::jsonb -> 'components') = 'array'
+         THEN a.parsed_data::jsonb -> 'components'
+         ELSE '[]'::jsonb END
+) WITH ORDINALITY AS e(value, ordinality)
+WHERE a.is_processed = 1
+  AND NOT EXISTS (SELECT 1 FROM analysis_components c WHERE c.analysis_id = a.id)
+""".format(component_key=component_key_sql("e.value"))
+
+
+class AnalysisComponentIndex:
+    """Keeps the analysis_components table in line with parsed_data"""
+    
+    BACKFILL_BATCH_SIZE = 500
+    
+    def __init__(self, db: Session, identity_index: Optional[ComponentIdentityIndex] = None):
+        self.db = db
+        self.calculator = CompositeCalculator(db, identity_index=identity_index)
+        self._get_component_key = self.calculator._get_component_key
+    
+    def component_rows(self, analysis: ChromatographicAnalysis) -> List[Dict[str, Any]]:
+        """Table rows for the parsed components of a processed analysis"""
+        if analysis.is_processed != 1 or not analysis.parsed_data:
+            return []
+        
+        return [
+            {
+                'analysis_id': analysis.id,
+                'material_id': analysis.material_id,
+                'position': position,
+                'component_key': self._get_component_key(component),
+                'component_name': component['component_name'],
+                'cas_number': component.get('cas_number'),
+                'percentage': component['percentage'],
+                'component_type': component.get('component_type', 'COMPONENT'),
+                'retention_index': component.get('retention_index')
+            }
+            for position, component in enumerate(analysis.parsed_data.get('components') or [])
+        ]
+    
+    def add(self, analyses: List[ChromatographicAnalysis]) -> int:
+        """
+        Bulk insert the components of newly parsed analyses
+        
+        The analyses must have been flushed (they need an id).
+        
+        Returns:
+            Number of rows inserted
+        """
+        rows = [row for analysis in analyses for row in self.component_rows(analysis)]
+        if rows:
+            self.db.execute(insert(AnalysisComponent), rows)
+        return len(rows)
+    
+    def replace(self, analysis: ChromatographicAnalysis) -> int:
+        """
+        Replace the components of a reprocessed analysis
+        
+        Returns:
+            Number of rows inserted
+        """
+        self.db.query(AnalysisComponent).filter(
+            AnalysisComponent.analysis_id == analysis.id
+        ).delete(synchronize_session=False)
+        return self.add([analysis])
+    
+    def backfill(self) -> int:
+        """
+        Add the components of processed analyses that have none in the table
+        
+        Returns:
+            Number of rows inserted
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            return self.db.execute(text(BACKFILL_SQL)).rowcount
+        
+        indexed = self.db.query(AnalysisComponent.analysis_id)
+        inserted = 0
+        last_id = 0
+        
+        while True:
+            analyses = self.db.query(ChromatographicAnalysis).filter(
+                ChromatographicAnalysis.is_processed == 1,
+                ChromatographicAnalysis.id > last_id,
+                ~ChromatographicAnalysis.id.in_(indexed)
+            ).order_by(ChromatographicAnalysis.id).limit(self.BACKFILL_BATCH_SIZE).all()
+            
+            if not analyses:
+                return inserted
+            
+            inserted += self.add(analyses)
+            last_id = analyses[-1].id
+    
+    def rekey(self, synonyms: List[Tuple[str, str]], keys: Set[str]) -> Dict[str, int]:
+        """
+        Re-key stored components after catalog synonyms were added or removed
+        
+        Rows matching one of the synonyms or keyed by one of the keys get
+        their key recomputed, and every material with such rows gets its
+        component statistics rebuilt. Create the index with the changed
+        catalog, in the same transaction as the change.
+        
+        Args:
+            synonyms: (kind, value) synonyms that were added or removed
+            keys: Catalog entry keys that were added or removed
+        
+        Returns:
+            Dictionary with rekeyed_components and rebuilt_materials
+        """
+        keys = set(keys) | {f"{kind}_{value}" for kind, value in synonyms}
+        cas_values = [value for kind, value in synonyms if kind == 'cas']
+        name_values = [value for kind, value in synonyms if kind == 'name']
+        
+        conditions = [AnalysisComponent.component_key.in_(keys)]
+        if cas_values:
+            conditions.append(func.trim(AnalysisComponent.cas_number).in_(cas_values))
+        if name_values:
+            conditions.append(func.lower(func.trim(AnalysisComponent.component_name)).in_(name_values))
+        
+        rows = self.db.query(
+            AnalysisComponent.id,
+            AnalysisComponent.material_id,
+            AnalysisComponent.component_key,
+            AnalysisComponent.component_name,
+            AnalysisComponent.cas_number
+        ).filter(or_(*conditions)).all()
+        
+        changed = []
+        for row in rows:
+            key = self.calculator.identity_index.component_key(row.cas_number, row.component_name)
+            if key != row.component_key:
+                changed.append({'row_id': row.id, 'new_key': key})
+        
+        if changed:
+            table = AnalysisComponent.__table__
+            self.db.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(component_key=bindparam('new_key')),
+                changed
+            )
+        
+        # Statistics hold one row per key: rebuild the materials that may have stale ones
+        material_ids = {row.material_id for row in rows}
+        material_ids.update(
+            row.material_id
+            for row in self.db.query(ComponentStatistics.material_id).filter(
+                ComponentStatistics.component_key.in_(keys)
+            ).distinct()
+        )
+        for material_id in sorted(material_ids):
+            self.calculator.rebuild_statistics(material_id)
+        
+        return {'rekeyed_components': len(changed), 'rebuilt_materials': len(material_ids)}
+
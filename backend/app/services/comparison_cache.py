@@ -0,0 +1,156 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import threading
+import time
+
+import redis
+
+from app.core.config import settings
+from app.models.composite import CompositeStatus
+from app.schemas.composite import CompositeCompareResponse
+
+
+# Composites in these states never change, so comparisons of them never expire
+IMMUTABLE_STATUSES = (CompositeStatus.APPROVED, CompositeStatus.ARCHIVED)
+
+
+class ComparisonCache:
+    """
+    Thread-safe LRU of composite comparisons, optionally shared through Redis
+    
+    Keys hold both composite IDs with their state (see CompositeComparator).
+    Pairs of APPROVED/ARCHIVED composites are kept without expiry; pairs
+    with another status are keyed by status and last change, so a change
+    gives a new key, and expire after draft_ttl seconds. With a Redis URL,
+    entries are written to Redis too and read from it on a local miss, so
+    every worker process shares them; Redis errors count as misses.
+    """
+    
+    KEY_PREFIX = "composite-comparison:"
+    
+    def __init__(self, max_entries: int, draft_ttl: float, redis_url: Optional[str] = None):
+        self.max_entries = max_entries
+        self.draft_ttl = draft_ttl
+        self.redis_url = redis_url
+        self._redis: Optional[redis.Redis] = None
+        self._entries: "OrderedDict[str, Tuple[Optional[float], frozenset, CompositeCompareResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key: str, composite_ids: Tuple[int, int], permanent: bool) -> Optional[CompositeCompareResponse]:
+        """Cached comparison, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] >= time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+        
+        comparison = self._shared_get(key)
+        with self._lock:
+            if comparison is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._store(key, composite_ids, comparison, permanent)
+        return comparison
+    
+    def put(self, key: str, composite_ids: Tuple[int, int], comparison: CompositeCompareResponse, permanent: bool):
+        """Store a comparison; permanent entries (immutable pairs) never expire"""
+        if self.max_entries <= 0:
+            return
+        
+        self._store(key, composite_ids, comparison, permanent)
+        self._shared_put(key, comparison, permanent)
+    
+    def invalidate(self, composite_id: int) -> int:
+        """
+        Drop the local comparisons involving a composite (e.g. deleted)
+        
+        Shared entries are not scanned: a deleted composite is never looked
+        up again and a changed one gets new keys.
+        
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [key for key, (_, composite_ids, _) in self._entries.items() if composite_id in composite_ids]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+    
+    def clear(self):
+        """Drop all local comparisons and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this process"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'backend': 'redis' if self.redis_url else 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None
+            }
+    
+    def _store(self, key: str, composite_ids: Tuple[int, int], comparison: CompositeCompareResponse, permanent: bool):
+        with self._lock:
+            expires_at = None if permanent else time.monotonic() + self.draft_ttl
+            self._entries[key] = (expires_at, frozenset(composite_ids), comparison)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _client(self) -> Optional[redis.Redis]:
+        if self.redis_url and self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self._redis
+    
+    def _shared_get(self, key: str) -> Optional[CompositeCompareResponse]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            payload = client.get(self.KEY_PREFIX + key)
+        except redis.RedisError:
+            return None
+        return CompositeCompareResponse.model_validate_json(payload) if payload else None
+    
+    def _shared_put(self, key: str, comparison: CompositeCompareResponse, permanent: bool):
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.set(self.KEY_PREFIX + key, comparison.model_dump_json(), ex=None if permanent else int(self.draft_ttl))
+        except redis.RedisError:
+            pass
+
+
+_comparison_cache = ComparisonCache(
+    settings.COMPARISON_CACHE_SIZE,
+    settings.COMPARISON_CACHE_DRAFT_TTL,
+    settings.REDIS_URL if settings.COMPARISON_CACHE_BACKEND == "redis" else None
+)
+
+
+def get_comparison_cache() -> ComparisonCache:
+    """Comparison cache shared by the comparators of this process"""
+    return _comparison_cache
+
+
+def invalidate_composite_comparisons(composite_id: int) -> int:
+    """Drop cached comparisons involving a composite after it is deleted"""
+    return _comparison_cache.invalidate(composite_id)
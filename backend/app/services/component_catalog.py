@@ -0,0 +1,130 @@
+from typing import List, Dict, Any, Optional, Set, Tuple
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.component_catalog import ComponentCatalogEntry, ComponentSynonym
+from app.services.analysis_components import AnalysisComponentIndex
+from app.services.component_identity import (
+    ComponentIdentityIndex,
+    normalize_cas,
+    normalize_name,
+    legacy_component_key
+)
+
+
+class ComponentCatalog:
+    """
+    Changes to the component catalog
+    
+    Every change re-keys the stored components it affects (analysis
+    components and component statistics) in the caller's transaction.
+    Call invalidate_identity_index() after committing.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def create_entries(self, entries: List[Dict[str, Any]]) -> List[ComponentCatalogEntry]:
+        """
+        Add catalog entries with their synonyms
+        
+        The name and CAS number of an entry are synonyms of it as well.
+        
+        Args:
+            entries: Dictionaries with name, cas_number, synonyms (names) and cas_aliases
+        
+        Returns:
+            The new entries
+        """
+        created = []
+        all_synonyms: List[Tuple[str, str]] = []
+        for data in entries:
+            cas_number = normalize_cas(data.get('cas_number')) or None
+            entry = ComponentCatalogEntry(
+                name=data['name'].strip(),
+                cas_number=cas_number,
+                component_key=legacy_component_key(cas_number, data['name'])
+            )
+            synonyms = self._synonyms(
+                [data['name']] + list(data.get('synonyms') or []),
+                ([cas_number] if cas_number else []) + list(data.get('cas_aliases') or [])
+            )
+            entry.synonyms = [ComponentSynonym(kind=kind, value=value) for kind, value in synonyms]
+            created.append(entry)
+            all_synonyms.extend(synonyms)
+        
+        keys = [entry.component_key for entry in created]
+        if len(set(keys)) != len(keys):
+            raise ValueError("Several entries have the same CAS number or name")
+        if len(set(all_synonyms)) != len(all_synonyms):
+            raise ValueError("A synonym is given for several entries")
+        
+        existing = self.db.query(ComponentCatalogEntry.component_key).filter(
+            ComponentCatalogEntry.component_key.in_(keys)
+        ).first()
+        if existing:
+            raise ValueError(f"Catalog already has an entry with key {existing.component_key}")
+        self._check_free(all_synonyms)
+        
+        self.db.add_all(created)
+        self._rekey(all_synonyms, set(keys))
+        return created
+    
+    def add_synonyms(
+        self,
+        entry: ComponentCatalogEntry,
+        names: Optional[List[str]] = None,
+        cas_numbers: Optional[List[str]] = None
+    ) -> ComponentCatalogEntry:
+        """Add name and CAS synonyms to an entry"""
+        current = {(synonym.kind, synonym.value) for synonym in entry.synonyms}
+        synonyms = [pair for pair in self._synonyms(names or [], cas_numbers or []) if pair not in current]
+        self._check_free(synonyms)
+        
+        entry.synonyms.extend(ComponentSynonym(kind=kind, value=value) for kind, value in synonyms)
+        self._touch(entry)
+        self._rekey(synonyms, {entry.component_key})
+        return entry
+    
+    def remove_synonym(self, entry: ComponentCatalogEntry, synonym: ComponentSynonym) -> ComponentCatalogEntry:
+        """Remove a synonym from an entry"""
+        entry.synonyms.remove(synonym)
+        self._touch(entry)
+        self._rekey([(synonym.kind, synonym.value)], {entry.component_key})
+        return entry
+    
+    def delete_entry(self, entry: ComponentCatalogEntry):
+        """Delete an entry and its synonyms"""
+        synonyms = [(synonym.kind, synonym.value) for synonym in entry.synonyms]
+        key = entry.component_key
+        self.db.delete(entry)
+        self._rekey(synonyms, {key})
+    
+    @staticmethod
+    def _synonyms(names: List[str], cas_numbers: List[str]) -> List[Tuple[str, str]]:
+        """Normalized, deduplicated (kind, value) synonyms; blank values are dropped"""
+        pairs = [('name', normalize_name(name)) for name in names]
+        pairs += [('cas', normalize_cas(cas_number)) for cas_number in cas_numbers]
+        return list(dict.fromkeys(pair for pair in pairs if pair[1]))
+    
+    def _check_free(self, synonyms: List[Tuple[str, str]]):
+        """Raise ValueError if one of the synonyms already belongs to an entry"""
+        if not synonyms:
+            return
+        
+        taken = self.db.query(ComponentSynonym).filter(
+            tuple_(ComponentSynonym.kind, ComponentSynonym.value).in_(synonyms)
+        ).first()
+        if taken:
+            raise ValueError(f"Synonym {taken.kind} '{taken.value}' already belongs to catalog entry {taken.catalog_id}")
+    
+    @staticmethod
+    def _touch(entry: ComponentCatalogEntry):
+        """Mark the entry changed, synonym changes alone do not update it"""
+        entry.updated_at = func.now()
+    
+    def _rekey(self, synonyms: List[Tuple[str, str]], keys: Set[str]) -> Dict[str, int]:
+        """Flush the change and re-key the stored components it affects"""
+        self.db.flush()
+        index = ComponentIdentityIndex.from_db(self.db)
+        return AnalysisComponentIndex(self.db, identity_index=index).rekey(synonyms, keys)
@@ -0,0 +1,175 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import hashlib
+import threading
+
+from app.models.component_catalog import ComponentCatalogEntry, ComponentSynonym
+
+
+# Same rules as ComponentIdentityIndex.component_key for a jsonb component
+# in PostgreSQL: CAS synonym, then name synonym, then the legacy key. Both
+# lookups hit the unique (kind, value) index of component_synonyms.
+COMPONENT_KEY_SQL = """coalesce(
+    (SELECT cc.component_key FROM component_synonyms cs JOIN component_catalog cc ON cc.id = cs.catalog_id
+     WHERE cs.kind = 'cas' AND cs.value = btrim({component} ->> 'cas_number')),
+    (SELECT cc.component_key FROM component_synonyms cs JOIN component_catalog cc ON cc.id = cs.catalog_id
+     WHERE cs.kind = 'name' AND cs.value = lower(btrim(coalesce({component} ->> 'component_name', '')))),
+    CASE WHEN coalesce({component} ->> 'cas_number', '') <> ''
+         THEN 'cas_' || ({component} ->> 'cas_number')
+         ELSE 'name_' || lower(btrim(coalesce({component} ->> 'component_name', ''))) END
+)"""
+
+
+def component_key_sql(component: str) -> str:
+    """COMPONENT_KEY_SQL for the jsonb component expression `component`"""
+    return COMPONENT_KEY_SQL.format(component=component)
+
+
+def normalize_cas(cas_number: Optional[str]) -> str:
+    """CAS number as stored in component_synonyms"""
+    return (cas_number or '').strip()
+
+
+def normalize_name(component_name: Optional[str]) -> str:
+    """Component name as stored in component_synonyms"""
+    return (component_name or '').lower().strip()
+
+
+def legacy_component_key(cas_number: Optional[str], component_name: Optional[str]) -> str:
+    """Key of a component the catalog does not know: cas_<cas>, or name_<name> without CAS"""
+    if cas_number:
+        return f"cas_{cas_number}"
+    return f"name_{normalize_name(component_name)}"
+
+
+class ComponentIdentityIndex:
+    """
+    In-memory hash index of the component catalog
+    
+    Maps every CAS and name synonym to the component_key of its catalog
+    entry, so resolving a component is two dictionary lookups. A CAS
+    synonym wins over a name synonym; components matching neither keep
+    their legacy key (cas_<cas> or name_<name>).
+    """
+    
+    def __init__(
+        self,
+        entries: List[Tuple[str, str, Optional[str]]],
+        synonyms: List[Tuple[str, str, str]],
+        version: str = ""
+    ):
+        """
+        Args:
+            entries: (component_key, name, cas_number) tuples
+            synonyms: (kind, value, component_key) tuples, kind is cas or name
+            version: Identifies the catalog content (used in cache keys)
+        """
+        self.entries = {key: (name, cas_number) for key, name, cas_number in entries}
+        self.keys_by_cas = {value: key for kind, value, key in synonyms if kind == 'cas'}
+        self.keys_by_name = {value: key for kind, value, key in synonyms if kind == 'name'}
+        self.version = version
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    @classmethod
+    def from_db(cls, db: Session) -> "ComponentIdentityIndex":
+        """Load the whole catalog with two queries"""
+        entries = db.query(
+            ComponentCatalogEntry.component_key,
+            ComponentCatalogEntry.name,
+            ComponentCatalogEntry.cas_number
+        ).all()
+        synonyms = db.query(
+            ComponentSynonym.kind,
+            ComponentSynonym.value,
+            ComponentCatalogEntry.component_key
+        ).join(ComponentCatalogEntry, ComponentCatalogEntry.id == ComponentSynonym.catalog_id).all()
+        
+        return cls([tuple(row) for row in entries], [tuple(row) for row in synonyms], version=_catalog_version(db))
+    
+    def component_key(self, cas_number: Optional[str], component_name: Optional[str]) -> str:
+        """Aggregation key of a component from its CAS number and name"""
+        if cas_number:
+            key = self.keys_by_cas.get(normalize_cas(cas_number))
+            if key is not None:
+                return key
+        key = self.keys_by_name.get(normalize_name(component_name))
+        if key is not None:
+            return key
+        return legacy_component_key(cas_number, component_name)
+    
+    def resolve(self, component: Dict[str, Any]) -> str:
+        """Aggregation key of a component dictionary (cas_number, component_name)"""
+        return self.component_key(component.get('cas_number'), component.get('component_name', ''))
+    
+    def canonical(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(name, cas_number) of the catalog entry with this key, None if the key is not a catalog entry"""
+        return self.entries.get(key)
+    
+    def identify_components(self, components: List[Dict[str, Any]]) -> int:
+        """
+        Fill in the catalog CAS number of parsed components reported without one
+        
+        Only components whose name is a synonym of an entry with a CAS
+        number are changed. Names are kept as reported.
+        
+        Returns:
+            Number of components identified
+        """
+        identified = 0
+        for component in components:
+            if component.get('cas_number'):
+                continue
+            key = self.keys_by_name.get(normalize_name(component.get('component_name')))
+            cas_number = self.entries[key][1] if key is not None else None
+            if cas_number:
+                component['cas_number'] = cas_number
+                component.setdefault('identified_by', 'catalog')
+                identified += 1
+        return identified
+
+
+def _catalog_version(db: Session) -> str:
+    """Short fingerprint of the catalog content from counts, max ids and last update"""
+    entry_count, max_entry_id, last_change = db.query(
+        func.count(ComponentCatalogEntry.id),
+        func.max(ComponentCatalogEntry.id),
+        func.max(func.coalesce(ComponentCatalogEntry.updated_at, ComponentCatalogEntry.created_at))
+    ).one()
+    synonym_count, max_synonym_id = db.query(
+        func.count(ComponentSynonym.id),
+        func.max(ComponentSynonym.id)
+    ).one()
+    
+    fingerprint = f"{entry_count}-{max_entry_id}-{last_change}-{synonym_count}-{max_synonym_id}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+_index_lock = threading.Lock()
+_index: Optional[ComponentIdentityIndex] = None
+
+
+def get_identity_index(db: Session) -> ComponentIdentityIndex:
+    """
+    Shared index instance, reloaded only when the catalog has changed
+    
+    The check is a single round of aggregate queries, so every worker
+    process notices changes made by the others.
+    """
+    global _index
+    version = _catalog_version(db)
+    
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = ComponentIdentityIndex.from_db(db)
+        return _index
+
+
+def invalidate_identity_index():
+    """Drop the loaded index (after changes to the component catalog)"""
+    global _index
+    with _index_lock:
+        _index = None
+
@@ -1,24 +1,236 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from sqlalchemy import update, false
 from sqlalchemy.orm import Session
-from collections import defaultdict
-import statistics
+import numpy as np
 
+from app.core.config import settings
 from app.models.chromatographic_analysis import ChromatographicAnalysis
 from app.models.composite import Composite, CompositeComponent, CompositeOrigin, CompositeStatus
 from app.models.material import Material
+from app.models.component_statistics import ComponentStatistics, ComponentStatisticsSource
+from app.services.sql_aggregation import supports_sql_aggregation, aggregate_components
+from app.services.composite_versions import allocate_version, allocate_versions
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+
+
+class ComponentMatrix:
+    """
+    Components of several analyses as analyses x components matrices
+    
+    Rows follow the order of the analyses that have parsed components,
+    columns the order in which components are first seen. A component
+    reported on several rows of one analysis (e.g. the same CAS twice)
+    adds up in its cell, and counts holds the number of rows, so every
+    reported row stays one observation.
+    """
+    
+    def __init__(self, analyses: List[ChromatographicAnalysis], key_func: Callable[[Optional[str], Optional[str]], str]):
+        """
+        Args:
+            analyses: Analyses to aggregate
+            key_func: (cas_number, component_name) -> component key; called
+                once per distinct pair, the same peaks recur in every analysis
+        """
+        self.analyses = [
+            analysis for analysis in analyses
+            if analysis.parsed_data and 'components' in analysis.parsed_data
+        ]
+        component_lists = [analysis.parsed_data['components'] for analysis in self.analyses]
+        components = [component for component_list in component_lists for component in component_list]
+        
+        cas_numbers = [component.get('cas_number') for component in components]
+        names = [component['component_name'] for component in components]
+        component_types = [component.get('component_type', 'COMPONENT') for component in components]
+        
+        pairs = list(zip(cas_numbers, names))
+        keys_by_pair = {pair: key_func(*pair) for pair in dict.fromkeys(pairs)}
+        keys = list(map(keys_by_pair.__getitem__, pairs))
+        
+        # Columns and types in order of first appearance
+        self.keys = list(dict.fromkeys(keys))
+        self.type_names = list(dict.fromkeys(component_types))
+        columns_by_key = {key: column for column, key in enumerate(self.keys)}
+        types_by_name = {component_type: index for index, component_type in enumerate(self.type_names)}
+        
+        # Latest name, first CAS number
+        names_by_key = dict(zip(keys, names))
+        cas_by_key = {key: cas for key, cas in zip(reversed(keys), reversed(cas_numbers)) if cas}
+        
+        lengths = np.array([len(component_list) for component_list in component_lists], dtype=np.intp)
+        rows = np.repeat(np.arange(len(self.analyses), dtype=np.intp), lengths)
+        columns = list(map(columns_by_key.__getitem__, keys))
+        values = [component['percentage'] for component in components]
+        types = list(map(types_by_name.__getitem__, component_types))
+        
+        self.names = [names_by_key[key] for key in self.keys]
+        self.cas_numbers = [cas_by_key.get(key) for key in self.keys]
+        self.analysis_count = len(self.analyses)
+        self.component_count = len(self.keys)
+        
+        # One entry per reported row
+        self.rows = np.array(rows, dtype=np.intp)
+        self.columns = np.array(columns, dtype=np.intp)
+        self.values = np.array(values, dtype=np.float64)
+        
+        self.weights = np.array([analysis.weight for analysis in self.analyses], dtype=np.float64)
+        
+        cells = self.rows * self.component_count + self.columns
+        size = self.analysis_count * self.component_count
+        shape = (self.analysis_count, self.component_count)
+        self.percentages = np.bincount(cells, weights=self.values, minlength=size).reshape(shape)
+        self.counts = np.bincount(cells, minlength=size).reshape(shape)
+        
+        # Rows per component and type; ties go to the type seen first
+        type_count = len(self.type_names)
+        self.type_counts = np.bincount(
+            self.columns * type_count + np.array(types, dtype=np.intp),
+            minlength=self.component_count * type_count
+        ).reshape(self.component_count, type_count)
+    
+    def bootstrap_percentages(self, resamples: int, seed: int) -> np.ndarray:
+        """
+        Composite percentages of bootstrap resamples of the analyses
+        
+        Each resample draws analysis_count analyses with replacement. The
+        weighted averages of all resamples come from two matrix products
+        of the (resamples x analyses) weighted draw counts, and each
+        resample is normalized to 100% like a composite. A component none
+        of the drawn analyses reports is 0% in that resample.
+        
+        Returns:
+            resamples x components array
+        """
+        n = self.analysis_count
+        draws = np.random.default_rng(seed).integers(0, n, size=(resamples, n))
+        
+        # How often each analysis was drawn in each resample
+        multiplicities = np.bincount(
+            (np.arange(resamples)[:, np.newaxis] * n + draws).ravel(),
+            minlength=resamples * n
+        ).reshape(resamples, n)
+        resample_weights = multiplicities * self.weights
+        
+        weighted_sums = resample_weights @ self.percentages
+        weight_sums = resample_weights @ self.counts
+        estimates = np.divide(weighted_sums, weight_sums, out=np.zeros_like(weighted_sums), where=weight_sums > 0)
+        
+        totals = estimates.sum(axis=1, keepdims=True)
+        return np.divide(estimates * 100.0, totals, out=np.zeros_like(estimates), where=totals > 0)
+    
+    def leave_one_out_percentages(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Composite percentages of all analyses and with each analysis left out
+        
+        The weighted average is a ratio of two sums over the analyses, so
+        leaving analysis i out only subtracts its row from both sums: all
+        leave-one-out composites come from one pass over the matrix instead
+        of one aggregation per analysis. Every composite is normalized to
+        100% like a stored one; a component only the left-out analysis
+        reports is 0% there.
+        
+        Returns:
+            Tuple of (components array; analyses x components array)
+        """
+        weights = self.weights[:, np.newaxis]
+        weighted = self.percentages * weights
+        counted = self.counts * weights
+        
+        full = self._normalized_composite(
+            weighted.sum(axis=0), counted.sum(axis=0), self.percentages.sum(axis=0), self.counts.sum(axis=0)
+        )
+        without = self._normalized_composite(
+            weighted.sum(axis=0) - weighted,
+            counted.sum(axis=0) - counted,
+            self.percentages.sum(axis=0) - self.percentages,
+            self.counts.sum(axis=0) - self.counts
+        )
+        return full, without
+    
+    def outlier_scores(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Robust outlier score of every analysis against the others
+        
+        Each analysis is normalized to 100% and compared to the median
+        profile (component-wise median over all analyses, a missing
+        component counting as 0%). The L1 distances to that profile are
+        turned into robust z-scores with the median and the scaled median
+        absolute deviation (mean absolute deviation when the MAD is 0).
+        With fewer than three analyses there is no majority to compare
+        against and all scores are 0.
+        
+        Returns:
+            Tuple of (L1 distance to the median profile; robust z-score), one entry per analysis
+        """
+        totals = self.percentages.sum(axis=1, keepdims=True)
+        profiles = np.divide(self.percentages * 100.0, totals, out=np.zeros_like(self.percentages), where=totals > 0)
+        distances = np.abs(profiles - np.median(profiles, axis=0)).sum(axis=1)
+        
+        if self.analysis_count < 3:
+            return distances, np.zeros(self.analysis_count)
+        
+        deviations = distances - np.median(distances)
+        scale = 1.4826 * np.median(np.abs(deviations))
+        if scale == 0:
+            scale = 1.2533 * np.mean(np.abs(deviations))
+        if scale == 0:
+            return distances, np.zeros(self.analysis_count)
+        return distances, deviations / scale
+    
+    @staticmethod
+    def _normalized_composite(
+        weighted_sums: np.ndarray,
+        weight_sums: np.ndarray,
+        sums: np.ndarray,
+        observations: np.ndarray
+    ) -> np.ndarray:
+        """Weighted averages (plain means where the weights add up to 0) normalized to 100% along the last axis"""
+        reported = observations > 0
+        means = np.divide(sums, observations, out=np.zeros_like(sums), where=reported)
+        # Counts decide which components are left, not float residues of the subtraction
+        estimates = np.divide(weighted_sums, weight_sums, out=means, where=reported & (weight_sums != 0))
+        
+        totals = estimates.sum(axis=-1, keepdims=True)
+        return np.divide(estimates * 100.0, totals, out=np.zeros_like(estimates), where=totals > 0)
 
 
 class CompositeCalculator:
     """Service for calculating composites from chromatographic analyses"""
     
-    def __init__(self, db: Session):
+    # Coverage of the bootstrap confidence intervals
+    CONFIDENCE_INTERVAL = 0.95
+    
+    # What to do with analyses flagged by the outlier screening
+    OUTLIER_HANDLINGS = ('none', 'exclude', 'downweight')
+    
+    # Columns of ComponentStatistics filled from aggregate_components rows
+    STATISTICS_COLUMNS = [
+        'component_key', 'component_name', 'cas_number', 'name_analysis_id', 'type_counts',
+        'observation_count', 'sum_weight', 'sum_weighted_percentage', 'sum_percentage', 'sum_squared_percentage'
+    ]
+    
+    def __init__(self, db: Session, identity_index: Optional[ComponentIdentityIndex] = None):
+        """
+        Args:
+            db: Database session
+            identity_index: Component catalog index (None = shared index, loaded on first use)
+        """
         self.db = db
+        self._identity_index = identity_index
+    
+    @property
+    def identity_index(self) -> ComponentIdentityIndex:
+        """Component catalog index resolving component keys"""
+        if self._identity_index is None:
+            self._identity_index = get_identity_index(self.db)
+        return self._identity_index
     
     def calculate_from_lab_analyses(
         self,
         material_id: int,
         analysis_ids: Optional[List[int]] = None,
-        notes: Optional[str] = None
+        notes: Optional[str] = None,
+        bootstrap: bool = False,
+        outliers: Optional[str] = None
     ) -> Composite:
         """
         Calculate composite from laboratory chromatographic analyses
@@ -27,7 +239,10 @@ class CompositeCalculator:
             material_id: ID of the material
             analysis_ids: Specific analysis IDs to use (None = use all)
             notes: Optional notes for the composite
-            
+            bootstrap: Add bootstrap confidence intervals to the components
+            outliers: Handling of outlier analyses, one of OUTLIER_HANDLINGS
+                (None = settings.OUTLIER_HANDLING)
+        
         Returns:
             Calculated Composite object (not yet saved to DB)
         """
@@ -36,7 +251,153 @@ class CompositeCalculator:
         if not material:
             raise ValueError(f"Material {material_id} not found")
         
-        # Get analyses
+        metadata, aggregated = self.aggregate_lab_analyses(
+            material_id, analysis_ids, bootstrap=bootstrap, outliers=outliers
+        )
+        
+        # Allocate the version last, the counter row stays locked until commit
+        next_version = allocate_version(self.db, material_id)
+        
+        return self._build_lab_composite(material_id, next_version, metadata, aggregated, notes)
+    
+    def aggregate_lab_analyses(
+        self,
+        material_id: int,
+        analysis_ids: Optional[List[int]] = None,
+        bootstrap: bool = False,
+        outliers: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Aggregate the processed analyses of a material without creating a composite
+        
+        Args:
+            material_id: ID of the material
+            analysis_ids: Specific analysis IDs to use (None = use all)
+            bootstrap: Add bootstrap confidence intervals to the components
+            outliers: Handling of outlier analyses, one of OUTLIER_HANDLINGS
+                (None = settings.OUTLIER_HANDLING)
+        
+        Returns:
+            Tuple of (composite metadata; component dictionaries)
+        """
+        outliers = self.outlier_handling(outliers)
+        use_sql = supports_sql_aggregation(self.db)
+        
+        if bootstrap or outliers != 'none' or (analysis_ids and not use_sql):
+            # Get analyses (resampling and outlier screening need the whole matrix)
+            analyses = self.load_analyses(material_id, analysis_ids)
+            return self._aggregate_screened(analyses, outliers, bootstrap=bootstrap)
+        else:
+            # Only the metadata columns are needed, components are aggregated elsewhere
+            query = self.db.query(
+                ChromatographicAnalysis.id,
+                ChromatographicAnalysis.batch_number,
+                ChromatographicAnalysis.supplier
+            ).filter(
+                ChromatographicAnalysis.material_id == material_id,
+                ChromatographicAnalysis.is_processed == 1
+            )
+            
+            if analysis_ids:
+                query = query.filter(ChromatographicAnalysis.id.in_(analysis_ids))
+            
+            analyses = query.order_by(ChromatographicAnalysis.id).all()
+            
+            if not analyses:
+                raise ValueError(f"No processed analyses found for material {material_id}")
+            
+            if analysis_ids:
+                # Aggregate the selected analyses in the database
+                aggregated = self._aggregate_sql(material_id, analysis_ids)
+            else:
+                # Aggregate from the running component statistics
+                aggregated = self._aggregate_statistics(material_id)
+        
+        return self.lab_metadata(analyses, bootstrap=bootstrap), aggregated
+    
+    def _aggregate_screened(
+        self,
+        analyses: List[ChromatographicAnalysis],
+        outliers: str,
+        bootstrap: bool = False
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Screen loaded analyses for outliers and aggregate them
+        
+        Returns:
+            Tuple of (composite metadata; component dictionaries)
+        """
+        matrix = self._component_matrix(analyses)
+        
+        screening = None
+        if outliers != 'none':
+            matrix, screening = self._screen_outliers(matrix, outliers)
+            excluded = {item['analysis_id'] for item in screening['flagged'] if item['excluded']}
+            analyses = [analysis for analysis in analyses if analysis.id not in excluded]
+        
+        # Aggregate components from the selected analyses
+        aggregated = self._aggregate_matrix(matrix, bootstrap=bootstrap)
+        return self.lab_metadata(analyses, bootstrap=bootstrap, outliers=screening), aggregated
+    
+    def outlier_handling(self, outliers: Optional[str] = None) -> str:
+        """Validated outlier handling, settings.OUTLIER_HANDLING if not given"""
+        outliers = (outliers or settings.OUTLIER_HANDLING).lower()
+        if outliers not in self.OUTLIER_HANDLINGS:
+            raise ValueError(
+                f"Unknown outlier handling '{outliers}', expected one of: {', '.join(self.OUTLIER_HANDLINGS)}"
+            )
+        return outliers
+    
+    def _screen_outliers(self, matrix: "ComponentMatrix", outliers: str) -> Tuple["ComponentMatrix", Dict[str, Any]]:
+        """
+        Exclude or down-weight the analyses whose outlier score exceeds settings.OUTLIER_THRESHOLD
+        
+        Down-weighting multiplies the weight of a flagged analysis by
+        threshold / score, so its pull on the composite is capped as if it
+        sat on the threshold.
+        
+        Returns:
+            Tuple of (matrix to aggregate; screening summary for the composite metadata)
+        """
+        threshold = settings.OUTLIER_THRESHOLD
+        _, scores = matrix.outlier_scores()
+        flagged = np.flatnonzero(scores > threshold).tolist()
+        factors = np.ones(matrix.analysis_count)
+        factors[flagged] = threshold / scores[flagged]
+        
+        summary = {
+            'handling': outliers,
+            'method': 'robust_z_l1',
+            'threshold': threshold,
+            'flagged': [
+                {
+                    'analysis_id': matrix.analyses[row].id,
+                    'score': round(float(scores[row]), 2),
+                    'excluded': outliers == 'exclude',
+                    'weight_factor': 0.0 if outliers == 'exclude' else round(float(factors[row]), 4)
+                }
+                for row in flagged
+            ]
+        }
+        
+        if not flagged:
+            return matrix, summary
+        if outliers == 'exclude':
+            excluded = set(flagged)
+            return self._component_matrix(
+                [analysis for row, analysis in enumerate(matrix.analyses) if row not in excluded]
+            ), summary
+        
+        matrix.weights = matrix.weights * factors
+        return matrix, summary
+    
+    def load_analyses(self, material_id: int, analysis_ids: Optional[List[int]] = None) -> List[ChromatographicAnalysis]:
+        """
+        Processed analyses of a material with their parsed data, ordered by ID
+        
+        Raises:
+            ValueError: If there are no processed analyses
+        """
         query = self.db.query(ChromatographicAnalysis).filter(
             ChromatographicAnalysis.material_id == material_id,
             ChromatographicAnalysis.is_processed == 1
@@ -45,35 +406,152 @@ class CompositeCalculator:
         if analysis_ids:
             query = query.filter(ChromatographicAnalysis.id.in_(analysis_ids))
         
-        analyses = query.all()
+        analyses = query.order_by(ChromatographicAnalysis.id).all()
         
         if not analyses:
             raise ValueError(f"No processed analyses found for material {material_id}")
         
-        # Aggregate components from all analyses
-        aggregated = self._aggregate_analyses(analyses)
+        return analyses
+    
+    def calculate_bulk(
+        self,
+        material_ids: Optional[List[int]] = None,
+        material_type: Optional[str] = None,
+        supplier: Optional[str] = None,
+        active_only: bool = True,
+        notes: Optional[str] = None,
+        outliers: Optional[str] = None,
+        all_materials: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Calculate composites for many materials from all their processed analyses
+        
+        Materials, analyses and component statistics are each loaded with
+        one query for the whole batch, and all versions are allocated with
+        one statement, whatever the number of materials. Only materials whose statistics are out of date cost
+        extra queries. Outlier screening needs each material's matrix rather
+        than its statistics, so then the analyses query loads the parsed
+        data too and no statistics are read.
+        
+        Args:
+            material_ids: Materials to recalculate
+            material_type: Only materials of this type
+            supplier: Only materials from this supplier
+            active_only: Skip inactive materials
+            notes: Optional notes for the composites
+            outliers: Handling of outlier analyses, one of OUTLIER_HANDLINGS
+                (None = settings.OUTLIER_HANDLING)
+            all_materials: Recalculate every material matching active_only
+                when neither material_ids nor a filter is given
+        
+        Returns:
+            One dictionary per material with material_id and either
+            composite (not yet saved to DB) or error
+        
+        Raises:
+            ValueError: If no materials, filter or all_materials are given,
+                or the outlier handling is unknown
+        """
+        if not (material_ids or material_type or supplier or all_materials):
+            raise ValueError("Give material_ids, a material_type or supplier filter, or set all_materials")
+        outliers = self.outlier_handling(outliers)
+        
+        query = self.db.query(Material.id)
+        if material_ids:
+            query = query.filter(Material.id.in_(material_ids))
+        if material_type:
+            query = query.filter(Material.material_type == material_type)
+        if supplier:
+            query = query.filter(Material.supplier == supplier)
+        if active_only:
+            query = query.filter(Material.is_active.is_(True))
+        
+        found_ids = [row.id for row in query.order_by(Material.id).all()]
         
-        # Get next version number
-        max_version = self.db.query(Composite.version).filter(
-            Composite.material_id == material_id
-        ).order_by(Composite.version.desc()).first()
+        if material_ids:
+            found = set(found_ids)
+            requested_ids = list(dict.fromkeys(material_ids))
+            missing_ids = [material_id for material_id in requested_ids if material_id not in found]
+        else:
+            requested_ids = found_ids
+            missing_ids = []
         
-        next_version = (max_version[0] + 1) if max_version else 1
+        # Analyses of all materials: metadata only, unless screening needs the parsed data
+        if outliers == 'none':
+            columns = (
+                ChromatographicAnalysis.id,
+                ChromatographicAnalysis.material_id,
+                ChromatographicAnalysis.batch_number,
+                ChromatographicAnalysis.supplier
+            )
+        else:
+            columns = (ChromatographicAnalysis,)
+        
+        analyses_by_material: Dict[int, List[Any]] = {material_id: [] for material_id in found_ids}
+        for analysis in self.db.query(*columns).filter(
+            ChromatographicAnalysis.material_id.in_(found_ids),
+            ChromatographicAnalysis.is_processed == 1
+        ).order_by(ChromatographicAnalysis.material_id, ChromatographicAnalysis.id):
+            analyses_by_material[analysis.material_id].append(analysis)
+        
+        with_analyses = [material_id for material_id in found_ids if analyses_by_material[material_id]]
+        
+        # Component statistics of all materials
+        rows_by_material: Dict[int, List[ComponentStatistics]] = {material_id: [] for material_id in with_analyses}
+        if outliers == 'none':
+            self._sync_statistics(with_analyses)
+            for row in self.db.query(ComponentStatistics).filter(
+                ComponentStatistics.material_id.in_(with_analyses)
+            ).order_by(ComponentStatistics.material_id, ComponentStatistics.id):
+                rows_by_material[row.material_id].append(row)
         
+        results = []
+        for material_id in requested_ids:
+            if material_id in missing_ids:
+                results.append({'material_id': material_id, 'error': f"Material {material_id} not found"})
+                continue
+            
+            analyses = analyses_by_material[material_id]
+            if not analyses:
+                results.append({
+                    'material_id': material_id,
+                    'error': f"No processed analyses found for material {material_id}"
+                })
+                continue
+            
+            if outliers == 'none':
+                metadata, aggregated = self.lab_metadata(analyses), self._statistics_components(rows_by_material[material_id])
+            else:
+                metadata, aggregated = self._aggregate_screened(analyses, outliers)
+            
+            composite = self._build_lab_composite(material_id, None, metadata, aggregated, notes)
+            results.append({'material_id': material_id, 'composite': composite})
+        
+        # Versions of all materials in one statement, once everything is aggregated
+        versions = allocate_versions(self.db, with_analyses)
+        for item in results:
+            if 'composite' in item:
+                item['composite'].version = versions[item['material_id']]
+        
+        return results
+    
+    def _build_lab_composite(
+        self,
+        material_id: int,
+        version: Optional[int],
+        metadata: Dict[str, Any],
+        aggregated: List[Dict[str, Any]],
+        notes: Optional[str] = None
+    ) -> Composite:
+        """Draft LAB composite with its components and analysis metadata"""
         # Create composite
         composite = Composite(
             material_id=material_id,
-            version=next_version,
+            version=version,
             origin=CompositeOrigin.LAB,
             status=CompositeStatus.DRAFT,
             notes=notes,
-            composite_metadata={
-                'analysis_ids': [a.id for a in analyses],
-                'analysis_count': len(analyses),
-                'batches': [a.batch_number for a in analyses if a.batch_number],
-                'suppliers': list(set(a.supplier for a in analyses if a.supplier)),
-                'calculation_method': 'weighted_average'
-            }
+            composite_metadata=metadata
         )
         
         # Create components
@@ -84,72 +562,165 @@ class CompositeCalculator:
         
         return composite
     
-    def _aggregate_analyses(self, analyses: List[ChromatographicAnalysis]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def lab_metadata(
+        analyses: List[Any],
+        bootstrap: bool = False,
+        outliers: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Composite metadata describing the analyses a LAB composite comes from"""
+        metadata = {
+            'analysis_ids': [a.id for a in analyses],
+            'analysis_count': len(analyses),
+            'batches': [a.batch_number for a in analyses if a.batch_number],
+            'suppliers': list(set(a.supplier for a in analyses if a.supplier)),
+            'calculation_method': 'weighted_average'
+        }
+        if bootstrap:
+            metadata['confidence_intervals'] = {
+                'method': 'bootstrap',
+                'confidence': CompositeCalculator.CONFIDENCE_INTERVAL,
+                'resamples': settings.BOOTSTRAP_RESAMPLES,
+                'seed': settings.BOOTSTRAP_SEED
+            }
+        if outliers is not None:
+            metadata['outlier_screening'] = outliers
+        return metadata
+    
+    def _aggregate_analyses(self, analyses: List[ChromatographicAnalysis], bootstrap: bool = False) -> List[Dict[str, Any]]:
         """
         Aggregate multiple chromatographic analyses using weighted average
         
+        All statistics are column reductions over the analyses x components
+        matrix. A component missing from an analysis does not count as 0%
+        there: it is left out of that component's average and spread.
+        
+        Args:
+            analyses: Analyses to aggregate
+            bootstrap: Add bootstrap confidence intervals (ci_lower, ci_upper)
+        
         Returns:
             List of component dictionaries
         """
-        # Organize components by name (and CAS if available)
-        component_data = defaultdict(lambda: {
-            'percentages': [],
-            'weights': [],
-            'cas_numbers': set(),
-            'types': []
-        })
+        return self._aggregate_matrix(self._component_matrix(analyses), bootstrap=bootstrap)
+    
+    def _aggregate_matrix(self, matrix: "ComponentMatrix", bootstrap: bool = False) -> List[Dict[str, Any]]:
+        """_aggregate_analyses over an already built matrix"""
+        if matrix.component_count == 0:
+            return []
         
-        total_weight = sum(a.weight for a in analyses)
+        observations = matrix.counts.sum(axis=0)
         
-        for analysis in analyses:
-            if not analysis.parsed_data or 'components' not in analysis.parsed_data:
-                continue
-            
-            for component in analysis.parsed_data['components']:
-                key = self._get_component_key(component)
-                
-                component_data[key]['percentages'].append(component['percentage'])
-                component_data[key]['weights'].append(analysis.weight)
-                
-                if component.get('cas_number'):
-                    component_data[key]['cas_numbers'].add(component['cas_number'])
-                
-                component_data[key]['types'].append(component.get('component_type', 'COMPONENT'))
-                component_data[key]['name'] = component['component_name']
-        
-        # Calculate weighted averages
-        aggregated_components = []
-        
-        for key, data in component_data.items():
-            # Weighted average
-            weighted_percentage = sum(
-                p * w for p, w in zip(data['percentages'], data['weights'])
-            ) / sum(data['weights'])
-            
-            # Calculate confidence level based on consistency across analyses
-            if len(data['percentages']) > 1:
-                std_dev = statistics.stdev(data['percentages'])
-                mean = statistics.mean(data['percentages'])
-                coefficient_of_variation = (std_dev / mean * 100) if mean > 0 else 100
-                # Higher consistency = higher confidence
-                confidence = max(0, 100 - coefficient_of_variation * 2)
-            else:
-                confidence = 70.0  # Default for single analysis
-            
-            # Determine CAS number (use most common, or first if tie)
-            cas_number = list(data['cas_numbers'])[0] if data['cas_numbers'] else None
-            
-            # Determine type (use most common)
-            component_type = max(set(data['types']), key=data['types'].count) if data['types'] else 'COMPONENT'
-            
-            aggregated_components.append({
-                'component_name': data['name'],
+        # Weighted average over the analyses reporting each component
+        weights = matrix.weights[:, np.newaxis]
+        weight_sums = (matrix.counts * weights).sum(axis=0)
+        means = matrix.percentages.sum(axis=0) / observations
+        weighted_percentages = np.divide(
+            (matrix.percentages * weights).sum(axis=0),
+            weight_sums,
+            out=means.copy(),
+            where=weight_sums != 0
+        )
+        
+        # Sample standard deviation, from deviations to the mean
+        squared_deviations = np.bincount(
+            matrix.columns,
+            weights=(matrix.values - means[matrix.columns]) ** 2,
+            minlength=matrix.component_count
+        )
+        std_devs = np.sqrt(squared_deviations / np.maximum(observations - 1, 1))
+        
+        component_types = [matrix.type_names[i] for i in matrix.type_counts.argmax(axis=1).tolist()]
+        
+        return self._build_components(
+            matrix.keys,
+            matrix.names,
+            matrix.cas_numbers,
+            component_types,
+            weighted_percentages,
+            means,
+            std_devs,
+            observations,
+            intervals=self._bootstrap_intervals(matrix) if bootstrap else None
+        )
+    
+    def _bootstrap_intervals(self, matrix: "ComponentMatrix") -> Optional[np.ndarray]:
+        """
+        Percentile bootstrap interval of every component percentage
+        
+        Returns:
+            2 x components array of (lower, upper) bounds, None for a single analysis
+        """
+        if matrix.analysis_count < 2:
+            return None
+        
+        estimates = matrix.bootstrap_percentages(settings.BOOTSTRAP_RESAMPLES, settings.BOOTSTRAP_SEED)
+        tail = (1 - self.CONFIDENCE_INTERVAL) / 2
+        return np.quantile(estimates, [tail, 1 - tail], axis=0)
+    
+    def _build_components(
+        self,
+        keys: List[str],
+        names: List[str],
+        cas_numbers: List[Optional[str]],
+        component_types: List[str],
+        weighted_percentages: np.ndarray,
+        means: np.ndarray,
+        std_devs: np.ndarray,
+        observations: np.ndarray,
+        intervals: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Component dictionaries from per-component statistics, sorted and normalized to 100%
+        
+        Components keyed by a catalog entry take its name and CAS number.
+        Interval bounds (2 x components) come from normalized resamples and
+        are stored as they are.
+        
+        Returns:
+            List of component dictionaries
+        """
+        identities = [self.identity_index.canonical(key) for key in keys]
+        names = [identity[0] if identity else name for identity, name in zip(identities, names)]
+        cas_numbers = [
+            (identity[1] or cas_number) if identity else cas_number
+            for identity, cas_number in zip(identities, cas_numbers)
+        ]
+
+        # Confidence from the coefficient of variation
+        positive = means > 0
+        coefficients_of_variation = np.full(len(means), 100.0)
+        coefficients_of_variation[positive] = std_devs[positive] / means[positive] * 100
+        # Higher consistency = higher confidence; 70 is the default for a single analysis
+        confidences = np.where(
+            observations > 1,
+            np.maximum(0, 100 - coefficients_of_variation * 2),
+            70.0
+        )
+        
+        aggregated_components = [
+            {
+                'component_name': name,
                 'cas_number': cas_number,
-                'percentage': round(weighted_percentage, 4),
+                'percentage': round(percentage, 4),
                 'component_type': component_type,
                 'confidence_level': round(confidence, 2),
-                'notes': f'Aggregated from {len(data["percentages"])} analyses'
-            })
+                'notes': f'Aggregated from {count} analyses'
+            }
+            for name, cas_number, percentage, component_type, confidence, count in zip(
+                names,
+                cas_numbers,
+                weighted_percentages.tolist(),
+                component_types,
+                confidences.tolist(),
+                observations.tolist()
+            )
+        ]
+        
+        if intervals is not None:
+            for component, lower, upper in zip(aggregated_components, intervals[0].tolist(), intervals[1].tolist()):
+                component['ci_lower'] = round(lower, 4)
+                component['ci_upper'] = round(upper, 4)
         
         # Sort by percentage (descending)
         aggregated_components.sort(key=lambda x: x['percentage'], reverse=True)
@@ -163,17 +734,391 @@ class CompositeCalculator:
         
         return aggregated_components
     
+    def _component_matrix(self, analyses: List[ChromatographicAnalysis]) -> "ComponentMatrix":
+        """Build the analyses x components matrix, keyed like _get_component_key"""
+        return ComponentMatrix(analyses, self.identity_index.component_key)
+    
+    def _aggregate_sql(self, material_id: int, analysis_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate processed analyses inside PostgreSQL (jsonb)
+        
+        Only one row per component is transferred instead of every
+        parsed_data document. Gives the same result as _aggregate_analyses.
+        
+        Returns:
+            List of component dictionaries
+        """
+        rows = aggregate_components(self.db, material_id, analysis_ids)
+        if not rows:
+            return []
+        
+        weight_sums = np.array([row['sum_weight'] or 0.0 for row in rows], dtype=np.float64)
+        weighted_sums = np.array([row['sum_weighted_percentage'] or 0.0 for row in rows], dtype=np.float64)
+        means = np.array([row['mean'] for row in rows], dtype=np.float64)
+        
+        return self._build_components(
+            [row['component_key'] for row in rows],
+            [row['component_name'] for row in rows],
+            [row['cas_number'] for row in rows],
+            [row['component_type'] for row in rows],
+            np.divide(weighted_sums, weight_sums, out=means.copy(), where=weight_sums != 0),
+            means,
+            np.array([row['std_dev'] for row in rows], dtype=np.float64),
+            np.array([row['observation_count'] for row in rows], dtype=np.int64)
+        )
+    
+    def _aggregate_statistics(self, material_id: int) -> List[Dict[str, Any]]:
+        """
+        Aggregate all processed analyses of a material from its component statistics
+        
+        O(components): parsed_data is only read for analyses the statistics
+        do not include yet. Gives the same result as _aggregate_analyses
+        over the same analyses.
+        
+        Returns:
+            List of component dictionaries
+        """
+        self.sync_statistics(material_id)
+        
+        rows = self.db.query(ComponentStatistics).filter(
+            ComponentStatistics.material_id == material_id
+        ).order_by(ComponentStatistics.id).all()
+        
+        return self._statistics_components(rows)
+    
+    def _statistics_components(self, rows: List[ComponentStatistics]) -> List[Dict[str, Any]]:
+        """Component dictionaries from the component statistics rows of one material"""
+        if not rows:
+            return []
+        
+        observations = np.array([row.observation_count for row in rows], dtype=np.int64)
+        weight_sums = np.array([row.sum_weight for row in rows], dtype=np.float64)
+        weighted_sums = np.array([row.sum_weighted_percentage for row in rows], dtype=np.float64)
+        sums = np.array([row.sum_percentage for row in rows], dtype=np.float64)
+        squared_sums = np.array([row.sum_squared_percentage for row in rows], dtype=np.float64)
+        
+        means = sums / observations
+        weighted_percentages = np.divide(weighted_sums, weight_sums, out=means.copy(), where=weight_sums != 0)
+        
+        # Σ(p - mean)² = Σp² - mean·Σp, clipped against rounding below zero
+        squared_deviations = np.maximum(squared_sums - means * sums, 0.0)
+        std_devs = np.sqrt(squared_deviations / np.maximum(observations - 1, 1))
+        
+        # Most common type; ties go to the type seen first
+        component_types = [max(row.type_counts, key=row.type_counts.get) for row in rows]
+        
+        return self._build_components(
+            [row.component_key for row in rows],
+            [row.component_name for row in rows],
+            [row.cas_number for row in rows],
+            component_types,
+            weighted_percentages,
+            means,
+            std_devs,
+            observations
+        )
+    
+    def record_analysis(self, analysis: ChromatographicAnalysis) -> bool:
+        """
+        Add a processed analysis to the component statistics of its material
+        
+        Idempotent: an analysis that is already included is not added again.
+        Call before the commit that creates or reprocesses the analysis.
+        
+        Returns:
+            True if the statistics changed
+        """
+        if analysis.is_processed != 1:
+            return False
+        
+        self._lock_statistics(analysis.material_id)
+        
+        source = self.db.query(ComponentStatisticsSource).filter(
+            ComponentStatisticsSource.analysis_id == analysis.id
+        ).first()
+        if source:
+            return False
+        
+        self.db.add(ComponentStatisticsSource(
+            material_id=analysis.material_id,
+            analysis_id=analysis.id,
+            weight=analysis.weight
+        ))
+        self._apply_analysis(analysis, analysis.weight, 1)
+        self.db.flush()
+        return True
+    
+    def forget_analysis(self, analysis: ChromatographicAnalysis) -> bool:
+        """
+        Remove an analysis from the component statistics of its material
+        
+        Must be called while analysis.parsed_data still holds the data the
+        analysis was recorded with (before deleting or reprocessing it).
+        
+        Returns:
+            True if the statistics changed
+        """
+        self._lock_statistics(analysis.material_id)
+        
+        source = self.db.query(ComponentStatisticsSource).filter(
+            ComponentStatisticsSource.analysis_id == analysis.id
+        ).first()
+        if not source:
+            return False
+        
+        self._apply_analysis(analysis, source.weight, -1)
+        self.db.delete(source)
+        self.db.flush()
+        return True
+    
+    def sync_statistics(self, material_id: int) -> int:
+        """
+        Bring the component statistics of a material up to date
+        
+        Records processed analyses that are not included yet (analyses
+        created before the statistics existed, or by code that bypasses
+        record_analysis). If an included analysis no longer exists or is no
+        longer processed, the statistics are rebuilt.
+        
+        The check runs without a lock first; when there is pending work the
+        material is locked and checked again, so concurrent calculations
+        never record an analysis twice.
+        
+        Returns:
+            Number of analyses recorded or rebuilt
+        """
+        return self._sync_statistics([material_id])
+    
+    def _sync_statistics(self, material_ids: List[int]) -> int:
+        """
+        sync_statistics for several materials, with two queries when all are up to date
+        
+        Materials with pending work are locked in ID order and checked again
+        under the lock, so concurrent calculations neither record an
+        analysis twice nor deadlock.
+        """
+        if not material_ids:
+            return 0
+        
+        stale_ids, missing = self._pending_statistics(material_ids)
+        if not stale_ids and not missing:
+            return 0
+        
+        pending_ids = sorted(set(stale_ids) | {analysis.material_id for analysis in missing})
+        self._lock_statistics(*pending_ids)
+        stale_ids, missing = self._pending_statistics(pending_ids)
+        
+        synced = sum(self.rebuild_statistics(material_id) for material_id in stale_ids)
+        synced += sum(
+            self.record_analysis(analysis)
+            for analysis in missing
+            if analysis.material_id not in stale_ids
+        )
+        return synced
+    
+    def _pending_statistics(self, material_ids: List[int]) -> Tuple[List[int], List[ChromatographicAnalysis]]:
+        """
+        Statistics work of several materials
+        
+        Returns:
+            Tuple of (materials whose statistics include analyses that are
+            gone or no longer processed; processed analyses not included yet)
+        """
+        included = self.db.query(ComponentStatisticsSource.analysis_id).filter(
+            ComponentStatisticsSource.material_id.in_(material_ids)
+        )
+        processed = self.db.query(ChromatographicAnalysis.id).filter(
+            ChromatographicAnalysis.material_id.in_(material_ids),
+            ChromatographicAnalysis.is_processed == 1
+        )
+        
+        stale_ids = [
+            row.material_id
+            for row in self.db.query(ComponentStatisticsSource.material_id).filter(
+                ComponentStatisticsSource.material_id.in_(material_ids),
+                ~ComponentStatisticsSource.analysis_id.in_(processed)
+            ).distinct()
+        ]
+        
+        missing = self.db.query(ChromatographicAnalysis).filter(
+            ChromatographicAnalysis.material_id.in_(material_ids),
+            ChromatographicAnalysis.is_processed == 1,
+            ~ChromatographicAnalysis.id.in_(included)
+        ).order_by(ChromatographicAnalysis.id).all()
+        
+        return stale_ids, missing
+    
+    def rebuild_statistics(self, material_id: int) -> int:
+        """
+        Recompute the component statistics of a material from all its processed analyses
+        
+        Returns:
+            Number of analyses included
+        """
+        self._lock_statistics(material_id)
+        
+        self.db.query(ComponentStatistics).filter(
+            ComponentStatistics.material_id == material_id
+        ).delete(synchronize_session=False)
+        self.db.query(ComponentStatisticsSource).filter(
+            ComponentStatisticsSource.material_id == material_id
+        ).delete(synchronize_session=False)
+        
+        if supports_sql_aggregation(self.db):
+            # Sums come straight from the database, parsed_data stays there
+            analyses = self.db.query(ChromatographicAnalysis.id, ChromatographicAnalysis.weight).filter(
+                ChromatographicAnalysis.material_id == material_id,
+                ChromatographicAnalysis.is_processed == 1
+            ).all()
+            rows = [
+                ComponentStatistics(
+                    material_id=material_id,
+                    **{column: row[column] for column in self.STATISTICS_COLUMNS}
+                )
+                for row in aggregate_components(self.db, material_id)
+            ]
+        else:
+            analyses = self.db.query(ChromatographicAnalysis).filter(
+                ChromatographicAnalysis.material_id == material_id,
+                ChromatographicAnalysis.is_processed == 1
+            ).order_by(ChromatographicAnalysis.id).all()
+            matrix = self._component_matrix(analyses)
+            rows = self._statistics_rows(material_id, matrix) if matrix.component_count else []
+        
+        self.db.add_all([
+            ComponentStatisticsSource(material_id=material_id, analysis_id=analysis.id, weight=analysis.weight)
+            for analysis in analyses
+        ])
+        self.db.add_all(rows)
+        self.db.flush()
+        
+        return len(analyses)
+    
+    def _lock_statistics(self, *material_ids: int):
+        """
+        Serialize statistics updates of materials until commit
+        
+        Row locks on the materials, taken in ID order. SQLite has no row
+        locks: a write statement (matching no row) takes the database write
+        lock instead, so a concurrent writer only reads after this commits.
+        """
+        material_ids = sorted(set(material_ids))
+        if self.db.get_bind().dialect.name == "sqlite":
+            self.db.execute(update(Material).where(false()).values(id=Material.id))
+            return
+        
+        # FOR NO KEY UPDATE: inserts referencing the material (composites,
+        # version counters) only need a key share lock and must not queue here
+        self.db.query(Material.id).filter(
+            Material.id.in_(material_ids)
+        ).order_by(Material.id).with_for_update(key_share=True).all()
+    
+    def _apply_analysis(self, analysis: ChromatographicAnalysis, weight: float, sign: int):
+        """Add (sign=1) or subtract (sign=-1) the contribution of one analysis"""
+        matrix = self._component_matrix([analysis])
+        if matrix.component_count == 0:
+            return
+        
+        existing = {
+            row.component_key: row
+            for row in self.db.query(ComponentStatistics).filter(
+                ComponentStatistics.material_id == analysis.material_id,
+                ComponentStatistics.component_key.in_(matrix.keys)
+            )
+        }
+        
+        counts = matrix.counts[0].tolist()
+        sums = matrix.percentages[0].tolist()
+        squared_sums = np.bincount(
+            matrix.columns, weights=matrix.values ** 2, minlength=matrix.component_count
+        ).tolist()
+        
+        for column, key in enumerate(matrix.keys):
+            row = existing.get(key)
+            if row is None:
+                if sign < 0:
+                    continue
+                row = ComponentStatistics(
+                    material_id=analysis.material_id,
+                    component_key=key,
+                    component_name=matrix.names[column],
+                    cas_number=matrix.cas_numbers[column],
+                    name_analysis_id=analysis.id,
+                    observation_count=0,
+                    sum_weight=0.0,
+                    sum_weighted_percentage=0.0,
+                    sum_percentage=0.0,
+                    sum_squared_percentage=0.0,
+                    type_counts={}
+                )
+                self.db.add(row)
+            
+            row.observation_count += sign * counts[column]
+            if row.observation_count <= 0:
+                self.db.delete(row)
+                continue
+            
+            row.sum_weight += sign * counts[column] * weight
+            row.sum_weighted_percentage += sign * sums[column] * weight
+            row.sum_percentage += sign * sums[column]
+            row.sum_squared_percentage += sign * squared_sums[column]
+            
+            type_counts = dict(row.type_counts)
+            for type_index, count in enumerate(matrix.type_counts[column].tolist()):
+                if count:
+                    type_name = matrix.type_names[type_index]
+                    type_counts[type_name] = type_counts.get(type_name, 0) + sign * count
+            row.type_counts = {name: count for name, count in type_counts.items() if count > 0}
+            
+            if sign > 0:
+                # Latest analysis names the component, as in a full recalculation
+                if analysis.id >= (row.name_analysis_id or 0):
+                    row.component_name = matrix.names[column]
+                    row.name_analysis_id = analysis.id
+                if not row.cas_number:
+                    row.cas_number = matrix.cas_numbers[column]
+    
+    def _statistics_rows(self, material_id: int, matrix: "ComponentMatrix") -> List[ComponentStatistics]:
+        """Component statistics rows for all columns of a matrix"""
+        weights = matrix.weights[:, np.newaxis]
+        counts = matrix.counts.sum(axis=0).tolist()
+        weight_sums = (matrix.counts * weights).sum(axis=0).tolist()
+        weighted_sums = (matrix.percentages * weights).sum(axis=0).tolist()
+        sums = matrix.percentages.sum(axis=0).tolist()
+        squared_sums = np.bincount(
+            matrix.columns, weights=matrix.values ** 2, minlength=matrix.component_count
+        ).tolist()
+        
+        # Row of the last analysis reporting each component
+        last_rows = (matrix.analysis_count - 1 - (matrix.counts[::-1] > 0).argmax(axis=0)).tolist()
+        
+        return [
+            ComponentStatistics(
+                material_id=material_id,
+                component_key=key,
+                component_name=matrix.names[column],
+                cas_number=matrix.cas_numbers[column],
+                name_analysis_id=matrix.analyses[last_rows[column]].id,
+                observation_count=counts[column],
+                sum_weight=weight_sums[column],
+                sum_weighted_percentage=weighted_sums[column],
+                sum_percentage=sums[column],
+                sum_squared_percentage=squared_sums[column],
+                type_counts={
+                    matrix.type_names[type_index]: count
+                    for type_index, count in enumerate(matrix.type_counts[column].tolist())
+                    if count
+                }
+            )
+            for column, key in enumerate(matrix.keys)
+        ]
+    
     def _get_component_key(self, component: Dict[str, Any]) -> str:
         """
         Generate a unique key for a component
-        Prioritize CAS number, fall back to name
+        Catalog entry of its CAS number or name first, then CAS number, then name
         """
-        cas = component.get('cas_number')
-        name = component.get('component_name', '').lower().strip()
-        
-        if cas:
-            return f"cas_{cas}"
-        return f"name_{name}"
+        return self.identity_index.resolve(component)
     
     def calculate_from_documents(
         self,
@@ -188,7 +1133,7 @@ class CompositeCalculator:
             material_id: ID of the material
             components_data: List of component dictionaries
             notes: Optional notes
-            
+        
         Returns:
             Composite object
         """
@@ -198,11 +1143,7 @@ class CompositeCalculator:
             raise ValueError(f"Material {material_id} not found")
         
         # Get next version
-        max_version = self.db.query(Composite.version).filter(
-            Composite.material_id == material_id
-        ).order_by(Composite.version.desc()).first()
-        
-        next_version = (max_version[0] + 1) if max_version else 1
+        next_version = allocate_version(self.db, material_id)
         
         # Create composite
         composite = Composite(
@@ -1,16 +1,48 @@
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+import numpy as np
 
-from app.models.composite import Composite, CompositeComponent
+from app.models.composite import Composite, CompositeComponent, ComponentType
 from app.schemas.composite import ComponentComparison, CompositeCompareResponse
-from app.core.config import settings
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+from app.services.comparison_cache import ComparisonCache, IMMUTABLE_STATUSES, get_comparison_cache
+from app.services.significance import SignificanceEngine, REASONS, get_significance_engine
 
 
 class CompositeComparator:
-    """Service for comparing composite versions"""
+    """
+    Service for comparing composite versions
     
-    def __init__(self, db: Session):
+    Which changes are reported and which are significant is decided by the
+    significance rules (see SignificanceEngine), for single comparisons,
+    version histories and the periodic review alike.
+    """
+    
+    def __init__(
+        self,
+        db: Session,
+        identity_index: Optional[ComponentIdentityIndex] = None,
+        cache: Optional[ComparisonCache] = None,
+        engine: Optional[SignificanceEngine] = None
+    ):
         self.db = db
+        self._identity_index = identity_index
+        self._engine = engine
+        self.cache = cache if cache is not None else get_comparison_cache()
+    
+    @property
+    def identity_index(self) -> ComponentIdentityIndex:
+        """Component catalog index resolving component keys"""
+        if self._identity_index is None:
+            self._identity_index = get_identity_index(self.db)
+        return self._identity_index
+    
+    @property
+    def engine(self) -> SignificanceEngine:
+        """Compiled significance rules"""
+        if self._engine is None:
+            self._engine = get_significance_engine(self.db)
+        return self._engine
     
     def compare_composites(
         self,
@@ -20,6 +52,10 @@ class CompositeComparator:
         """
         Compare two composite versions
         
+        Comparisons are cached (see ComparisonCache). A hit runs four
+        queries: the state of both composites, and the fingerprints of the
+        catalog (two) and of the rules that get_significance_engine checks.
+        
         Args:
             old_composite_id: ID of the old composite
             new_composite_id: ID of the new composite
@@ -27,6 +63,50 @@ class CompositeComparator:
         Returns:
             CompositeCompareResponse with comparison details
         """
+        key, permanent = self._cache_key(old_composite_id, new_composite_id)
+        composite_ids = (old_composite_id, new_composite_id)
+        
+        comparison = self.cache.get(key, composite_ids, permanent)
+        if comparison is None:
+            comparison = self._compare_composites(old_composite_id, new_composite_id)
+            self.cache.put(key, composite_ids, comparison, permanent)
+        
+        return comparison
+    
+    def _cache_key(self, old_composite_id: int, new_composite_id: int) -> Tuple[str, bool]:
+        """
+        Cache key of a comparison, and whether it can be kept forever
+        
+        APPROVED and ARCHIVED composites never change, so their state is
+        just "final"; other composites add their status and last change.
+        The version of the significance rules (which covers the catalog)
+        completes the key.
+        """
+        rows = {
+            row.id: row
+            for row in self.db.query(
+                Composite.id,
+                Composite.status,
+                Composite.updated_at,
+                Composite.created_at
+            ).filter(Composite.id.in_([old_composite_id, new_composite_id]))
+        }
+        if old_composite_id not in rows or new_composite_id not in rows:
+            raise ValueError("One or both composites not found")
+        
+        states = []
+        for composite_id in (old_composite_id, new_composite_id):
+            row = rows[composite_id]
+            if row.status in IMMUTABLE_STATUSES:
+                states.append(f"{composite_id}@final")
+            else:
+                states.append(f"{composite_id}@{row.status.value}-{row.updated_at or row.created_at}")
+        
+        key = ":".join(states + [self.engine.version])
+        return key, all(state.endswith("@final") for state in states)
+    
+    def _compare_composites(self, old_composite_id: int, new_composite_id: int) -> CompositeCompareResponse:
+        """Comparison of two composites, without the cache"""
         # Get composites
         old_composite = self.db.query(Composite).filter(
             Composite.id == old_composite_id
@@ -38,79 +118,203 @@ class CompositeComparator:
         if not old_composite or not new_composite:
             raise ValueError("One or both composites not found")
         
-        # Create component maps
-        old_components = self._create_component_map(old_composite.components)
-        new_components = self._create_component_map(new_composite.components)
-        
-        # Find changes
-        components_added = []
-        components_removed = []
-        components_changed = []
-        
-        # Check for removed components
-        for key, old_comp in old_components.items():
-            if key not in new_components:
-                components_removed.append(ComponentComparison(
-                    component_name=old_comp.component_name,
-                    cas_number=old_comp.cas_number,
-                    old_percentage=old_comp.percentage,
-                    new_percentage=None,
-                    change=-old_comp.percentage,
-                    change_percent=-100.0
-                ))
-        
-        # Check for added and changed components
-        for key, new_comp in new_components.items():
-            if key not in old_components:
-                # Added component
-                components_added.append(ComponentComparison(
-                    component_name=new_comp.component_name,
-                    cas_number=new_comp.cas_number,
-                    old_percentage=None,
-                    new_percentage=new_comp.percentage,
-                    change=new_comp.percentage,
-                    change_percent=None
-                ))
-            else:
-                # Potentially changed component
-                old_comp = old_components[key]
-                percentage_change = new_comp.percentage - old_comp.percentage
-                
-                if abs(percentage_change) > 0.01:  # More than 0.01% change
-                    change_percent = (percentage_change / old_comp.percentage * 100) if old_comp.percentage > 0 else 0
-                    
-                    components_changed.append(ComponentComparison(
-                        component_name=new_comp.component_name,
-                        cas_number=new_comp.cas_number,
-                        old_percentage=old_comp.percentage,
-                        new_percentage=new_comp.percentage,
-                        change=percentage_change,
-                        change_percent=change_percent
-                    ))
-        
-        # Calculate total change score
-        total_change_score = sum(abs(c.change) for c in components_changed)
-        total_change_score += sum(abs(c.change) for c in components_added)
-        total_change_score += sum(abs(c.change) for c in components_removed)
-        
-        # Determine if changes are significant
-        significant_changes = total_change_score >= settings.COMPOSITE_THRESHOLD_PERCENT
+        return self.compare_components(old_composite, new_composite)
+    
+    def compare_components(self, old_composite: Composite, new_composite: Composite) -> CompositeCompareResponse:
+        """
+        Compare the components of two composite objects (not cached)
+        
+        Works on composites that are not committed yet, e.g. the one the
+        periodic review recalculates, with the same rules as compare_composites.
+        
+        Args:
+            old_composite: Old composite
+            new_composite: New composite
+            
+        Returns:
+            CompositeCompareResponse with comparison details
+        """
+        composites = [old_composite, new_composite]
+        percentages, present, cells, rules = self._version_matrix(composites)
+        evaluation = self.engine.evaluate(percentages[0], percentages[1], present[0], present[1], rules)
+        
+        return self._response(composites, 0, 1, percentages, cells, evaluation)
+    
+    def compare_history(self, material_id: int) -> Dict[str, Any]:
+        """
+        Compare every composite version of a material with every other one
+        
+        All versions are loaded with their components in one joined query
+        and laid out as a versions x components matrix, so the pairwise
+        change scores are computed on whole rows at once. Each score is the
+        total_change_score compare_composites gives for that pair.
+        
+        Args:
+            material_id: ID of the material
+            
+        Returns:
+            Dictionary with material_id, versions (oldest first), change_scores
+            (versions x versions) and consecutive (CompositeCompareResponse of
+            every version against the previous one)
+        """
+        composites = self.db.query(Composite).options(
+            joinedload(Composite.components)
+        ).filter(
+            Composite.material_id == material_id
+        ).order_by(Composite.version).all()
+        
+        if not composites:
+            raise ValueError(f"No composites found for material {material_id}")
+        
+        percentages, present, cells, rules = self._version_matrix(composites)
+        
+        change_scores = np.vstack([
+            self._row_changes(percentages, present, rules, row).sum(axis=1)
+            for row in range(len(composites))
+        ])
+        
+        # All consecutive pairs are evaluated at once
+        evaluation = self.engine.evaluate(percentages[:-1], percentages[1:], present[:-1], present[1:], rules)
+        consecutive = [
+            self._response(
+                composites, row - 1, row, percentages, cells,
+                {name: values[row - 1] for name, values in evaluation.items()}
+            )
+            for row in range(1, len(composites))
+        ]
+        
+        return {
+            'material_id': material_id,
+            'versions': [
+                {
+                    'composite_id': composite.id,
+                    'version': composite.version,
+                    'status': composite.status,
+                    'origin': composite.origin,
+                    'approved_at': composite.approved_at,
+                    'component_count': int(present[row].sum())
+                }
+                for row, composite in enumerate(composites)
+            ],
+            'change_scores': np.round(change_scores, 2).tolist(),
+            'consecutive': consecutive
+        }
+    
+    def _version_matrix(
+        self,
+        composites: List[Composite]
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[Tuple[int, int], CompositeComponent], np.ndarray]:
+        """
+        Percentages of composites as a composites x components matrix
+        
+        Columns follow the component keys of _create_component_map. The
+        rule of a column is looked up with the type of its component in the
+        last composite having it.
+        
+        Returns:
+            Tuple of (percentages, presence mask, component of every (row, column)
+            present, significance rule row of every column)
+        """
+        columns: Dict[str, int] = {}
+        types: Dict[str, Optional[ComponentType]] = {}
+        cells: Dict[Tuple[int, int], CompositeComponent] = {}
+        
+        for row, composite in enumerate(composites):
+            for key, component in self._create_component_map(composite.components).items():
+                cells[(row, columns.setdefault(key, len(columns)))] = component
+                types[key] = component.component_type
+        
+        percentages = np.zeros((len(composites), len(columns)))
+        present = np.zeros((len(composites), len(columns)), dtype=bool)
+        if cells:
+            rows, cols = zip(*cells)
+            percentages[rows, cols] = [component.percentage for component in cells.values()]
+            present[rows, cols] = True
         
+        rules = self.engine.rule_rows(list(columns), [types[key] for key in columns])
+        return percentages, present, cells, rules
+    
+    def _row_changes(self, percentages: np.ndarray, present: np.ndarray, rules: np.ndarray, row: int) -> np.ndarray:
+        """
+        Absolute component changes between one composite and every composite
+        
+        Added and removed components count in full; components present in
+        both count when they moved by more than the min_change of their rule.
+        """
+        return self.engine.evaluate(percentages[row], percentages, present[row], present, rules)['counted']
+    
+    def _response(
+        self,
+        composites: List[Composite],
+        old_row: int,
+        new_row: int,
+        percentages: np.ndarray,
+        cells: Dict[Tuple[int, int], CompositeComponent],
+        evaluation: Dict[str, np.ndarray]
+    ) -> CompositeCompareResponse:
+        """Comparison of two rows of a version matrix from their SignificanceEngine.evaluate arrays"""
+        old_values = percentages[old_row].tolist()
+        new_values = percentages[new_row].tolist()
+        reasons = evaluation['reason'].tolist()
+        
+        def comparisons(mask, old=True, new=True):
+            return [
+                self._comparison(
+                    cells[(new_row, column) if new else (old_row, column)],
+                    old_values[column] if old else None,
+                    new_values[column] if new else None,
+                    reasons[column]
+                )
+                for column in np.flatnonzero(mask).tolist()
+            ]
+        
+        total_change_score = float(evaluation['counted'].sum())
         return CompositeCompareResponse(
-            old_composite_id=old_composite_id,
-            new_composite_id=new_composite_id,
-            old_version=old_composite.version,
-            new_version=new_composite.version,
-            components_added=components_added,
-            components_removed=components_removed,
-            components_changed=components_changed,
-            significant_changes=significant_changes,
+            old_composite_id=composites[old_row].id,
+            new_composite_id=composites[new_row].id,
+            old_version=composites[old_row].version,
+            new_version=composites[new_row].version,
+            components_added=comparisons(evaluation['added'], old=False),
+            components_removed=comparisons(evaluation['removed'], new=False),
+            components_changed=comparisons(evaluation['changed']),
+            significant_changes=self.engine.is_significant(total_change_score, int(evaluation['significant'].sum())),
             total_change_score=round(total_change_score, 2)
         )
     
+    @staticmethod
+    def _comparison(
+        component: CompositeComponent,
+        old_percentage: Optional[float],
+        new_percentage: Optional[float],
+        reason: int = -1
+    ) -> ComponentComparison:
+        """
+        Comparison of a component (named after `component`); a None percentage means added or removed
+        
+        reason is the index into REASONS of the rule the change broke, -1 if none.
+        """
+        if new_percentage is None:
+            change, change_percent = -old_percentage, -100.0
+        elif old_percentage is None:
+            change, change_percent = new_percentage, None
+        else:
+            change = new_percentage - old_percentage
+            change_percent = (change / old_percentage * 100) if old_percentage > 0 else 0
+        
+        return ComponentComparison(
+            component_name=component.component_name,
+            cas_number=component.cas_number,
+            old_percentage=old_percentage,
+            new_percentage=new_percentage,
+            change=change,
+            change_percent=change_percent,
+            significant=reason >= 0,
+            significance=REASONS[reason] if reason >= 0 else None
+        )
+    
     def _create_component_map(self, components: List[CompositeComponent]) -> Dict[str, CompositeComponent]:
         """
-        Create a map of components keyed by CAS or name
+        Create a map of components keyed by catalog entry, CAS or name
         
         Returns:
             Dictionary mapping component key to CompositeComponent
@@ -118,12 +322,8 @@ class CompositeComparator:
         component_map = {}
         
         for component in components:
-            # Use CAS number as key if available, otherwise use normalized name
-            if component.cas_number:
-                key = f"cas_{component.cas_number}"
-            else:
-                key = f"name_{component.component_name.lower().strip()}"
-            
+            # Same keys as the calculator, synonyms share the key of their catalog entry
+            key = self.identity_index.component_key(component.cas_number, component.component_name)
             component_map[key] = component
         
         return component_map
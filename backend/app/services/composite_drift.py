@@ -0,0 +1,308 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import numpy as np
+import hashlib
+import threading
+
+from app.models.composite import Composite, CompositeComponent, CompositeStatus
+from app.models.material import Material
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+from app.services.significance import SignificanceEngine, get_significance_engine
+
+
+class CompositeDriftAnalyzer:
+    """
+    Drift of every material's newest draft composite from its latest approved one
+    
+    Both composites of all materials are found with one window-function
+    query, their components are fetched with a second one, and the change
+    scores of all materials come from one vectorized pass over the
+    (material, component) cells with the significance rules (see
+    SignificanceEngine). Scores and significance are those of
+    CompositeComparator.compare_composites for the same pair (up to the
+    order floats are added in).
+    
+    The ranking is kept per process until a composite, the component
+    catalog or the significance rules change, so paging through it costs
+    one fingerprint query.
+    """
+    
+    def __init__(
+        self,
+        db: Session,
+        identity_index: Optional[ComponentIdentityIndex] = None,
+        engine: Optional[SignificanceEngine] = None
+    ):
+        self.db = db
+        self.identity_index = identity_index if identity_index is not None else get_identity_index(db)
+        self.engine = engine if engine is not None else get_significance_engine(db)
+    
+    def drift(
+        self,
+        skip: int = 0,
+        limit: int = 50,
+        min_score: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of materials ranked by drift (highest change score first)
+        
+        Args:
+            skip: Entries skipped
+            limit: Entries returned
+            min_score: Only materials with at least this change score
+        
+        Returns:
+            Dictionary with total (materials ranked), skip, limit and items
+        
+        Raises:
+            ValueError: If skip or limit is negative
+        """
+        if skip < 0 or limit < 0:
+            raise ValueError("skip and limit must not be negative")
+        
+        ranking = self.ranking()
+        if min_score is not None:
+            ranking = [entry for entry in ranking if entry['change_score'] >= min_score]
+        
+        items = [dict(entry) for entry in ranking[skip:skip + limit]]
+        materials = {
+            material.id: material
+            for material in self.db.query(Material.id, Material.reference_code, Material.name).filter(
+                Material.id.in_([item['material_id'] for item in items])
+            )
+        }
+        for item in items:
+            material = materials[item['material_id']]
+            item['reference_code'] = material.reference_code
+            item['material_name'] = material.name
+        
+        return {
+            'total': len(ranking),
+            'skip': skip,
+            'limit': limit,
+            'items': items
+        }
+    
+    def ranking(self) -> List[Dict[str, Any]]:
+        """Drift of all materials having an approved and a draft composite, highest first"""
+        global _ranking
+        version = _drift_version(self.db, self.engine)
+        
+        with _ranking_lock:
+            if _ranking is not None and _ranking[0] == version:
+                return _ranking[1]
+        
+        ranking = self._compute()
+        with _ranking_lock:
+            _ranking = (version, ranking)
+        return ranking
+    
+    def _compute(self) -> List[Dict[str, Any]]:
+        global _pair_scores
+        ranked = _latest_by_status(self.db).subquery()
+        
+        # Latest approved and newest draft (id, version) of every material
+        latest: Dict[int, List[Optional[Tuple[int, int]]]] = {}
+        for row in self.db.query(ranked).filter(ranked.c.rank == 1):
+            side = 0 if row.status == CompositeStatus.APPROVED else 1
+            latest.setdefault(row.material_id, [None, None])[side] = (row.id, row.version)
+        pairs = [(material_id, approved, draft) for material_id, (approved, draft) in latest.items() if approved and draft]
+        
+        # Components never change once a composite exists, so the scores of
+        # pairs seen before are reused while the catalog and rules stay the same
+        with _ranking_lock:
+            known = _pair_scores[1] if _pair_scores and _pair_scores[0] == self.engine.version else {}
+        missing = [(approved[0], draft[0]) for _, approved, draft in pairs if (approved[0], draft[0]) not in known]
+        if missing:
+            # A full recomputation joins the window query; a few new pairs select their composites
+            scores = self._score_pairs(missing, ranked if len(missing) > len(pairs) // 2 else None)
+            known = {**known, **dict(zip(missing, scores))}
+        known = {(approved[0], draft[0]): known[(approved[0], draft[0])] for _, approved, draft in pairs}
+        with _ranking_lock:
+            _pair_scores = (self.engine.version, known)
+        
+        pairs.sort(key=lambda pair: known[(pair[1][0], pair[2][0])][0], reverse=True)
+        ranking = []
+        for material_id, approved, draft in pairs:
+            score, added, removed, changed, significant = known[(approved[0], draft[0])]
+            ranking.append({
+                'material_id': material_id,
+                'approved_composite_id': approved[0],
+                'approved_version': approved[1],
+                'draft_composite_id': draft[0],
+                'draft_version': draft[1],
+                'change_score': round(score, 2),
+                'components_added': added,
+                'components_removed': removed,
+                'components_changed': changed,
+                'significant_components': significant,
+                'significant_changes': self.engine.is_significant(score, significant)
+            })
+        return ranking
+    
+    def _score_pairs(self, pairs: List[Tuple[int, int]], ranked=None) -> List[Tuple[float, int, int, int, int]]:
+        """
+        (change score, added, removed, changed, significant) of (approved ID, draft ID) pairs
+        
+        Components are streamed in chunks and handled column-wise; component
+        keys are resolved once per distinct CAS/name pair and significance
+        rules once per distinct CAS/name/type.
+        
+        Args:
+            pairs: Composite ID pairs to score
+            ranked: Subquery of _latest_by_status covering all the pairs, to
+                select their components with a join instead of ID lists
+        """
+        # Composite ID -> (pair row, side), as sorted arrays for searchsorted
+        cell_composites = np.array(pairs, dtype=np.int64).ravel()
+        order = np.argsort(cell_composites)
+        cell_composites = cell_composites[order]
+        cell_rows = np.repeat(np.arange(len(pairs)), 2)[order]
+        cell_drafts = np.tile([False, True], len(pairs))[order]
+        
+        columns_selected = (
+            CompositeComponent.composite_id,
+            CompositeComponent.cas_number,
+            CompositeComponent.component_name,
+            CompositeComponent.percentage,
+            CompositeComponent.component_type
+        )
+        if ranked is not None:
+            statements = [
+                select(*columns_selected).join(
+                    ranked, ranked.c.id == CompositeComponent.composite_id
+                ).where(ranked.c.rank == 1).order_by(CompositeComponent.id)
+            ]
+        else:
+            ids = cell_composites.tolist()
+            statements = [
+                select(*columns_selected).where(
+                    CompositeComponent.composite_id.in_(ids[start:start + 1000])
+                ).order_by(CompositeComponent.id)
+                for start in range(0, len(ids), 1000)
+            ]
+        
+        keys: Dict[Tuple[Optional[str], str], int] = {}
+        columns: Dict[str, int] = {}
+        rules: Dict[Tuple[Tuple[Optional[str], str], Any], int] = {}
+        rows, drafts, cols, values, cell_rules = [], [], [], [], []
+        connection = self.db.connection().execution_options(yield_per=10000)
+        for statement in statements:
+            for chunk in connection.execute(statement).partitions():
+                identities = list(zip([row[1] for row in chunk], [row[2] for row in chunk]))
+                for identity in set(identities).difference(keys):
+                    key = self.identity_index.component_key(*identity)
+                    keys[identity] = columns.setdefault(key, len(columns))
+                typed = list(zip(identities, [row[4] for row in chunk]))
+                for identity, component_type in set(typed).difference(rules):
+                    key = self.identity_index.component_key(*identity)
+                    rules[(identity, component_type)] = self.engine.rule_row(key, component_type)
+                
+                composite_ids = np.array([row[0] for row in chunk], dtype=np.int64)
+                positions = np.minimum(np.searchsorted(cell_composites, composite_ids), len(cell_composites) - 1)
+                paired = cell_composites[positions] == composite_ids  # False for materials without both composites
+                
+                rows.append(cell_rows[positions[paired]])
+                drafts.append(cell_drafts[positions[paired]])
+                cols.append(np.fromiter(map(keys.__getitem__, identities), dtype=np.int64, count=len(identities))[paired])
+                values.append(np.array([row[3] for row in chunk], dtype=float)[paired])
+                cell_rules.append(np.fromiter(map(rules.__getitem__, typed), dtype=np.int64, count=len(typed))[paired])
+        
+        scores, added, removed, changed, significant = self._scores(
+            self.engine,
+            len(pairs),
+            max(len(columns), 1),
+            np.concatenate(rows) if rows else np.empty(0, dtype=np.int64),
+            np.concatenate(drafts) if drafts else np.empty(0, dtype=bool),
+            np.concatenate(cols) if cols else np.empty(0, dtype=np.int64),
+            np.concatenate(values) if values else np.empty(0),
+            np.concatenate(cell_rules) if cell_rules else np.empty(0, dtype=np.int64)
+        )
+        return list(zip(
+            scores.tolist(),
+            added.astype(int).tolist(),
+            removed.astype(int).tolist(),
+            changed.astype(int).tolist(),
+            significant.astype(int).tolist()
+        ))
+    
+    @staticmethod
+    def _scores(
+        engine: SignificanceEngine,
+        pair_count: int,
+        column_count: int,
+        rows: np.ndarray,
+        drafts: np.ndarray,
+        columns: np.ndarray,
+        values: np.ndarray,
+        rules: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Change score and added/removed/changed/significant counts of every pair (row)
+        
+        Components are compared per (material, column) cell, like
+        compare_composites, with one SignificanceEngine.evaluate over all
+        cells; a cell takes the rule of its draft component if there is one.
+        """
+        cells, cell_index = np.unique(rows * column_count + columns, return_inverse=True)
+        approved = np.zeros(len(cells))
+        draft = np.zeros(len(cells))
+        in_approved = np.zeros(len(cells), dtype=bool)
+        in_draft = np.zeros(len(cells), dtype=bool)
+        cell_rules = np.zeros(len(cells), dtype=np.int64)
+        
+        # Later duplicates of a key overwrite earlier ones, as in _create_component_map
+        approved[cell_index[~drafts]] = values[~drafts]
+        draft[cell_index[drafts]] = values[drafts]
+        in_approved[cell_index[~drafts]] = True
+        in_draft[cell_index[drafts]] = True
+        cell_rules[cell_index[~drafts]] = rules[~drafts]
+        cell_rules[cell_index[drafts]] = rules[drafts]
+        
+        evaluation = engine.evaluate(approved, draft, in_approved, in_draft, cell_rules)
+        
+        pair_of_cell = cells // column_count
+        return tuple(
+            np.bincount(pair_of_cell, weights=evaluation[name], minlength=pair_count)
+            for name in ('counted', 'added', 'removed', 'changed', 'significant')
+        )
+
+
+def _latest_by_status(db: Session):
+    """Approved and draft composites ranked by version within each material and status (rank 1 = latest)"""
+    return db.query(
+        Composite.id,
+        Composite.material_id,
+        Composite.status,
+        Composite.version,
+        func.row_number().over(
+            partition_by=(Composite.material_id, Composite.status),
+            order_by=Composite.version.desc()
+        ).label('rank')
+    ).filter(Composite.status.in_([CompositeStatus.APPROVED, CompositeStatus.DRAFT]))
+
+
+def _drift_version(db: Session, engine: SignificanceEngine) -> str:
+    """
+    Short fingerprint of the composites, the component catalog and the significance rules
+    
+    Count and ID sum per status change with every status change (approval,
+    archival, deletion), even one made within the timestamp tick of the
+    last change or committed by an older transaction.
+    """
+    statuses = db.query(
+        Composite.status,
+        func.count(Composite.id),
+        func.sum(Composite.id),
+        func.max(func.coalesce(Composite.updated_at, Composite.created_at))
+    ).group_by(Composite.status).order_by(Composite.status).all()
+    
+    fingerprint = "-".join(f"{status.value}:{count}:{id_sum}:{last_change}" for status, count, id_sum, last_change in statuses)
+    fingerprint += f"-{engine.version}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+_ranking_lock = threading.Lock()
+_ranking: Optional[Tuple[str, List[Dict[str, Any]]]] = None
+_pair_scores: Optional[Tuple[str, Dict[Tuple[int, int], Tuple[float, int, int, int, int]]]] = None
@@ -0,0 +1,216 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+import hashlib
+import threading
+import time
+
+from app.core.config import settings
+from app.models.chromatographic_analysis import ChromatographicAnalysis
+from app.models.material import Material
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+from app.services.sql_aggregation import supports_sql_aggregation
+
+
+class CompositePreviewCache:
+    """
+    Thread-safe LRU of composite previews with a time to live
+    
+    Entries are keyed by the fingerprint of an analysis set and remember
+    their material and analysis IDs, so they can be dropped when one of
+    those analyses is deleted or reprocessed.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, frozenset, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Cached preview, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[fingerprint]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry[3]
+    
+    def put(self, fingerprint: str, material_id: int, analysis_ids: List[int], preview: Dict[str, Any]):
+        """Store a preview, evicting the least recently used entries beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            self._entries[fingerprint] = (
+                time.monotonic() + self.ttl_seconds, material_id, frozenset(analysis_ids), preview
+            )
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, material_id: int, analysis_id: Optional[int] = None) -> int:
+        """
+        Drop the previews of a material (only those using analysis_id if given)
+        
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [
+                fingerprint
+                for fingerprint, (_, entry_material_id, analysis_ids, _) in self._entries.items()
+                if entry_material_id == material_id and (analysis_id is None or analysis_id in analysis_ids)
+            ]
+            for fingerprint in stale:
+                del self._entries[fingerprint]
+            return len(stale)
+    
+    def clear(self):
+        """Drop all previews"""
+        with self._lock:
+            self._entries.clear()
+
+
+_preview_cache = CompositePreviewCache(
+    settings.COMPOSITE_PREVIEW_CACHE_SIZE,
+    settings.COMPOSITE_PREVIEW_CACHE_TTL
+)
+
+
+def invalidate_composite_previews(material_id: int, analysis_id: Optional[int] = None) -> int:
+    """Drop cached previews after an analysis of the material is deleted or reprocessed"""
+    return _preview_cache.invalidate(material_id, analysis_id)
+
+
+class CompositePreviewer:
+    """
+    Composite previews for analysis subsets, without saving anything
+    
+    Previews are memoized by a fingerprint of the material, the analysis
+    IDs with their last change, the calculation method and the component
+    catalog version. Only the fingerprint queries run on a hit: the
+    analysis IDs with their timestamps, and the two aggregate queries of
+    the catalog version check. Since updated_at is part of the key, a
+    reprocessed analysis also gets a new fingerprint in worker processes
+    that never saw the invalidation.
+    """
+    
+    def __init__(self, db: Session, cache: Optional[CompositePreviewCache] = None):
+        self.db = db
+        self.cache = cache if cache is not None else _preview_cache
+    
+    def preview(
+        self,
+        material_id: int,
+        analysis_ids: Optional[List[int]] = None,
+        bootstrap: bool = False,
+        outliers: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Preview the composite of some processed analyses of a material
+        
+        Args:
+            material_id: ID of the material
+            analysis_ids: Specific analysis IDs to use (None = use all)
+            bootstrap: Add bootstrap confidence intervals to the components
+            outliers: Handling of outlier analyses (None = settings.OUTLIER_HANDLING)
+        
+        Returns:
+            Dictionary with material_id, fingerprint, cached, composite_metadata and components
+        """
+        calculator = CompositeCalculator(self.db)
+        outliers = calculator.outlier_handling(outliers)
+        fingerprint, used_ids = self.fingerprint(
+            material_id, analysis_ids, bootstrap, outliers, identity_index=calculator.identity_index
+        )
+        
+        if fingerprint is not None:
+            preview = self.cache.get(fingerprint)
+            if preview is not None:
+                return dict(preview, cached=True)
+        
+        if not used_ids:
+            # Nothing to aggregate: raise the same errors as a calculation
+            if not self.db.query(Material.id).filter(Material.id == material_id).first():
+                raise ValueError(f"Material {material_id} not found")
+            raise ValueError(f"No processed analyses found for material {material_id}")
+        
+        # Same aggregation path as calculate_from_lab_analyses, so a preview
+        # matches the composite it previews
+        metadata, aggregated = calculator.aggregate_lab_analyses(
+            material_id, used_ids if analysis_ids else None, bootstrap=bootstrap, outliers=outliers
+        )
+        
+        preview = {
+            'material_id': material_id,
+            'fingerprint': fingerprint,
+            'composite_metadata': metadata,
+            'components': aggregated
+        }
+        self.cache.put(fingerprint, material_id, used_ids, preview)
+        
+        return dict(preview, cached=False)
+    
+    def fingerprint(
+        self,
+        material_id: int,
+        analysis_ids: Optional[List[int]] = None,
+        bootstrap: bool = False,
+        outliers: str = 'none',
+        identity_index: Optional[ComponentIdentityIndex] = None
+    ) -> Tuple[Optional[str], List[int]]:
+        """
+        Fingerprint of the processed analyses a preview would use
+        
+        Args:
+            identity_index: Component catalog index the preview aggregates
+                with (None = shared index, checked for catalog changes)
+        
+        Returns:
+            Tuple of (fingerprint, None if there are no analyses; sorted analysis IDs)
+        """
+        query = self.db.query(
+            ChromatographicAnalysis.id,
+            ChromatographicAnalysis.updated_at,
+            ChromatographicAnalysis.created_at
+        ).filter(
+            ChromatographicAnalysis.material_id == material_id,
+            ChromatographicAnalysis.is_processed == 1
+        )
+        if analysis_ids:
+            query = query.filter(ChromatographicAnalysis.id.in_(analysis_ids))
+        
+        rows = query.order_by(ChromatographicAnalysis.id).all()
+        if not rows:
+            return None, []
+        
+        method = "weighted_average:" + ("sql" if supports_sql_aggregation(self.db) else "python")
+        if bootstrap:
+            method += f":bootstrap-{settings.BOOTSTRAP_RESAMPLES}-{settings.BOOTSTRAP_SEED}"
+        if outliers != 'none':
+            method += f":outliers-{outliers}-{settings.OUTLIER_THRESHOLD}"
+        if identity_index is None:
+            identity_index = get_identity_index(self.db)
+        method += f":catalog-{identity_index.version}"
+        key = "|".join([str(material_id), method] + [f"{row.id}@{row.updated_at or row.created_at}" for row in rows])
+        
+        return hashlib.sha1(key.encode()).hexdigest(), [row.id for row in rows]
+
+
+
+
+
+
+
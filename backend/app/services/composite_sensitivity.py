@@ -0,0 +1,87 @@
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+import numpy as np
+
+from app.models.material import Material
+from app.services.composite_calculator import CompositeCalculator
+
+
+class CompositeSensitivityAnalyzer:
+    """
+    Leave-one-out sensitivity of a composite to each of its analyses
+    
+    For every analysis, the composite is recalculated without it and
+    compared to the composite of all analyses. All leave-one-out
+    composites come from ComponentMatrix.leave_one_out_percentages, so
+    the cost is one aggregation whatever the number of analyses.
+    """
+    
+    # Largest component shifts reported per analysis
+    TOP_COMPONENTS = 5
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.calculator = CompositeCalculator(db)
+    
+    def analyze(
+        self,
+        material_id: int,
+        analysis_ids: Optional[List[int]] = None,
+        top_components: int = TOP_COMPONENTS
+    ) -> Dict[str, Any]:
+        """
+        Rank the analyses of a material by how much they move its composite
+        
+        Args:
+            material_id: ID of the material
+            analysis_ids: Specific analysis IDs to use (None = use all)
+            top_components: Largest component shifts reported per analysis
+        
+        Returns:
+            Dictionary with material_id, analysis_count, component_count and
+            influences, sorted by change_score (descending)
+        """
+        if not self.db.query(Material.id).filter(Material.id == material_id).first():
+            raise ValueError(f"Material {material_id} not found")
+        
+        matrix = self.calculator._component_matrix(self.calculator.load_analyses(material_id, analysis_ids))
+        if matrix.analysis_count < 2:
+            raise ValueError("Sensitivity analysis needs at least two analyses with components")
+        
+        full, without = matrix.leave_one_out_percentages()
+        shifts = without - full
+        
+        # L1 distance between each leave-one-out composite and the full one
+        change_scores = np.abs(shifts).sum(axis=1)
+        
+        # Columns of the largest shifts of every analysis, largest first
+        top = min(top_components, matrix.component_count)
+        top_columns = np.argsort(-np.abs(shifts), axis=1, kind='stable')[:, :top]
+        
+        influences = []
+        for row in np.argsort(-change_scores, kind='stable').tolist():
+            analysis = matrix.analyses[row]
+            influences.append({
+                'analysis_id': analysis.id,
+                'batch_number': analysis.batch_number,
+                'supplier': analysis.supplier,
+                'weight': analysis.weight,
+                'change_score': round(float(change_scores[row]), 4),
+                'top_components': [
+                    {
+                        'component_name': matrix.names[column],
+                        'cas_number': matrix.cas_numbers[column],
+                        'percentage': round(float(full[column]), 4),
+                        'percentage_without': round(float(without[row, column]), 4),
+                        'change': round(float(shifts[row, column]), 4)
+                    }
+                    for column in top_columns[row].tolist()
+                ]
+            })
+        
+        return {
+            'material_id': material_id,
+            'analysis_count': matrix.analysis_count,
+            'component_count': matrix.component_count,
+            'influences': influences
+        }
@@ -0,0 +1,337 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import numpy as np
+import copy
+import hashlib
+import threading
+
+from app.models.composite import Composite, CompositeComponent, CompositeStatus
+from app.models.material import Material
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+
+
+class CompositeSimilarityIndex:
+    """
+    In-memory similarity index of the latest approved composite of every material
+    
+    Each composite is a sparse vector of percentages over component keys
+    (catalog entries, or CAS/name for components outside the catalog).
+    Vectors are stored by column, as the rows and percentages of every
+    material having the component, so a search only touches the columns
+    of the queried composite: exact cosine similarity or L1 distance to
+    every material is one pass over those columns.
+    """
+    
+    METRICS = ('cosine', 'l1')
+    
+    def __init__(self, vectors: Dict[int, Tuple[int, int, Dict[str, float]]], version: str = ""):
+        """
+        Args:
+            vectors: material_id -> (composite_id, composite version, {component_key: percentage})
+            version: Identifies the approved composites indexed
+        """
+        self.version = version
+        self.rows: Dict[int, int] = {}
+        self.material_ids: List[int] = []
+        self.composites: List[Optional[Tuple[int, int]]] = []
+        self.vectors: List[Dict[str, float]] = []
+        
+        column_rows: Dict[str, List[int]] = {}
+        column_values: Dict[str, List[float]] = {}
+        for material_id, (composite_id, composite_version, vector) in vectors.items():
+            row = self._add_row(material_id, composite_id, composite_version, vector)
+            for key, value in vector.items():
+                column_rows.setdefault(key, []).append(row)
+                column_values.setdefault(key, []).append(value)
+        
+        self.columns: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            key: (np.array(column_rows[key], dtype=np.int64), np.array(column_values[key], dtype=float))
+            for key in column_rows
+        }
+        self.l1_norms = np.array([sum(vector.values()) for vector in self.vectors], dtype=float)
+        self.l2_norms = np.array([np.sqrt(sum(v * v for v in vector.values())) for vector in self.vectors], dtype=float)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    @classmethod
+    def from_db(cls, db: Session, identity_index: Optional[ComponentIdentityIndex] = None) -> "CompositeSimilarityIndex":
+        """Load the latest approved composite of every material with one query"""
+        if identity_index is None:
+            identity_index = get_identity_index(db)
+        ranked = _latest_approved(db).subquery()
+        
+        rows = db.query(
+            ranked.c.material_id,
+            ranked.c.id,
+            ranked.c.version,
+            CompositeComponent.cas_number,
+            CompositeComponent.component_name,
+            CompositeComponent.percentage
+        ).join(
+            CompositeComponent, CompositeComponent.composite_id == ranked.c.id
+        ).filter(ranked.c.rank == 1)
+        
+        vectors: Dict[int, Tuple[int, int, Dict[str, float]]] = {}
+        for row in rows:
+            entry = vectors.setdefault(row.material_id, (row.id, row.version, {}))
+            key = identity_index.component_key(row.cas_number, row.component_name)
+            entry[2][key] = entry[2].get(key, 0.0) + row.percentage
+        
+        return cls(vectors, version=similarity_version(db, identity_index))
+    
+    def updated(self, material_id: int, composite: Optional[Tuple[int, int]], vector: Dict[str, float]) -> "CompositeSimilarityIndex":
+        """
+        Copy of the index with the composite of a material replaced
+        
+        The index itself is not modified, so a search running on it
+        meanwhile never sees a half-applied update. The copy shares the
+        arrays of every column the material is not in.
+        
+        Args:
+            material_id: ID of the material
+            composite: (composite_id, version) of its latest approved composite, None to remove it
+            vector: {component_key: percentage} of that composite
+        
+        Returns:
+            The updated index, with the version of this one
+        """
+        index = copy.copy(self)
+        index.rows = dict(self.rows)
+        index.material_ids = list(self.material_ids)
+        index.composites = list(self.composites)
+        index.vectors = list(self.vectors)
+        index.columns = dict(self.columns)
+        index.l1_norms = self.l1_norms.copy()
+        index.l2_norms = self.l2_norms.copy()
+        
+        row = index.rows.get(material_id)
+        if row is not None:
+            for key in index.vectors[row]:
+                rows, values = index.columns[key]
+                keep = rows != row
+                index.columns[key] = (rows[keep], values[keep])
+        
+        if composite is None:
+            if row is not None:
+                index.composites[row] = None
+                index.vectors[row] = {}
+                index.l1_norms[row] = index.l2_norms[row] = 0.0
+            return index
+        
+        if row is None:
+            row = index._add_row(material_id, composite[0], composite[1], vector)
+            index.l1_norms = np.append(index.l1_norms, 0.0)
+            index.l2_norms = np.append(index.l2_norms, 0.0)
+        else:
+            index.composites[row] = composite
+            index.vectors[row] = vector
+        
+        for key, value in vector.items():
+            rows, values = index.columns.get(key, (np.empty(0, dtype=np.int64), np.empty(0)))
+            index.columns[key] = (np.append(rows, row), np.append(values, value))
+        index.l1_norms[row] = sum(vector.values())
+        index.l2_norms[row] = np.sqrt(sum(v * v for v in vector.values()))
+        return index
+    
+    def search(
+        self,
+        vector: Dict[str, float],
+        k: int = 10,
+        metric: str = 'cosine',
+        exclude_material_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Materials whose latest approved composite is closest to a composition
+        
+        Args:
+            vector: {component_key: percentage} of the queried composition
+            k: Number of materials returned
+            metric: cosine (similarity, highest first) or l1 (distance in
+                percentage points, lowest first)
+            exclude_material_id: Material left out of the results
+        
+        Returns:
+            Up to k dictionaries with material_id, composite_id, version and score
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(self.METRICS)}")
+        
+        dot = np.zeros(len(self.composites))
+        overlap = np.zeros(len(self.composites))
+        for key, value in vector.items():
+            column = self.columns.get(key)
+            if column is None:
+                continue
+            rows, values = column
+            # A material appears once per column, so fancy-index accumulation is safe
+            dot[rows] += value * values
+            overlap[rows] += np.minimum(value, values)
+        
+        valid = self.l1_norms > 0
+        if exclude_material_id is not None and exclude_material_id in self.rows:
+            valid[self.rows[exclude_material_id]] = False
+        
+        if metric == 'cosine':
+            query_norm = np.sqrt(sum(v * v for v in vector.values()))
+            scores = np.divide(
+                dot, self.l2_norms * query_norm,
+                out=np.zeros_like(dot), where=valid & (query_norm > 0)
+            )
+            ranking = -scores
+        else:
+            # |a - b|_1 = |a|_1 + |b|_1 - 2 * sum(min(a, b)) for non-negative vectors
+            scores = np.maximum(self.l1_norms + sum(vector.values()) - 2 * overlap, 0.0)
+            ranking = scores
+        
+        candidates = np.flatnonzero(valid)
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+        best = candidates[np.argpartition(ranking[candidates], k - 1)[:k]]
+        best = best[np.argsort(ranking[best], kind='stable')]
+        
+        return [
+            {
+                'material_id': self.material_ids[row],
+                'composite_id': self.composites[row][0],
+                'version': self.composites[row][1],
+                'score': round(float(scores[row]), 4)
+            }
+            for row in best.tolist()
+        ]
+    
+    def _add_row(self, material_id: int, composite_id: int, version: int, vector: Dict[str, float]) -> int:
+        row = len(self.material_ids)
+        self.rows[material_id] = row
+        self.material_ids.append(material_id)
+        self.composites.append((composite_id, version))
+        self.vectors.append(vector)
+        return row
+
+
+class CompositeSimilarityFinder:
+    """Service finding the materials closest in composition to a composite"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def find_similar(self, composite_id: int, k: int = 10, metric: str = 'cosine') -> List[Dict[str, Any]]:
+        """
+        Materials whose latest approved composite is closest to a composite
+        
+        Args:
+            composite_id: ID of the composite (any status)
+            k: Number of materials returned
+            metric: cosine or l1, see CompositeSimilarityIndex.search
+        
+        Returns:
+            Up to k matches, closest first, with material reference code and name
+        """
+        composite = self.db.query(Composite).filter(Composite.id == composite_id).first()
+        if not composite:
+            raise ValueError(f"Composite {composite_id} not found")
+        
+        index = get_similarity_index(self.db)
+        vector = composite_vector(composite.components, get_identity_index(self.db))
+        matches = index.search(vector, k=k, metric=metric, exclude_material_id=composite.material_id)
+        
+        materials = {
+            material.id: material
+            for material in self.db.query(Material.id, Material.reference_code, Material.name).filter(
+                Material.id.in_([match['material_id'] for match in matches])
+            )
+        }
+        for match in matches:
+            material = materials[match['material_id']]
+            match['reference_code'] = material.reference_code
+            match['material_name'] = material.name
+        
+        return matches
+
+
+def composite_vector(components: List[CompositeComponent], identity_index: ComponentIdentityIndex) -> Dict[str, float]:
+    """{component_key: percentage} of composite components, percentages of synonyms added up"""
+    vector: Dict[str, float] = {}
+    for component in components:
+        key = identity_index.component_key(component.cas_number, component.component_name)
+        vector[key] = vector.get(key, 0.0) + component.percentage
+    return vector
+
+
+def _latest_approved(db: Session):
+    """Approved composites ranked by version within each material (rank 1 = latest)"""
+    return db.query(
+        Composite.id,
+        Composite.material_id,
+        Composite.version,
+        func.row_number().over(
+            partition_by=Composite.material_id,
+            order_by=Composite.version.desc()
+        ).label('rank')
+    ).filter(Composite.status == CompositeStatus.APPROVED)
+
+
+def similarity_version(db: Session, identity_index: Optional[ComponentIdentityIndex] = None) -> str:
+    """Short fingerprint of the approved composites and the component catalog (see update_similarity_index)"""
+    if identity_index is None:
+        identity_index = get_identity_index(db)
+    count, max_id, last_approval = db.query(
+        func.count(Composite.id),
+        func.max(Composite.id),
+        func.max(Composite.approved_at)
+    ).filter(Composite.status == CompositeStatus.APPROVED).one()
+    
+    fingerprint = f"{count}-{max_id}-{last_approval}-{identity_index.version}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+_index_lock = threading.Lock()
+_index: Optional[CompositeSimilarityIndex] = None
+
+
+def get_similarity_index(db: Session) -> CompositeSimilarityIndex:
+    """
+    Shared index instance, reloaded only when the approved composites have changed
+    
+    The check is a single round of aggregate queries, so every worker
+    process notices changes made by the others.
+    """
+    global _index
+    version = similarity_version(db)
+    
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = CompositeSimilarityIndex.from_db(db)
+        return _index
+
+
+def update_similarity_index(db: Session, material_id: int, previous_version: str):
+    """
+    Re-index one material after its approved composites changed (e.g. an approval)
+    
+    The loaded index is replaced by an updated copy only if it was current
+    before the change (previous_version, taken before it); otherwise it is
+    left stale and get_similarity_index reloads it. Searches already
+    holding the old index finish on it.
+    """
+    global _index
+    with _index_lock:
+        if _index is None or _index.version != previous_version:
+            return
+        
+        identity_index = get_identity_index(db)
+        latest = _latest_approved(db).filter(Composite.material_id == material_id).subquery()
+        composite = db.query(Composite).join(latest, latest.c.id == Composite.id).filter(latest.c.rank == 1).first()
+        
+        if composite is None:
+            index = _index.updated(material_id, None, {})
+        else:
+            index = _index.updated(
+                material_id,
+                (composite.id, composite.version),
+                composite_vector(composite.components, identity_index)
+            )
+        index.version = similarity_version(db, identity_index)
+        _index = index
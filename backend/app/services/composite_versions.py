@@ -0,0 +1,113 @@
+from typing import List, Dict
+from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.composite import Composite, CompositeVersionCounter
+from app.models.material import Material
+
+
+def allocate_versions(db: Session, material_ids: List[int]) -> Dict[int, int]:
+    """
+    Allocate the next composite version of several materials
+    
+    On PostgreSQL and SQLite this is a single INSERT ... ON CONFLICT DO
+    UPDATE ... RETURNING on the counter rows: concurrent sessions queue on
+    the counter row instead of reading the same max(version), so no retry
+    is needed. The row stays locked until the caller commits, and a
+    rollback gives the version back. The counter never falls behind the
+    versions already in composites (e.g. rows written before the counters
+    existed).
+    
+    Args:
+        db: Database session
+        material_ids: Materials that need a new version
+    
+    Returns:
+        Material ID -> allocated version (unknown materials are left out)
+    """
+    material_ids = sorted(set(material_ids))
+    if not material_ids:
+        return {}
+    
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        return _allocate_versions_locked(db, material_ids)
+    
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    greatest = func.greatest if dialect == "postgresql" else func.max
+    
+    # Next version from the composites, for materials without a counter yet
+    next_versions = select(
+        Material.id,
+        func.coalesce(func.max(Composite.version), 0) + 1
+    ).select_from(Material).outerjoin(
+        Composite, Composite.material_id == Material.id
+    ).where(
+        Material.id.in_(material_ids)
+    ).group_by(Material.id).order_by(Material.id)
+    
+    statement = insert(CompositeVersionCounter).from_select(
+        ["material_id", "last_version"], next_versions
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["material_id"],
+        set_={"last_version": greatest(
+            CompositeVersionCounter.last_version + 1,
+            statement.excluded.last_version
+        )}
+    ).returning(CompositeVersionCounter.material_id, CompositeVersionCounter.last_version)
+    
+    return {material_id: version for material_id, version in db.execute(statement).all()}
+
+
+def allocate_version(db: Session, material_id: int) -> int:
+    """
+    Allocate the next composite version of a material
+    
+    Raises:
+        ValueError: If the material does not exist
+    """
+    version = allocate_versions(db, [material_id]).get(material_id)
+    if version is None:
+        raise ValueError(f"Material {material_id} not found")
+    return version
+
+
+def _allocate_versions_locked(db: Session, material_ids: List[int]) -> Dict[int, int]:
+    """Fallback for other databases: SELECT ... FOR UPDATE on the materials"""
+    existing = [
+        row.id for row in db.query(Material.id).filter(
+            Material.id.in_(material_ids)
+        ).order_by(Material.id).with_for_update(key_share=True)
+    ]
+    counters = {
+        counter.material_id: counter
+        for counter in db.query(CompositeVersionCounter).filter(
+            CompositeVersionCounter.material_id.in_(existing)
+        )
+    }
+    max_versions = dict(
+        db.query(Composite.material_id, func.max(Composite.version)).filter(
+            Composite.material_id.in_(existing)
+        ).group_by(Composite.material_id).all()
+    )
+    
+    versions = {}
+    for material_id in existing:
+        counter = counters.get(material_id)
+        if counter is None:
+            counter = CompositeVersionCounter(material_id=material_id, last_version=0)
+            db.add(counter)
+        counter.last_version = max(counter.last_version, max_versions.get(material_id) or 0) + 1
+        versions[material_id] = counter.last_version
+    
+    db.flush()
+    return versions
+
+
+
+
+
+
+
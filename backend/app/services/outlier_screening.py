@@ -0,0 +1,110 @@
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import update, bindparam
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.chromatographic_analysis import ChromatographicAnalysis
+from app.models.material import Material
+from app.services.composite_calculator import CompositeCalculator
+
+
+class OutlierScreener:
+    """
+    Outlier screening of the processed analyses of materials
+    
+    Scores come from ComponentMatrix.outlier_scores: every analysis of a
+    material is scored at once against the median profile of all of them.
+    An analysis scoring above settings.OUTLIER_THRESHOLD is an outlier.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.calculator = CompositeCalculator(db)
+    
+    def screen_material(self, material_id: int, analysis_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Score the processed analyses of a material without recording anything
+        
+        Args:
+            material_id: ID of the material
+            analysis_ids: Specific analysis IDs to use (None = use all)
+        
+        Returns:
+            One dictionary per analysis with components, highest score first
+        """
+        if not self.db.query(Material.id).filter(Material.id == material_id).first():
+            raise ValueError(f"Material {material_id} not found")
+        
+        results = self._score(self.calculator.load_analyses(material_id, analysis_ids))
+        return sorted(results, key=lambda item: item['score'], reverse=True)
+    
+    def screen_all(self, material_ids: Optional[List[int]] = None) -> Dict[str, int]:
+        """
+        Score and record the processed analyses of all materials
+        
+        The analyses are streamed in one query ordered by material, and the
+        scores are written back with one executemany. updated_at is kept,
+        so recording a screening does not look like a change of the analysis.
+        
+        Args:
+            material_ids: Only these materials (None = all)
+        
+        Returns:
+            Dictionary with materials, analyses and outliers counts
+        """
+        query = self.db.query(ChromatographicAnalysis).filter(ChromatographicAnalysis.is_processed == 1)
+        if material_ids:
+            query = query.filter(ChromatographicAnalysis.material_id.in_(material_ids))
+        query = query.order_by(ChromatographicAnalysis.material_id, ChromatographicAnalysis.id).yield_per(500)
+        
+        screened_at = datetime.now()
+        rows = []
+        material_count = 0
+        for _, analyses in groupby(query, key=lambda analysis: analysis.material_id):
+            material_count += 1
+            rows.extend(
+                {
+                    'analysis_id': item['analysis_id'],
+                    'score': item['score'],
+                    'flag': item['is_outlier'],
+                    'screened_at': screened_at
+                }
+                for item in self._score(list(analyses))
+            )
+        
+        if rows:
+            table = ChromatographicAnalysis.__table__
+            self.db.execute(
+                update(table).where(table.c.id == bindparam('analysis_id')).values(
+                    outlier_score=bindparam('score'),
+                    is_outlier=bindparam('flag'),
+                    outlier_screened_at=bindparam('screened_at'),
+                    updated_at=table.c.updated_at
+                ),
+                rows
+            )
+        
+        return {
+            'materials': material_count,
+            'analyses': len(rows),
+            'outliers': sum(row['flag'] for row in rows)
+        }
+    
+    def _score(self, analyses: List[ChromatographicAnalysis]) -> List[Dict[str, Any]]:
+        """Outlier score of analyses of one material, in matrix order"""
+        matrix = self.calculator._component_matrix(analyses)
+        distances, scores = matrix.outlier_scores()
+        
+        return [
+            {
+                'analysis_id': analysis.id,
+                'batch_number': analysis.batch_number,
+                'supplier': analysis.supplier,
+                'distance': round(distance, 4),
+                'score': round(score, 4),
+                'is_outlier': score > settings.OUTLIER_THRESHOLD
+            }
+            for analysis, distance, score in zip(matrix.analyses, distances.tolist(), scores.tolist())
+        ]
@@ -0,0 +1,153 @@
+from typing import Dict, Any, Optional, List, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+import copy
+import hashlib
+
+from app.models.chromatographic_analysis import ChromatographicAnalysis
+from app.models.parse_cache import ParseCacheEntry
+from app.parsers.csv_parser import ChromatographicCSVParser
+
+
+class ParseCache:
+    """Content-addressed cache of CSV parse results and ingested files"""
+    
+    def __init__(
+        self,
+        db: Session,
+        parser_version: str = ChromatographicCSVParser.PARSER_VERSION,
+        reference_library=None,
+        identity_index=None
+    ):
+        """
+        Args:
+            db: Database session
+            parser_version: Version of the parser producing the results
+            reference_library: RetentionIndexLibrary used while parsing; its
+                version is part of the cache key so library changes re-parse
+            identity_index: ComponentIdentityIndex used while parsing; its
+                version is part of the cache key as well
+        """
+        self.db = db
+        has_library = reference_library is not None and len(reference_library)
+        if identity_index is not None and len(identity_index):
+            # One hash of both versions keeps the key within parser_version's 20 characters
+            versions = f"{reference_library.version if has_library else ''}:{identity_index.version}"
+            parser_version = f"{parser_version}+ref.{hashlib.sha1(versions.encode()).hexdigest()[:12]}"
+        elif has_library:
+            parser_version = f"{parser_version}+ri.{reference_library.version}"
+        self.parser_version = parser_version
+    
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached parse result for some file content
+        
+        Args:
+            content_hash: SHA-256 of the file bytes
+            
+        Returns:
+            Copy of the cached parsed_data, or None on a miss
+        """
+        entry = self.db.query(ParseCacheEntry).filter(
+            ParseCacheEntry.content_hash == content_hash,
+            ParseCacheEntry.parser_version == self.parser_version
+        ).first()
+        
+        if not entry:
+            return None
+        
+        return copy.deepcopy(entry.parsed_data)
+    
+    def get_many(self, content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get cached parse results for several files with one query
+        
+        Returns:
+            Dictionary mapping content hash to a copy of its parsed_data
+        """
+        if not content_hashes:
+            return {}
+        
+        entries = self.db.query(ParseCacheEntry).filter(
+            ParseCacheEntry.content_hash.in_(set(content_hashes)),
+            ParseCacheEntry.parser_version == self.parser_version
+        ).all()
+        
+        return {entry.content_hash: copy.deepcopy(entry.parsed_data) for entry in entries}
+    
+    def put(self, content_hash: str, parsed_data: Dict[str, Any], file_size: Optional[int] = None) -> None:
+        """
+        Store a parse result (part of the caller's transaction)
+        
+        A concurrent upload of the same content may have stored it first,
+        in which case this is a no-op.
+        """
+        try:
+            with self.db.begin_nested():
+                self.db.add(ParseCacheEntry(
+                    content_hash=content_hash,
+                    parser_version=self.parser_version,
+                    parsed_data=parsed_data,
+                    file_size=file_size
+                ))
+        except IntegrityError:
+            pass
+    
+    def find_analysis(self, content_hash: str, material_id: Optional[int] = None) -> Optional[ChromatographicAnalysis]:
+        """
+        Find an analysis already ingested from the same file content
+        
+        Args:
+            content_hash: SHA-256 of the file bytes
+            material_id: Only look at analyses of this material
+            
+        Returns:
+            The oldest matching analysis, or None
+        """
+        query = self.db.query(ChromatographicAnalysis).filter(
+            ChromatographicAnalysis.file_hash == content_hash
+        )
+        
+        if material_id is not None:
+            query = query.filter(ChromatographicAnalysis.material_id == material_id)
+        
+        return query.order_by(ChromatographicAnalysis.id).first()
+    
+    def find_ingested(self, content_hashes: List[str]) -> Dict[Tuple[str, int], int]:
+        """
+        Find analyses already ingested from any of the given files with one query
+        
+        Returns:
+            Dictionary mapping (content hash, material ID) to the oldest analysis ID
+        """
+        if not content_hashes:
+            return {}
+        
+        rows = self.db.query(
+            ChromatographicAnalysis.file_hash,
+            ChromatographicAnalysis.material_id,
+            ChromatographicAnalysis.id
+        ).filter(
+            ChromatographicAnalysis.file_hash.in_(set(content_hashes))
+        ).order_by(ChromatographicAnalysis.id.desc()).all()
+        
+        # Descending order so the oldest analysis wins
+        return {(file_hash, material_id): analysis_id for file_hash, material_id, analysis_id in rows}
+    
+    def is_file_shared(self, analysis: ChromatographicAnalysis) -> bool:
+        """Whether another analysis points to the same stored file"""
+        if not analysis.file_hash:
+            return False
+        
+        return self.db.query(ChromatographicAnalysis.id).filter(
+            ChromatographicAnalysis.file_hash == analysis.file_hash,
+            ChromatographicAnalysis.file_path == analysis.file_path,
+            ChromatographicAnalysis.id != analysis.id
+        ).first() is not None
+
+
+
+
+
+
+
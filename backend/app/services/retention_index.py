@@ -0,0 +1,181 @@
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import numpy as np
+import hashlib
+import threading
+
+from app.core.config import settings
+from app.models.reference_compound import ReferenceCompound
+
+
+class RetentionIndexLibrary:
+    """
+    In-memory retention index library sorted by index
+    
+    Lookups are binary searches (np.searchsorted) on the sorted indices,
+    so identifying all peaks of a run costs O(peaks * log(compounds)).
+    """
+    
+    def __init__(self, compounds: List[Tuple[float, str, Optional[str]]], version: str = ""):
+        """
+        Args:
+            compounds: (retention_index, name, cas_number) tuples
+            version: Identifies the library content (used in cache keys)
+        """
+        compounds = sorted(compounds, key=lambda c: c[0])
+        self.indices = np.array([c[0] for c in compounds], dtype=np.float64)
+        self.names = [c[1] for c in compounds]
+        self.cas_numbers = [c[2] for c in compounds]
+        self.version = version
+    
+    def __len__(self):
+        return len(self.indices)
+    
+    @classmethod
+    def from_db(cls, db: Session, column_phase: Optional[str] = None) -> "RetentionIndexLibrary":
+        """Load the reference compounds (optionally for one column phase)"""
+        query = db.query(
+            ReferenceCompound.retention_index,
+            ReferenceCompound.name,
+            ReferenceCompound.cas_number
+        )
+        if column_phase:
+            query = query.filter(ReferenceCompound.column_phase == column_phase)
+        
+        return cls([tuple(row) for row in query.all()], version=_library_version(db, column_phase))
+    
+    def lookup(self, retention_index: float, tolerance: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        All compounds within tolerance of a retention index, closest first
+        
+        Returns:
+            List of candidate dictionaries (name, cas_number, retention_index, delta)
+        """
+        tolerance = tolerance if tolerance is not None else settings.RI_MATCH_TOLERANCE
+        low = np.searchsorted(self.indices, retention_index - tolerance, side='left')
+        high = np.searchsorted(self.indices, retention_index + tolerance, side='right')
+        
+        candidates = [
+            {
+                'name': self.names[i],
+                'cas_number': self.cas_numbers[i],
+                'retention_index': float(self.indices[i]),
+                'delta': abs(float(self.indices[i]) - retention_index)
+            }
+            for i in range(low, high)
+        ]
+        candidates.sort(key=lambda c: c['delta'])
+        return candidates
+    
+    def identify(self, retention_indices: np.ndarray, tolerance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closest compound for every retention index at once
+        
+        Args:
+            retention_indices: Retention indices to identify
+            tolerance: Max difference for a match
+        
+        Returns:
+            Tuple of (library positions, -1 where nothing matches; deltas)
+        """
+        tolerance = tolerance if tolerance is not None else settings.RI_MATCH_TOLERANCE
+        retention_indices = np.asarray(retention_indices, dtype=np.float64)
+        
+        if len(self.indices) == 0:
+            return np.full(len(retention_indices), -1), np.full(len(retention_indices), np.inf)
+        
+        # Neighbours on each side of the insertion point
+        right = np.searchsorted(self.indices, retention_indices)
+        left = np.clip(right - 1, 0, len(self.indices) - 1)
+        right = np.clip(right, 0, len(self.indices) - 1)
+        
+        left_delta = np.abs(retention_indices - self.indices[left])
+        right_delta = np.abs(retention_indices - self.indices[right])
+        closest = np.where(right_delta < left_delta, right, left)
+        deltas = np.minimum(left_delta, right_delta)
+        
+        # NaN deltas (no retention index) never match
+        matched = deltas <= tolerance
+        return np.where(matched, closest, -1), deltas
+    
+    def identify_components(self, components: List[Dict[str, Any]], tolerance: Optional[float] = None) -> int:
+        """
+        Fill in missing CAS numbers and names of parsed components in place
+        
+        Only components with a retention_index are considered. Names are
+        replaced only for components flagged as unidentified.
+        
+        Returns:
+            Number of components identified
+        """
+        targets = [c for c in components if c.get('retention_index') is not None]
+        targets = [c for c in targets if c.get('unidentified') or not c.get('cas_number')]
+        if not targets or len(self.indices) == 0:
+            return 0
+        
+        positions, deltas = self.identify([c['retention_index'] for c in targets], tolerance)
+        
+        identified = 0
+        for component, position, delta in zip(targets, positions.tolist(), deltas.tolist()):
+            if position < 0:
+                continue
+            
+            if component.get('unidentified'):
+                component['component_name'] = self.names[position]
+                del component['unidentified']
+            if not component.get('cas_number'):
+                component['cas_number'] = self.cas_numbers[position]
+            component['identified_by'] = 'retention_index'
+            component['match_delta'] = round(delta, 2)
+            identified += 1
+        
+        return identified
+
+
+def _library_version(db: Session, column_phase: Optional[str] = None) -> str:
+    """Short fingerprint of the library content from count, max id and last update"""
+    query = db.query(
+        func.count(ReferenceCompound.id),
+        func.max(ReferenceCompound.id),
+        func.max(func.coalesce(ReferenceCompound.updated_at, ReferenceCompound.created_at))
+    )
+    if column_phase:
+        query = query.filter(ReferenceCompound.column_phase == column_phase)
+    
+    count, max_id, last_change = query.one()
+    return hashlib.sha1(f"{count}-{max_id}-{last_change}".encode()).hexdigest()[:12]
+
+
+_library_lock = threading.Lock()
+_libraries: Dict[str, RetentionIndexLibrary] = {}
+
+
+def get_reference_library(db: Session, column_phase: Optional[str] = None) -> RetentionIndexLibrary:
+    """
+    Shared library instance, reloaded only when the table has changed
+    
+    The check is a single aggregate query, so every worker process notices
+    changes made by the others.
+    """
+    column_phase = column_phase if column_phase is not None else settings.RI_COLUMN_PHASE
+    version = _library_version(db, column_phase)
+    
+    with _library_lock:
+        library = _libraries.get(column_phase)
+        if library is None or library.version != version:
+            library = RetentionIndexLibrary.from_db(db, column_phase)
+            _libraries[column_phase] = library
+        return library
+
+
+def invalidate_reference_library():
+    """Drop the loaded libraries (after changes to reference_compounds)"""
+    with _library_lock:
+        _libraries.clear()
+
+
+
+
+
+
@@ -0,0 +1,220 @@
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import numpy as np
+import hashlib
+import threading
+
+from app.core.config import settings
+from app.models.composite import ComponentType
+from app.models.significance_rule import SignificanceRule
+from app.services.component_identity import ComponentIdentityIndex, get_identity_index
+
+
+# Why a component change is significant, by index in SignificanceEngine.evaluate (first match wins)
+REASONS = ('limit', 'absolute', 'relative')
+
+
+class SignificanceEngine:
+    """
+    Significance rules compiled into lookup tables
+    
+    Every rule is a row of four threshold arrays (min_change, absolute,
+    relative, limit); thresholds a rule does not check are infinite. Row 0
+    is the default rule. A component gets the row of the rule for its
+    component key (rule CAS numbers are resolved through the catalog, so
+    synonyms share a rule), else the row of its type, else row 0, and a
+    whole comparison, or a batch of them, is then a few array operations.
+    
+    A comparison is significant when its summed change reaches threshold
+    or when any component breaks its rule.
+    """
+    
+    def __init__(
+        self,
+        rules: List[Tuple[Optional[str], Optional[ComponentType], Optional[float], Optional[float], Optional[float], Optional[float]]],
+        identity_index: ComponentIdentityIndex,
+        version: str = "",
+        threshold: Optional[float] = None,
+        tolerance: Optional[float] = None
+    ):
+        """
+        Args:
+            rules: (cas_number, component_type, min_change, absolute_threshold,
+                relative_threshold, max_percentage) tuples; later rules for
+                the same scope win
+            identity_index: Resolves rule CAS numbers to component keys
+            version: Identifies the rules and the catalog (used in cache keys)
+            threshold: Summed change that makes a comparison significant
+                (default COMPOSITE_THRESHOLD_PERCENT)
+            tolerance: min_change of rules without one (default COMPONENT_CHANGE_TOLERANCE)
+        """
+        self.version = version
+        self.threshold = settings.COMPOSITE_THRESHOLD_PERCENT if threshold is None else threshold
+        
+        table: List[Tuple[Optional[float], ...]] = [(None, None, None, None)]
+        self.rows_by_key: Dict[str, int] = {}
+        self.rows_by_type: Dict[ComponentType, int] = {}
+        for cas_number, component_type, *thresholds in rules:
+            if cas_number:
+                self.rows_by_key[identity_index.component_key(cas_number, None)] = len(table)
+            elif component_type is not None:
+                self.rows_by_type[ComponentType(component_type)] = len(table)
+            else:
+                table[0] = tuple(thresholds)
+                continue
+            table.append(tuple(thresholds))
+        
+        # Rules without a min_change inherit the default rule's
+        if table[0][0] is None:
+            table[0] = (settings.COMPONENT_CHANGE_TOLERANCE if tolerance is None else tolerance,) + table[0][1:]
+        
+        def column(position: int, missing: float) -> np.ndarray:
+            return np.array([missing if row[position] is None else row[position] for row in table], dtype=float)
+        
+        self.min_change = column(0, table[0][0])
+        self.absolute = column(1, np.inf)
+        self.relative = column(2, np.inf)
+        self.limit = column(3, np.inf)
+    
+    def __len__(self):
+        return len(self.min_change)
+    
+    @classmethod
+    def from_db(cls, db: Session, identity_index: Optional[ComponentIdentityIndex] = None) -> "SignificanceEngine":
+        """Compile all rules, loaded with one query"""
+        if identity_index is None:
+            identity_index = get_identity_index(db)
+        rules = db.query(
+            SignificanceRule.cas_number,
+            SignificanceRule.component_type,
+            SignificanceRule.min_change,
+            SignificanceRule.absolute_threshold,
+            SignificanceRule.relative_threshold,
+            SignificanceRule.max_percentage
+        ).order_by(SignificanceRule.id).all()
+        
+        return cls([tuple(row) for row in rules], identity_index, version=significance_version(db, identity_index))
+    
+    def rule_row(self, component_key: str, component_type: Optional[ComponentType]) -> int:
+        """Row of the rule applying to a component"""
+        row = self.rows_by_key.get(component_key)
+        if row is None:
+            row = self.rows_by_type.get(component_type or ComponentType.COMPONENT, 0)
+        return row
+    
+    def rule_rows(self, component_keys: List[str], component_types: List[Optional[ComponentType]]) -> np.ndarray:
+        """Rows of the rules applying to components, as an index array into the threshold arrays"""
+        return np.fromiter(
+            map(self.rule_row, component_keys, component_types),
+            dtype=np.int64,
+            count=len(component_keys)
+        )
+    
+    def evaluate(
+        self,
+        old: np.ndarray,
+        new: np.ndarray,
+        in_old: np.ndarray,
+        in_new: np.ndarray,
+        rows: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Compare components given as arrays (any shapes that broadcast together)
+        
+        Added and removed components always count; components in both count
+        when they moved by more than their min_change. A counted component
+        is significant when its change reaches the absolute threshold, or
+        (not for added ones) the relative threshold, and a component above
+        its max_percentage is significant unless it already was above it
+        and did not grow.
+        
+        Args:
+            old: Old percentages (0 where absent)
+            new: New percentages (0 where absent)
+            in_old: Presence in the old composite
+            in_new: Presence in the new composite
+            rows: Rule row of every component (see rule_rows)
+        
+        Returns:
+            Dictionary of arrays: added, removed, changed, counted (absolute
+            change counting towards the change score, else 0), significant
+            and reason (index into REASONS, -1 where not significant)
+        """
+        change = new - old
+        magnitude = np.abs(change)
+        added = in_new & ~in_old
+        removed = in_old & ~in_new
+        changed = in_old & in_new & (magnitude > self.min_change[rows])
+        counted = added | removed | changed
+        
+        relative = np.divide(magnitude * 100, old, out=np.zeros(np.shape(magnitude)), where=in_old & (old > 0))
+        limit = self.limit[rows]
+        
+        reason = np.select(
+            [
+                in_new & (new > limit) & (~in_old | (old <= limit) | (changed & (change > 0))),
+                counted & (magnitude >= self.absolute[rows]),
+                (changed | removed) & (relative >= self.relative[rows])
+            ],
+            [0, 1, 2],
+            default=-1
+        )
+        
+        return {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+            'counted': np.where(counted, magnitude, 0.0),
+            'significant': reason >= 0,
+            'reason': reason
+        }
+    
+    def is_significant(self, change_score: float, significant_components: int) -> bool:
+        """Whether a comparison with this summed change and number of significant components is significant"""
+        return change_score >= self.threshold or significant_components > 0
+
+
+def significance_version(db: Session, identity_index: Optional[ComponentIdentityIndex] = None) -> str:
+    """Short fingerprint of the rules, the catalog and the default thresholds"""
+    if identity_index is None:
+        identity_index = get_identity_index(db)
+    count, max_id, last_change = db.query(
+        func.count(SignificanceRule.id),
+        func.max(SignificanceRule.id),
+        func.max(func.coalesce(SignificanceRule.updated_at, SignificanceRule.created_at))
+    ).one()
+    
+    fingerprint = (
+        f"{count}-{max_id}-{last_change}-{identity_index.version}-"
+        f"{settings.COMPOSITE_THRESHOLD_PERCENT}-{settings.COMPONENT_CHANGE_TOLERANCE}"
+    )
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+_engine_lock = threading.Lock()
+_engine: Optional[SignificanceEngine] = None
+
+
+def get_significance_engine(db: Session) -> SignificanceEngine:
+    """
+    Shared engine instance, recompiled only when the rules or the catalog have changed
+    
+    The check is a single round of aggregate queries, so every worker
+    process notices changes made by the others.
+    """
+    global _engine
+    identity_index = get_identity_index(db)
+    version = significance_version(db, identity_index)
+    
+    with _engine_lock:
+        if _engine is None or _engine.version != version:
+            _engine = SignificanceEngine.from_db(db, identity_index)
+        return _engine
+
+
+def invalidate_significance_engine():
+    """Drop the compiled engine (after changes to the rules)"""
+    global _engine
+    with _engine_lock:
+        _engine = None
@@ -0,0 +1,141 @@
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text, bindparam, ARRAY, Integer
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.component_identity import component_key_sql
+
+
+# Components of the processed analyses of a material, grouped by component
+# key in the database. Keys (resolved through the component catalog),
+# names, CAS numbers and types follow the same rules as
+# CompositeCalculator._get_component_key and ComponentMatrix:
+# latest name, first CAS number, most common type with ties to the type
+# seen first. Only one row per component crosses the wire.
+COMPONENT_AGGREGATES_SQL = """
+WITH elements AS (
+    SELECT
+        a.id AS analysis_id,
+        a.weight,
+        e.value AS component,
+        row_number() OVER (ORDER BY a.id, e.ordinality) AS seq
+    FROM chromatographic_analyses a
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE WHEN jsonb_typeof(a.parsed_data::jsonb -> 'components') = 'array'
+             THEN a.parsed_data::jsonb -> 'components'
+             ELSE '[]'::jsonb END
+    ) WITH ORDINALITY AS e(value, ordinality)
+    WHERE a.material_id = :material_id
+      AND a.is_processed = 1
+      {analysis_filter}
+),
+keyed AS (
+    SELECT
+        seq,
+        analysis_id,
+        weight,
+        {component_key} AS component_key,
+        component ->> 'component_name' AS component_name,
+        nullif(component ->> 'cas_number', '') AS cas_number,
+        (component ->> 'percentage')::float8 AS percentage,
+        coalesce(component ->> 'component_type', 'COMPONENT') AS component_type
+    FROM elements
+),
+types AS (
+    SELECT
+        component_key,
+        component_type,
+        count(*) AS type_count,
+        min(min(seq)) OVER (PARTITION BY component_type) AS type_seen
+    FROM keyed
+    GROUP BY component_key, component_type
+),
+type_summary AS (
+    SELECT
+        component_key,
+        (array_agg(component_type ORDER BY type_count DESC, type_seen))[1] AS component_type,
+        json_object_agg(component_type, type_count ORDER BY type_seen) AS type_counts
+    FROM types
+    GROUP BY component_key
+),
+components AS (
+    SELECT
+        component_key,
+        min(seq) AS first_seen,
+        (array_agg(component_name ORDER BY seq DESC))[1] AS component_name,
+        (array_agg(analysis_id ORDER BY seq DESC))[1] AS name_analysis_id,
+        (array_agg(cas_number ORDER BY seq) FILTER (WHERE cas_number IS NOT NULL))[1] AS cas_number,
+        count(*) AS observation_count,
+        sum(weight) AS sum_weight,
+        sum(weight * percentage) AS sum_weighted_percentage,
+        sum(percentage) AS sum_percentage,
+        sum(percentage * percentage) AS sum_squared_percentage,
+        avg(percentage) AS mean,
+        coalesce(stddev_samp(percentage), 0) AS std_dev
+    FROM keyed
+    GROUP BY component_key
+)
+SELECT
+    c.component_key,
+    c.component_name,
+    c.name_analysis_id,
+    c.cas_number,
+    t.component_type,
+    t.type_counts,
+    c.observation_count,
+    c.sum_weight,
+    c.sum_weighted_percentage,
+    c.sum_percentage,
+    c.sum_squared_percentage,
+    c.mean,
+    c.std_dev
+FROM components c
+JOIN type_summary t ON t.component_key = c.component_key
+ORDER BY c.first_seen
+"""
+
+
+def supports_sql_aggregation(db: Session) -> bool:
+    """Whether composite aggregation can run in the database (PostgreSQL only)"""
+    if settings.COMPOSITE_AGGREGATION_BACKEND != "sql":
+        return False
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def aggregate_components(
+    db: Session,
+    material_id: int,
+    analysis_ids: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Per-component aggregates of the processed analyses of a material
+    
+    Args:
+        db: Session bound to PostgreSQL
+        material_id: ID of the material
+        analysis_ids: Restrict to these analyses (None = all)
+    
+    Returns:
+        One dictionary per component key, in order of first appearance
+    """
+    if analysis_ids:
+        statement = text(COMPONENT_AGGREGATES_SQL.format(
+            analysis_filter="AND a.id = ANY(:analysis_ids)",
+            component_key=component_key_sql("component")
+        )).bindparams(bindparam("analysis_ids", type_=ARRAY(Integer)))
+        params = {"material_id": material_id, "analysis_ids": list(analysis_ids)}
+    else:
+        statement = text(COMPONENT_AGGREGATES_SQL.format(
+            analysis_filter="",
+            component_key=component_key_sql("component")
+        ))
+        params = {"material_id": material_id}
+    
+    return [dict(row) for row in db.execute(statement, params).mappings()]
+
+
+
+
+
+
+
@@ -1,6 +1,7 @@
-from .composite_tasks import review_composites, cleanup_old_drafts
+from .composite_tasks import review_composites, cleanup_old_drafts, screen_outliers
+from .ingestion_tasks import parse_analysis
 
-__all__ = ["review_composites", "cleanup_old_drafts"]
+__all__ = ["review_composites", "cleanup_old_drafts", "screen_outliers", "parse_analysis"]
 
 
 
@@ -7,6 +7,7 @@ from app.models.composite import Composite, CompositeStatus
 from app.models.material import Material
 from app.services.composite_calculator import CompositeCalculator
 from app.services.composite_comparator import CompositeComparator
+from app.services.outlier_screening import OutlierScreener
 
 
 @celery_app.task(name="app.tasks.review_composites")
@@ -53,16 +54,11 @@ def review_composites():
                 db.add(new_composite)
                 db.flush()
                 
-                # Compare with latest
-                comparator = CompositeComparator(db)
-                # Need to compare components directly since new_composite not committed
-                comparison_result = _compare_composite_components(
-                    latest_composite, 
-                    new_composite, 
-                    settings.COMPOSITE_THRESHOLD_PERCENT
-                )
+                # Compare with latest, with the same significance rules as the API
+                # (compare_components works on the uncommitted composite)
+                comparison = CompositeComparator(db).compare_components(latest_composite, new_composite)
                 
-                if comparison_result['significant_changes']:
+                if comparison.significant_changes:
                     # Save the new composite for review
                     db.commit()
                     db.refresh(new_composite)
@@ -71,7 +67,7 @@ def review_composites():
                     
                     # TODO: Send notification to technical team
                     print(f"Significant changes detected in {material.reference_code} v{new_composite.version}")
-                    print(f"Total change score: {comparison_result['total_change']:.2f}%")
+                    print(f"Total change score: {comparison.total_change_score:.2f}%")
                 else:
                     # No significant changes, rollback
                     db.rollback()
@@ -97,6 +93,29 @@ def review_composites():
         db.close()
 
 
+@celery_app.task(name="app.tasks.screen_outliers")
+def screen_outliers():
+    """
+    Periodic task to screen all processed analyses for outliers
+    Records outlier_score and is_outlier on every analysis
+    """
+    db: Session = SessionLocal()
+    
+    try:
+        result = OutlierScreener(db).screen_all()
+        db.commit()
+        
+        print(f"Outlier screening completed: {result['analyses']} analyses of {result['materials']} materials, {result['outliers']} outliers")
+        return result
+    
+    except Exception as e:
+        print(f"Error in screen_outliers task: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 @celery_app.task(name="app.tasks.cleanup_old_drafts")
 def cleanup_old_drafts():
     """
@@ -131,34 +150,6 @@ def cleanup_old_drafts():
         db.close()
 
 
-def _compare_composite_components(old_composite, new_composite, threshold):
-    """Helper function to compare composite components"""
-    
-    # Create component maps
-    old_components = {
-        (c.cas_number or c.component_name.lower()): c.percentage
-        for c in old_composite.components
-    }
-    new_components = {
-        (c.cas_number or c.component_name.lower()): c.percentage
-        for c in new_composite.components
-    }
-    
-    total_change = 0.0
-    
-    # Calculate changes
-    all_keys = set(old_components.keys()) | set(new_components.keys())
-    for key in all_keys:
-        old_pct = old_components.get(key, 0.0)
-        new_pct = new_components.get(key, 0.0)
-        total_change += abs(new_pct - old_pct)
-    
-    return {
-        "total_change": total_change,
-        "significant_changes": total_change >= threshold
-    }
-
-
 
 
 
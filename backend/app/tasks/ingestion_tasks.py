@@ -0,0 +1,97 @@
+from pathlib import Path
+from sqlalchemy.orm import Session
+from app.core.celery_app import celery_app
+from app.core.database import SessionLocal
+from app.models.chromatographic_analysis import ChromatographicAnalysis
+from app.parsers.csv_parser import ChromatographicCSVParser
+from app.services.composite_calculator import CompositeCalculator
+from app.services.analysis_components import AnalysisComponentIndex
+from app.services.parse_cache import ParseCache
+from app.services.composite_preview import invalidate_composite_previews
+from app.services.retention_index import get_reference_library
+from app.services.component_identity import get_identity_index
+
+
+@celery_app.task(bind=True, name="app.tasks.parse_analysis")
+def parse_analysis(self, analysis_id: int):
+    """
+    Parse the stored CSV file of a queued chromatographic analysis
+    
+    Peak tables and raw traces are told apart by their header (see
+    ChromatographicCSVParser.for_content).
+    
+    Runs on the ingestion queue. Progress is reported through the task
+    state (stage and progress in the task meta).
+    """
+    db: Session = SessionLocal()
+    
+    try:
+        analysis = db.query(ChromatographicAnalysis).filter(
+            ChromatographicAnalysis.id == analysis_id
+        ).first()
+        
+        if not analysis:
+            print(f"Analysis {analysis_id} no longer exists, skipping parse")
+            return {"analysis_id": analysis_id, "is_processed": None}
+        
+        queued_data = analysis.parsed_data or {}
+        reference_library = get_reference_library(db)
+        identity_index = get_identity_index(db)
+        parse_cache = ParseCache(db, reference_library=reference_library, identity_index=identity_index)
+        
+        self.update_state(state="PROGRESS", meta={"stage": "reading", "progress": 0.1})
+        parse_result = parse_cache.get(analysis.file_hash) if analysis.file_hash else None
+        
+        if parse_result is None:
+            content = Path(analysis.file_path).read_bytes()
+            
+            self.update_state(state="PROGRESS", meta={"stage": "parsing", "progress": 0.3})
+            parser = ChromatographicCSVParser.for_content(
+                content, reference_library=reference_library, identity_index=identity_index
+            )
+            parse_result = parser.parse_buffer(content)
+            parse_result['file_sha256'] = queued_data.get('file_sha256', analysis.file_hash)
+            parse_result['file_size'] = len(content)
+            
+            if analysis.file_hash:
+                parse_cache.put(analysis.file_hash, parse_result, file_size=len(content))
+        
+        self.update_state(state="PROGRESS", meta={"stage": "saving", "progress": 0.9})
+        parse_result['task_id'] = self.request.id
+        
+        # Reprocessing replaces the components counted in the material statistics
+        calculator = CompositeCalculator(db)
+        calculator.forget_analysis(analysis)
+        
+        analysis.parsed_data = parse_result
+        analysis.is_processed = 1 if parse_result['success'] else -1
+        analysis.processing_notes = "; ".join(parse_result.get('validation_errors', []))
+        calculator.record_analysis(analysis)
+        AnalysisComponentIndex(db).replace(analysis)
+        
+        db.commit()
+        invalidate_composite_previews(analysis.material_id, analysis_id)
+        
+        return {"analysis_id": analysis_id, "is_processed": analysis.is_processed}
+        
+    except Exception as e:
+        print(f"Error parsing analysis {analysis_id}: {e}")
+        db.rollback()
+        
+        analysis = db.query(ChromatographicAnalysis).filter(
+            ChromatographicAnalysis.id == analysis_id
+        ).first()
+        if analysis:
+            analysis.is_processed = -1
+            analysis.processing_notes = f"Parsing failed: {e}"
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+
+
+
+
+
+
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for composite aggregation
+
+Compares the previous per-component loop (defaultdict of lists, statistics
+module) with the matrix aggregation used by CompositeCalculator, and checks
+both give the same composite to 4 decimals. Also times the bootstrap
+confidence intervals, the leave-one-out composites and the outlier scores
+on the same matrix, and checks the leave-one-out composites against one
+aggregation per left-out analysis.
+
+Usage:
+    python scripts/benchmark_composite_aggregation.py [analyses] [components]
+"""
+
+import os
+import sys
+import random
+import statistics
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app.core.config import settings
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex
+
+
+def generate_analyses(analysis_count, component_count):
+    """Analyses of one material; each analysis misses some minor components"""
+    random.seed(42)
+    base = [
+        {
+            'cas_number': f"{random.randint(50, 99999)}-{random.randint(10, 99)}-{random.randint(0, 9)}" if i % 5 else None,
+            'component_name': f"Component {i}",
+            'percentage': random.uniform(0.001, 5.0),
+            'component_type': 'IMPURITY' if i % 7 == 0 else 'COMPONENT'
+        }
+        for i in range(component_count)
+    ]
+    
+    analyses = []
+    for i in range(analysis_count):
+        components = [
+            dict(component, percentage=component['percentage'] * random.uniform(0.8, 1.2))
+            for component in base
+            if component['percentage'] > 0.5 or random.random() > 0.2
+        ]
+        analyses.append(SimpleNamespace(
+            id=i,
+            weight=random.uniform(0.5, 10.0),
+            parsed_data={'components': components}
+        ))
+    return analyses
+
+
+def aggregate_legacy(calculator, analyses):
+    """Reference implementation: the previous per-component loop"""
+    component_data = defaultdict(lambda: {
+        'percentages': [],
+        'weights': [],
+        'cas_numbers': set(),
+        'types': []
+    })
+    
+    for analysis in analyses:
+        if not analysis.parsed_data or 'components' not in analysis.parsed_data:
+            continue
+        
+        for component in analysis.parsed_data['components']:
+            key = calculator._get_component_key(component)
+            
+            component_data[key]['percentages'].append(component['percentage'])
+            component_data[key]['weights'].append(analysis.weight)
+            
+            if component.get('cas_number'):
+                component_data[key]['cas_numbers'].add(component['cas_number'])
+            
+            component_data[key]['types'].append(component.get('component_type', 'COMPONENT'))
+            component_data[key]['name'] = component['component_name']
+    
+    aggregated_components = []
+    
+    for key, data in component_data.items():
+        weighted_percentage = sum(
+            p * w for p, w in zip(data['percentages'], data['weights'])
+        ) / sum(data['weights'])
+        
+        if len(data['percentages']) > 1:
+            std_dev = statistics.stdev(data['percentages'])
+            mean = statistics.mean(data['percentages'])
+            coefficient_of_variation = (std_dev / mean * 100) if mean > 0 else 100
+            confidence = max(0, 100 - coefficient_of_variation * 2)
+        else:
+            confidence = 70.0
+        
+        cas_number = list(data['cas_numbers'])[0] if data['cas_numbers'] else None
+        component_type = max(set(data['types']), key=data['types'].count) if data['types'] else 'COMPONENT'
+        
+        aggregated_components.append({
+            'component_name': data['name'],
+            'cas_number': cas_number,
+            'percentage': round(weighted_percentage, 4),
+            'component_type': component_type,
+            'confidence_level': round(confidence, 2),
+            'notes': f'Aggregated from {len(data["percentages"])} analyses'
+        })
+    
+    aggregated_components.sort(key=lambda x: x['percentage'], reverse=True)
+    
+    total = sum(c['percentage'] for c in aggregated_components)
+    if total > 0:
+        normalization_factor = 100.0 / total
+        for component in aggregated_components:
+            component['percentage'] = round(component['percentage'] * normalization_factor, 4)
+    
+    return aggregated_components
+
+
+def best_of(func, repeat=3):
+    """Best wall time over several runs"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    analysis_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    component_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    
+    calculator = CompositeCalculator(db=None, identity_index=ComponentIdentityIndex([], []))
+    analyses = generate_analyses(analysis_count, component_count)
+    
+    legacy_time, legacy_result = best_of(lambda: aggregate_legacy(calculator, analyses))
+    matrix_time, matrix_result = best_of(lambda: calculator._aggregate_analyses(analyses))
+    build_time, _ = best_of(lambda: calculator._component_matrix(analyses))
+    matrix = calculator._component_matrix(analyses)
+    bootstrap_time, _ = best_of(lambda: calculator._bootstrap_intervals(matrix))
+    loo_time, (_, without) = best_of(matrix.leave_one_out_percentages)
+    names = matrix.names
+    outlier_time, _ = best_of(matrix.outlier_scores)
+    
+    if [c['component_name'] for c in legacy_result] != [c['component_name'] for c in matrix_result]:
+        print("❌ Component order differs")
+        sys.exit(1)
+    
+    for legacy, matrix in zip(legacy_result, matrix_result):
+        if (
+            abs(legacy['percentage'] - matrix['percentage']) > 1e-4
+            or abs(legacy['confidence_level'] - matrix['confidence_level']) > 1e-2
+            or (legacy['cas_number'], legacy['component_type'], legacy['notes'])
+            != (matrix['cas_number'], matrix['component_type'], matrix['notes'])
+        ):
+            print(f"❌ {legacy['component_name']} differs: {legacy} != {matrix}")
+            sys.exit(1)
+    
+    for row in range(0, analysis_count, max(1, analysis_count // 10)):
+        expected = {
+            c['component_name']: c['percentage']
+            for c in calculator._aggregate_analyses(analyses[:row] + analyses[row + 1:])
+        }
+        actual = dict(zip(names, without[row].tolist()))
+        if any(abs(actual[name] - expected.get(name, 0.0)) > 1e-2 for name in actual):
+            print(f"❌ Leave-one-out composite without analysis {row} differs")
+            sys.exit(1)
+    
+    print(f"Analyses:       {analysis_count}")
+    print(f"Components:     {component_count}")
+    print(f"Legacy loop:    {legacy_time * 1000:.1f} ms")
+    print(f"Matrix:         {matrix_time * 1000:.1f} ms "
+          f"(building the matrix from parsed_data: {build_time * 1000:.1f} ms)")
+    print(f"Speedup:        {legacy_time / matrix_time:.1f}x")
+    print(f"Bootstrap CIs:  {bootstrap_time * 1000:.1f} ms ({settings.BOOTSTRAP_RESAMPLES} resamples)")
+    print(f"Leave-one-out:  {loo_time * 1000:.1f} ms ({analysis_count} composites)")
+    print(f"Outlier scores: {outlier_time * 1000:.1f} ms")
+    print("✅ Composites match to 4 decimals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the chromatographic CSV parser
+
+Compares the old row-by-row parsing (the iterrows loop parse_file used
+before the column-wise rewrite, kept here as the reference implementation)
+with the column-wise parsing used by parse_file, and checks both give the
+same output.
+
+Usage:
+    python scripts/benchmark_csv_parser.py [rows]
+"""
+
+import os
+import re
+import sys
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from app.parsers.csv_parser import ChromatographicCSVParser
+
+
+def generate_csv(path, rows):
+    """Generate a peak table with the given number of rows"""
+    random.seed(42)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('Component,CAS,Area%\n')
+        for i in range(rows):
+            cas = f"{random.randint(50, 99999)}-{random.randint(10, 99)}-{random.randint(0, 9)}"
+            f.write(f"Peak {i},{cas},{random.uniform(0.001, 2.0):.4f}%\n")
+
+
+def clean_cas_number(cas):
+    """Reference implementation: the previous per-row CAS cleaning"""
+    cas = cas.strip()
+    if re.match(r'^\d{2,7}-\d{2}-\d$', cas):
+        return cas
+    match = re.search(r'(\d{2,7}-\d{2}-\d)', cas)
+    if match:
+        return match.group(1)
+    return None
+
+
+def parse_component(row, cas_col, component_col, percentage_col):
+    """Reference implementation: the previous per-row component parsing"""
+    try:
+        component_name = str(row[component_col]).strip()
+        if pd.isna(row[component_col]) or component_name in ['', 'nan', 'None']:
+            return None
+
+        percentage = float(str(row[percentage_col]).strip().replace('%', '').strip())
+        if percentage <= 0:
+            return None
+
+        cas_number = None
+        if cas_col and not pd.isna(row[cas_col]):
+            cas_number = clean_cas_number(str(row[cas_col]))
+
+        threshold = ChromatographicCSVParser.IMPURITY_THRESHOLD
+        return {
+            'cas_number': cas_number,
+            'component_name': component_name,
+            'percentage': percentage,
+            'component_type': 'IMPURITY' if percentage < threshold else 'COMPONENT'
+        }
+    except (ValueError, KeyError):
+        return None
+
+
+def parse_row_by_row(file_path):
+    """Reference implementation: the previous iterrows loop"""
+    data = pd.read_csv(file_path)
+    data.columns = [col.lower().strip() for col in data.columns]
+
+    components = []
+    for _, row in data.iterrows():
+        component = parse_component(row, 'cas', 'component', 'area%')
+        if component:
+            components.append(component)
+    return components
+
+
+def parse_column_wise(file_path):
+    """Column-wise parsing, same steps as parse_file"""
+    parser = ChromatographicCSVParser()
+    parser.data = pd.read_csv(file_path)
+    parser.data.columns = [col.lower().strip() for col in parser.data.columns]
+
+    components, _ = parser._parse_components('cas', 'component', 'area%')
+    return components
+
+
+def best_of(func, file_path, repeat=3):
+    """Best wall time over several runs"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(file_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'benchmark.csv')
+        generate_csv(file_path, rows)
+
+        row_time, row_result = best_of(parse_row_by_row, file_path)
+        column_time, column_result = best_of(parse_column_wise, file_path)
+
+    if row_result != column_result:
+        print("❌ Column-wise output differs from row-by-row output")
+        sys.exit(1)
+
+    print(f"Rows:           {rows}")
+    print(f"Row by row:     {row_time * 1000:.1f} ms")
+    print(f"Column-wise:    {column_time * 1000:.1f} ms")
+    print(f"Speedup:        {row_time / column_time:.1f}x")
+    print("✅ Outputs are identical")
+
+
+if __name__ == "__main__":
+    main()
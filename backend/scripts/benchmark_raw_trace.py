@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for raw chromatogram trace integration
+
+Builds a synthetic trace (Gaussian peaks on a drifting, noisy baseline),
+integrates it with RawTraceParser and checks the time budget and that the
+peaks and their area percentages are recovered.
+
+Usage:
+    python scripts/benchmark_raw_trace.py [points] [budget_seconds]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.parsers.raw_trace_parser import RawTraceParser
+
+
+def synthetic_trace(points, peak_count=150, seed=42):
+    """Trace over 60 minutes with known peaks"""
+    rng = np.random.default_rng(seed)
+    times = np.linspace(0.0, 60.0, points)
+
+    centers = np.sort(rng.uniform(1.0, 59.0, peak_count))
+    # Keep peaks apart so each one is resolved
+    centers = centers[np.concatenate(([True], np.diff(centers) > 0.2))]
+    heights = rng.uniform(50.0, 5000.0, len(centers))
+    widths = rng.uniform(0.01, 0.03, len(centers))
+
+    signal = 20.0 + 0.5 * times + 5.0 * np.sin(times / 10.0)
+    signal += rng.normal(0.0, 1.0, points)
+    for center, height, width in zip(centers, heights, widths):
+        window = slice(np.searchsorted(times, center - 6 * width), np.searchsorted(times, center + 6 * width))
+        signal[window] += height * np.exp(-0.5 * ((times[window] - center) / width) ** 2)
+
+    areas = heights * widths * np.sqrt(2 * np.pi)
+    return times, signal, centers, areas / areas.sum() * 100.0
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    times, signal, centers, expected = synthetic_trace(points)
+
+    parser = RawTraceParser()
+    start = time.perf_counter()
+    result = parser.parse_arrays(times, signal)
+    elapsed = time.perf_counter() - start
+
+    found = np.array([c['retention_time'] for c in result['components']])
+    found_pct = np.array([c['percentage'] for c in result['components']])
+
+    # Match each expected peak to the closest detected one
+    nearest = np.abs(found[None, :] - centers[:, None]).argmin(axis=1) if len(found) else np.array([], dtype=int)
+    matched = np.abs(found[nearest] - centers) < 0.02 if len(found) else np.zeros(len(centers), dtype=bool)
+    pct_error = np.abs(found_pct[nearest[matched]] - expected[matched]).max() if matched.any() else float('nan')
+
+    print(f"Points:             {points:,}")
+    print(f"Integration time:   {elapsed * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    print(f"Peaks expected:     {len(centers)}")
+    print(f"Peaks detected:     {result['component_count']}")
+    print(f"Peaks matched:      {matched.sum()}")
+    print(f"Max area% error:    {pct_error:.3f}")
+
+    if elapsed > budget:
+        print("❌ Over time budget")
+        sys.exit(1)
+    print("✅ Within time budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stress test for composite version allocation
+
+Several writers, each with its own session, calculate composites of the
+same few materials at the same time. Every material must end up with the
+versions 1..N without gaps or duplicates, whatever the number of writers.
+Run it against PostgreSQL (SQLite serializes all writers anyway).
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/stress_composite_versions.py [calculations] [materials]
+"""
+
+import os
+import sys
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal, engine, Base
+from app.models import Material, ChromatographicAnalysis, Composite
+from app.services.composite_calculator import CompositeCalculator
+
+WRITER_COUNTS = [1, 2, 4, 8, 16]
+
+
+def create_materials(material_count):
+    """Materials with a few processed analyses each"""
+    random.seed(7)
+    db = SessionLocal()
+    try:
+        materials = []
+        for i in range(material_count):
+            material = Material(reference_code=f"STRESS-{uuid.uuid4().hex[:12]}", name=f"Stress {i}")
+            db.add(material)
+            db.flush()
+            
+            for j in range(5):
+                percentages = [random.uniform(1, 10) for _ in range(20)]
+                total = sum(percentages)
+                db.add(ChromatographicAnalysis(
+                    material_id=material.id,
+                    filename=f"stress-{i}-{j}.csv",
+                    file_path="",
+                    is_processed=1,
+                    weight=1.0,
+                    parsed_data={'components': [
+                        {
+                            'cas_number': None,
+                            'component_name': f"Component {k}",
+                            'percentage': p * 100 / total,
+                            'component_type': 'COMPONENT'
+                        }
+                        for k, p in enumerate(percentages)
+                    ]}
+                ))
+            materials.append(material.id)
+        db.commit()
+        return materials
+    finally:
+        db.close()
+
+
+def run(writer_count, calculations, material_ids):
+    """Calculate composites from several threads; returns (seconds, errors)"""
+    tasks = [material_ids[i % len(material_ids)] for i in range(calculations)]
+    lock = threading.Lock()
+    errors = []
+    
+    def writer():
+        db = SessionLocal()
+        try:
+            while True:
+                with lock:
+                    if not tasks:
+                        return
+                    material_id = tasks.pop()
+                try:
+                    composite = CompositeCalculator(db).calculate_from_lab_analyses(material_id)
+                    db.add(composite)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+    
+    threads = [threading.Thread(target=writer) for _ in range(writer_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, errors
+
+
+def check_versions(material_ids):
+    """Materials whose versions are not exactly 1..N"""
+    db = SessionLocal()
+    try:
+        versions = {material_id: [] for material_id in material_ids}
+        for material_id, version in db.query(Composite.material_id, Composite.version).filter(
+            Composite.material_id.in_(material_ids)
+        ):
+            versions[material_id].append(version)
+        
+        return {
+            material_id: [v for v, n in Counter(found).items() if n > 1] or sorted(found)
+            for material_id, found in versions.items()
+            if sorted(found) != list(range(1, len(found) + 1))
+        }
+    finally:
+        db.close()
+
+
+def main():
+    calculations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    material_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    
+    Base.metadata.create_all(bind=engine)
+    print(f"Database:       {engine.dialect.name}")
+    print(f"Calculations:   {calculations} per run on {material_count} materials")
+    
+    failed = False
+    for writer_count in WRITER_COUNTS:
+        material_ids = create_materials(material_count)
+        seconds, errors = run(writer_count, calculations, material_ids)
+        wrong = check_versions(material_ids)
+        
+        status = "✅" if not errors and not wrong else "❌"
+        print(f"{status} {writer_count:>2} writers: {calculations / seconds:7.1f} composites/s, "
+              f"{len(errors)} errors, {len(wrong)} materials with bad versions")
+        for error in errors[:3]:
+            print(f"     {error}")
+        for material_id, versions in list(wrong.items())[:3]:
+            print(f"     material {material_id}: {versions}")
+        failed = failed or bool(errors or wrong)
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Shared fixtures
+
+The tests run against a throwaway SQLite file: DATABASE_URL is set here,
+before the app is imported, so the engine, the tables created on startup
+and every session point to it. Each test starts with empty tables and
+empty in-process caches.
+"""
+
+import contextlib
+import os
+import tempfile
+
+_test_dir = tempfile.mkdtemp(prefix="lluch-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_dir, 'test.sqlite')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_test_dir, "uploads")
+os.environ["DEBUG"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.core.database import Base, SessionLocal, engine
+from app.models import Material, ChromatographicAnalysis, Composite, CompositeComponent
+from app.models.composite import CompositeOrigin, CompositeStatus
+from app.services import component_identity, composite_drift, composite_similarity, significance
+from app.services.analysis_components import AnalysisComponentIndex
+from app.services.comparison_cache import get_comparison_cache
+from app.services.composite_calculator import CompositeCalculator
+from app.services.composite_preview import _preview_cache
+from app.services.retention_index import invalidate_reference_library
+
+
+@pytest.fixture(autouse=True)
+def clean_database(monkeypatch):
+    """Empty tables and caches, so IDs and fingerprints from other tests never match"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    
+    monkeypatch.setattr(component_identity, "_index", None)
+    monkeypatch.setattr(significance, "_engine", None)
+    monkeypatch.setattr(composite_similarity, "_index", None)
+    monkeypatch.setattr(composite_drift, "_ranking", None)
+    monkeypatch.setattr(composite_drift, "_pair_scores", None)
+    invalidate_reference_library()
+    get_comparison_cache().clear()
+    _preview_cache.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    """Database session, closed after the test"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    """API client; routes are under /api"""
+    return TestClient(app)
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager factory: collects the SQL statements executed inside the block"""
+    @contextlib.contextmanager
+    def count():
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    
+    return count
+
+
+@pytest.fixture
+def make_material(db):
+    """Factory: create and commit a material"""
+    def make(reference_code=None, name=None):
+        count = db.query(Material).count()
+        material = Material(
+            reference_code=reference_code or f"MAT-{count + 1}",
+            name=name or f"Material {count + 1}"
+        )
+        db.add(material)
+        db.commit()
+        return material
+    
+    return make
+
+
+@pytest.fixture
+def make_analysis(db):
+    """
+    Factory: create a processed analysis like an upload does
+    
+    The components are indexed in analysis_components and added to the
+    running component statistics before the commit.
+    """
+    def make(material, components, weight=1.0, batch_number=None):
+        analysis = ChromatographicAnalysis(
+            material_id=material.id,
+            filename="analysis.csv",
+            file_path=os.path.join(os.environ["UPLOAD_DIR"], "not-stored.csv"),
+            batch_number=batch_number,
+            weight=weight,
+            is_processed=1,
+            parsed_data={'components': components}
+        )
+        db.add(analysis)
+        db.flush()
+        AnalysisComponentIndex(db).add([analysis])
+        CompositeCalculator(db).record_analysis(analysis)
+        db.commit()
+        return analysis
+    
+    return make
+
+
+@pytest.fixture
+def make_composite(db):
+    """
+    Factory: create the next LAB composite of a material
+    
+    components maps component names to percentages, or to (percentage,
+    cas_number) tuples.
+    """
+    def make(material, components, status=CompositeStatus.DRAFT):
+        versions = [composite.version for composite in db.query(Composite).filter(Composite.material_id == material.id)]
+        composite = Composite(
+            material_id=material.id,
+            version=max(versions, default=0) + 1,
+            origin=CompositeOrigin.LAB,
+            status=status
+        )
+        for name, value in components.items():
+            percentage, cas_number = value if isinstance(value, tuple) else (value, None)
+            composite.components.append(CompositeComponent(component_name=name, cas_number=cas_number, percentage=percentage))
+        db.add(composite)
+        db.commit()
+        return composite
+    
+    return make
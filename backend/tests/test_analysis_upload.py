@@ -0,0 +1,205 @@
+"""Analysis uploads: single file, duplicates, batches and queued parsing"""
+
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.models import ChromatographicAnalysis
+from app.tasks.ingestion_tasks import parse_analysis
+
+CSV = b"Component,CAS,Area%\nLimonene,5989-27-5,60\nLinalool,78-70-6,40\n"
+
+
+@pytest.fixture
+def material(make_material):
+    return make_material()
+
+
+def upload(client, material_id, content=CSV, filename="analysis.csv", **form):
+    return client.post(
+        "/api/chromatographic-analyses",
+        data={'material_id': material_id, **form},
+        files={'file': (filename, content, 'text/csv')}
+    )
+
+
+def test_upload_is_parsed_from_memory_and_stored_by_content(client, material):
+    response = upload(client, material.id)
+    
+    assert response.status_code == 201, response.text
+    analysis = response.json()
+    assert analysis['is_processed'] == 1
+    assert [c['component_name'] for c in analysis['parsed_data']['components']] == ['Limonene', 'Linalool']
+    stored = os.path.join(settings.UPLOAD_DIR, f"{analysis['file_hash']}.csv")
+    with open(stored, 'rb') as f:
+        assert f.read() == CSV
+
+
+def test_upload_over_the_size_limit_is_rejected(client, material, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", len(CSV) - 1)
+    
+    response = upload(client, material.id)
+    
+    assert response.status_code == 413
+    assert client.get(f"/api/chromatographic-analyses/material/{material.id}").json() == []
+
+
+def test_duplicate_upload_is_rejected_unless_allowed(client, material, make_material):
+    first = upload(client, material.id).json()
+    
+    duplicate = upload(client, material.id, filename="renamed.csv")
+    assert duplicate.status_code == 409
+    assert duplicate.json()['detail'] == f"File already ingested as analysis {first['id']}"
+    
+    allowed = upload(client, material.id, allow_duplicate='true')
+    assert allowed.status_code == 201
+    other_material = upload(client, make_material().id)
+    assert other_material.status_code == 201
+    
+    # Every analysis shares the stored file and the cached parse result
+    by_hash = client.get(f"/api/chromatographic-analyses/by-hash/{first['file_hash']}").json()
+    assert [a['id'] for a in by_hash] == [first['id'], allowed.json()['id'], other_material.json()['id']]
+    assert {a['file_path'] for a in by_hash} == {first['file_path']}
+    assert other_material.json()['parsed_data'] == first['parsed_data']
+
+
+def test_shared_file_is_kept_until_its_last_analysis_is_deleted(client, material, make_material):
+    first = upload(client, material.id).json()
+    second = upload(client, make_material().id).json()
+    
+    assert client.delete(f"/api/chromatographic-analyses/{first['id']}").status_code == 204
+    assert os.path.exists(second['file_path'])
+    assert client.delete(f"/api/chromatographic-analyses/{second['id']}").status_code == 204
+    assert not os.path.exists(second['file_path'])
+
+
+def peak_table(limonene):
+    return f"Component,CAS,Area%\nLimonene,5989-27-5,{limonene}\nLinalool,78-70-6,{100 - limonene}\n".encode()
+
+
+def batch(client, files, **form):
+    response = client.post(
+        "/api/chromatographic-analyses/batch",
+        data=form,
+        files=[('files', (filename, content, 'application/octet-stream')) for filename, content in files]
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_batch_metadata_is_matched_by_filename_then_position(client, db, material, make_material):
+    other = make_material()
+    metadata = [
+        {'filename': 'c.csv', 'batch_number': 'C', 'material_id': other.id, 'weight': 3.0},
+        {'batch_number': 'first'},
+        {'batch_number': 'second', 'supplier': 'Supplier B'}
+    ]
+    
+    result = batch(
+        client,
+        [('a.csv', peak_table(60)), ('b.csv', peak_table(50)), ('c.csv', peak_table(40))],
+        material_id=material.id,
+        metadata=json.dumps(metadata)
+    )
+    
+    assert (result['total'], result['created'], result['failed']) == (3, 3, 0)
+    analyses = {a.filename: a for a in db.query(ChromatographicAnalysis)}
+    assert {name: (a.material_id, a.batch_number, a.supplier, a.weight) for name, a in analyses.items()} == {
+        'a.csv': (material.id, 'first', None, 1.0),
+        'b.csv': (material.id, 'second', 'Supplier B', 1.0),
+        'c.csv': (other.id, 'C', None, 3.0)
+    }
+    assert analyses['c.csv'].parsed_data['components'][0]['percentage'] == 40
+
+
+def test_batch_reports_every_file(client, material):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zipped:
+        zipped.writestr('nested/x.csv', peak_table(70))
+        zipped.writestr('notes.txt', b"not a peak table")
+    
+    result = batch(
+        client,
+        [
+            ('tables.zip', archive.getvalue()),
+            ('a.csv', peak_table(60)),
+            ('a-again.csv', peak_table(60)),
+            ('report.pdf', b"%PDF"),
+            ('broken.zip', b"not a zip"),
+            ('elsewhere.csv', peak_table(20))
+        ],
+        material_id=material.id,
+        metadata=json.dumps([{'filename': 'elsewhere.csv', 'material_id': 999}])
+    )
+    
+    assert [(r['filename'], r['success'], r['error']) for r in result['results']] == [
+        ('x.csv', True, None),
+        ('a.csv', True, None),
+        ('a-again.csv', False, "Same file already included in this batch"),
+        ('report.pdf', False, "Only CSV and zip files are supported"),
+        ('broken.zip', False, "Invalid zip archive"),
+        ('elsewhere.csv', False, "Material 999 not found")
+    ]
+    
+    again = batch(client, [('a.csv', peak_table(60))], material_id=material.id)
+    assert again['results'][0]['error'] == f"File already ingested as analysis {result['results'][1]['analysis_id']}"
+    assert batch(client, [('b.csv', peak_table(50))])['results'][0]['error'] == "No material_id given for this file"
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Captured parse_analysis enqueues; the task runs with parse_analysis.apply"""
+    queued = []
+    monkeypatch.setattr(parse_analysis, "apply_async", lambda args, task_id: queued.append((args, task_id)))
+    monkeypatch.setattr(parse_analysis, "update_state", lambda **kwargs: None)
+    return queued
+
+
+def test_queued_upload_is_parsed_by_the_ingestion_task(client, material, queue, monkeypatch, caplog):
+    def unreachable(task_id):
+        raise ConnectionError("result backend unreachable")
+    monkeypatch.setattr(celery_app, "AsyncResult", unreachable)
+    
+    response = upload(client, material.id, async_processing='true')
+    assert response.status_code == 201, response.text
+    analysis = response.json()
+    assert analysis['is_processed'] == 0
+    assert queue == [([analysis['id']], analysis['parsed_data']['task_id'])]
+    
+    status = client.get(f"/api/chromatographic-analyses/{analysis['id']}/status").json()
+    assert (status['state'], status['progress']) == ('QUEUED', 0.0)
+    assert "result backend unreachable" in caplog.text
+    
+    parse_analysis.apply(args=[analysis['id']])
+    
+    status = client.get(f"/api/chromatographic-analyses/{analysis['id']}/status").json()
+    assert (status['state'], status['is_processed'], status['progress']) == ('PROCESSED', 1, 1.0)
+    parsed = client.get(f"/api/chromatographic-analyses/{analysis['id']}").json()['parsed_data']
+    assert [c['component_name'] for c in parsed['components']] == ['Limonene', 'Linalool']
+
+
+def test_failed_enqueue_removes_the_analysis_and_its_file(client, material, make_material, monkeypatch):
+    def broker_down(args, task_id):
+        raise ConnectionError("broker unreachable")
+    monkeypatch.setattr(parse_analysis, "apply_async", broker_down)
+    
+    response = upload(client, material.id, async_processing='true')
+    assert response.status_code == 503
+    assert "broker unreachable" in response.json()['detail']
+    assert client.get(f"/api/chromatographic-analyses/material/{material.id}").json() == []
+    stored = os.path.join(settings.UPLOAD_DIR, f"{hashlib.sha256(CSV).hexdigest()}.csv")
+    assert not os.path.exists(stored)
+    
+    # A file another queued analysis still needs stays
+    monkeypatch.setattr(parse_analysis, "apply_async", lambda args, task_id: None)
+    queued = upload(client, make_material().id, async_processing='true').json()
+    monkeypatch.setattr(parse_analysis, "apply_async", broker_down)
+    assert upload(client, material.id, async_processing='true').status_code == 503
+    assert queued['file_path'] == stored
+    assert os.path.exists(stored)
@@ -0,0 +1,112 @@
+"""Bulk composite calculation: errors per material, outlier handling and query count"""
+
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.services.composite_calculator import CompositeCalculator
+from test_component_statistics import random_components
+
+
+def make_materials(make_material, make_analysis, count, seed=14):
+    """Materials with four similar analyses and one outlier each"""
+    rng = random.Random(seed)
+    materials = []
+    for _ in range(count):
+        material = make_material()
+        components = random_components(rng)
+        for _ in range(4):
+            make_analysis(material, [
+                {**component, 'percentage': component['percentage'] * rng.uniform(0.97, 1.03)}
+                for component in components
+            ])
+        make_analysis(material, random_components(rng))
+        materials.append(material)
+    return materials
+
+
+def calculate(client, **request):
+    response = client.post("/api/composites/calculate/bulk", json=request)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_a_selection_is_required(client, make_material, make_analysis):
+    make_materials(make_material, make_analysis, 2)
+    
+    response = client.post("/api/composites/calculate/bulk", json={})
+    assert response.status_code == 400
+    assert "all_materials" in response.json()['detail']
+    
+    assert calculate(client, all_materials=True)['created'] == 2
+
+
+def test_each_material_gets_its_own_result(client, db, make_material, make_analysis):
+    calculated, inactive = make_materials(make_material, make_analysis, 2)
+    inactive.is_active = False
+    without_analyses = make_material()
+    db.commit()
+    
+    result = calculate(client, material_ids=[calculated.id, 999, without_analyses.id, inactive.id, calculated.id])
+    
+    assert (result['total'], result['created'], result['failed']) == (4, 1, 3)
+    assert [(r['material_id'], r['success'], r['error']) for r in result['results']] == [
+        (calculated.id, True, None),
+        (999, False, "Material 999 not found"),
+        (without_analyses.id, False, f"No processed analyses found for material {without_analyses.id}"),
+        (inactive.id, False, f"Material {inactive.id} not found")
+    ]
+    assert result['results'][0]['version'] == 1
+    
+    # Inactive materials are included when asked for
+    result = calculate(client, material_ids=[inactive.id], active_only=False)
+    assert result['results'][0]['success'] is True
+
+
+@pytest.mark.parametrize("outliers", ['none', 'exclude', 'downweight'])
+def test_outlier_handling_matches_single_calculation(db, make_material, make_analysis, monkeypatch, outliers):
+    materials = make_materials(make_material, make_analysis, 3)
+    monkeypatch.setattr(settings, "OUTLIER_HANDLING", outliers)
+    
+    calculated = CompositeCalculator(db).calculate_bulk(material_ids=[m.id for m in materials])
+    
+    for material, item in zip(materials, calculated):
+        expected = CompositeCalculator(db).calculate_from_lab_analyses(material.id)
+        composite = item['composite']
+        assert [(c.component_name, c.cas_number) for c in composite.components] == [
+            (c.component_name, c.cas_number) for c in expected.components
+        ]
+        assert [c.percentage for c in composite.components] == pytest.approx(
+            [c.percentage for c in expected.components], abs=1e-4
+        )
+        assert composite.composite_metadata == expected.composite_metadata
+        db.rollback()
+    
+    if outliers == 'exclude':
+        assert all(len(item['composite'].composite_metadata['analysis_ids']) == 4 for item in calculated)
+
+
+def test_unknown_outlier_handling_is_rejected(client, make_material, make_analysis):
+    make_materials(make_material, make_analysis, 1)
+    
+    response = client.post("/api/composites/calculate/bulk", json={'all_materials': True, 'outliers': 'drop'})
+    
+    assert response.status_code == 400
+    assert "Unknown outlier handling 'drop'" in response.json()['detail']
+
+
+@pytest.mark.parametrize("outliers", ['none', 'exclude'])
+def test_query_count_does_not_grow_with_the_materials(db, make_material, make_analysis, count_queries, outliers):
+    few = make_materials(make_material, make_analysis, 2)
+    many = make_materials(make_material, make_analysis, 8, seed=15)
+    
+    counts = []
+    for materials in (few, many):
+        material_ids = [m.id for m in materials]
+        with count_queries() as statements:
+            CompositeCalculator(db).calculate_bulk(material_ids=material_ids, outliers=outliers)
+        counts.append(len(statements))
+        db.rollback()
+    
+    assert counts[0] == counts[1]
@@ -0,0 +1,133 @@
+"""Cached composite comparisons and their invalidation"""
+
+import re
+
+import pytest
+
+from app.models.composite import CompositeStatus
+from app.services.comparison_cache import ComparisonCache, get_comparison_cache
+
+OLD = {'Limonene': (60.0, '5989-27-5'), 'Linalool': (30.0, '78-70-6'), 'Citral': (10.0, '5392-40-5')}
+NEW = {'Limonene': (58.0, '5989-27-5'), 'Linalool': (30.0, '78-70-6'), 'Citral': (12.0, '5392-40-5')}
+
+
+@pytest.fixture
+def material(make_material):
+    return make_material()
+
+
+def compare(client, old_id, new_id):
+    response = client.get(f"/api/composites/{old_id}/compare/{new_id}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_repeated_comparison_is_served_from_cache(client, material, make_composite):
+    old, new = make_composite(material, OLD), make_composite(material, NEW)
+    
+    first = compare(client, old.id, new.id)
+    second = compare(client, old.id, new.id)
+    
+    assert second == first
+    stats = get_comparison_cache().stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("catalog", [[], [{'name': 'Limonene', 'cas_number': '5989-27-5'}]])
+def test_hit_only_runs_the_state_and_fingerprint_queries(client, db, material, make_composite, count_queries, catalog):
+    if catalog:
+        assert client.post("/api/component-catalog", json=catalog).status_code == 201
+    old, new = make_composite(material, OLD), make_composite(material, NEW)
+    compare(client, old.id, new.id)
+    
+    with count_queries() as statements:
+        compare(client, old.id, new.id)
+    
+    assert get_comparison_cache().stats()['hits'] == 1
+    tables = [re.search(r"FROM (\w+)", statement).group(1) for statement in statements]
+    assert tables == ['composites', 'component_catalog', 'component_synonyms', 'significance_rules']
+
+
+def test_only_final_pairs_are_kept_without_expiry(client, material, make_composite):
+    approved = make_composite(material, OLD, status=CompositeStatus.APPROVED)
+    archived = make_composite(material, OLD, status=CompositeStatus.ARCHIVED)
+    draft = make_composite(material, NEW)
+    
+    compare(client, approved.id, archived.id)
+    compare(client, approved.id, draft.id)
+    
+    expiries = {composite_ids: expires_at for expires_at, composite_ids, _ in get_comparison_cache()._entries.values()}
+    assert expiries[frozenset((approved.id, archived.id))] is None
+    assert expiries[frozenset((approved.id, draft.id))] is not None
+
+
+def test_status_change_gives_a_new_key(client, material, make_composite):
+    old, new = make_composite(material, OLD, status=CompositeStatus.APPROVED), make_composite(material, NEW)
+    compare(client, old.id, new.id)
+    
+    assert client.put(f"/api/composites/{new.id}/submit-for-approval").status_code == 200
+    compare(client, old.id, new.id)
+    assert client.put(f"/api/composites/{new.id}/approve").status_code == 200
+    compare(client, old.id, new.id)
+    
+    assert get_comparison_cache().stats()['misses'] == 3
+
+
+def test_significance_rule_change_invalidates(client, material, make_composite):
+    old, new = make_composite(material, OLD), make_composite(material, NEW)
+    assert compare(client, old.id, new.id)['significant_changes'] is False
+    
+    response = client.post("/api/significance-rules", json=[{'cas_number': '5392-40-5', 'absolute_threshold': 1.0}])
+    assert response.status_code == 201
+    after = compare(client, old.id, new.id)
+    assert after['significant_changes'] is True
+    assert [c['component_name'] for c in after['components_changed'] if c['significant']] == ['Citral']
+    
+    assert client.delete(f"/api/significance-rules/{response.json()[0]['id']}").status_code == 204
+    assert compare(client, old.id, new.id)['significant_changes'] is False
+
+
+def test_catalog_change_invalidates(client, material, make_composite):
+    old = make_composite(material, {'Limonene': 60.0, 'Linalool': 40.0})
+    new = make_composite(material, {'d-Limonene': 60.0, 'Linalool': 40.0})
+    before = compare(client, old.id, new.id)
+    assert (len(before['components_added']), len(before['components_removed'])) == (1, 1)
+    
+    response = client.post("/api/component-catalog", json=[{'name': 'Limonene', 'synonyms': ['d-Limonene']}])
+    assert response.status_code == 201
+    
+    after = compare(client, old.id, new.id)
+    assert (after['components_added'], after['components_removed'], after['components_changed']) == ([], [], [])
+
+
+def test_deleted_composite_drops_its_comparisons(client, material, make_composite):
+    old, new = make_composite(material, OLD), make_composite(material, NEW)
+    other = make_composite(material, OLD)
+    compare(client, old.id, new.id)
+    compare(client, old.id, other.id)
+    
+    assert client.delete(f"/api/composites/{other.id}").status_code == 204
+    
+    assert [composite_ids for _, composite_ids, _ in get_comparison_cache()._entries.values()] == [frozenset((old.id, new.id))]
+
+
+def test_recreated_composite_is_not_served_a_stale_comparison(client, db, material, make_composite):
+    old, new = make_composite(material, OLD), make_composite(material, NEW)
+    assert len(compare(client, old.id, new.id)['components_changed']) == 2
+    new_id = new.id
+    
+    assert client.delete(f"/api/composites/{new_id}").status_code == 204
+    db.expunge(new)
+    recreated = make_composite(material, OLD)
+    
+    # SQLite hands out the freed ID again, with the same status and possibly the same created_at
+    assert recreated.id == new_id
+    assert compare(client, old.id, recreated.id)['components_changed'] == []
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ComparisonCache(max_entries=0, draft_ttl=300)
+    
+    cache.put("key", (1, 2), comparison=None, permanent=True)
+    
+    assert len(cache) == 0
@@ -0,0 +1,101 @@
+"""Component catalog changes: re-keying stored components and rebuilding statistics"""
+
+import random
+
+import pytest
+
+from app.models import AnalysisComponent, ComponentStatistics
+from app.services.composite_calculator import CompositeCalculator
+from test_component_statistics import assert_same_components, full_recalculation, random_components
+
+LIMONENE = [
+    {'cas_number': '5989-27-5', 'component_name': 'Limonene', 'percentage': 40.0, 'component_type': 'COMPONENT'},
+    {'cas_number': None, 'component_name': 'd-Limonene', 'percentage': 5.0, 'component_type': 'COMPONENT'},
+    {'cas_number': '138-86-3', 'component_name': 'Dipentene', 'percentage': 3.0, 'component_type': 'COMPONENT'},
+]
+
+
+@pytest.fixture
+def materials(make_material, make_analysis):
+    """A material reporting limonene under three identities, and one that does not"""
+    rng = random.Random(20)
+    with_limonene, without = make_material(), make_material()
+    for _ in range(3):
+        make_analysis(with_limonene, [dict(c, percentage=c['percentage'] * rng.uniform(0.9, 1.1)) for c in LIMONENE] + random_components(rng, 6))
+        make_analysis(without, random_components(rng, 6))
+    return with_limonene, without
+
+
+def stored_keys(db, material_id):
+    """Distinct keys of the material's stored components and statistics"""
+    db.expire_all()
+    components = {row.component_key for row in db.query(AnalysisComponent).filter(AnalysisComponent.material_id == material_id)}
+    statistics = {row.component_key for row in db.query(ComponentStatistics).filter(ComponentStatistics.material_id == material_id)}
+    return components, statistics
+
+
+def assert_statistics_match_a_full_recalculation(db, material_id):
+    db.expire_all()
+    assert_same_components(full_recalculation(db, material_id), CompositeCalculator(db)._aggregate_statistics(material_id))
+
+
+def limonene_keys(db, material_id):
+    """Keys the limonene peaks of a material are stored under"""
+    components, _ = stored_keys(db, material_id)
+    return {key for key in components if 'limonene' in key or key in ('cas_5989-27-5', 'cas_138-86-3')}
+
+
+def test_new_entry_rekeys_its_synonyms(client, db, materials):
+    with_limonene, without = materials
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5', 'name_d-limonene', 'cas_138-86-3'}
+    untouched = {row.id for row in db.query(ComponentStatistics).filter(ComponentStatistics.material_id == without.id)}
+    
+    response = client.post("/api/component-catalog", json=[
+        {'name': 'Limonene', 'cas_number': '5989-27-5', 'synonyms': ['d-Limonene'], 'cas_aliases': ['138-86-3']}
+    ])
+    
+    assert response.status_code == 201, response.text
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5'}
+    statistics = stored_keys(db, with_limonene.id)[1]
+    assert 'name_d-limonene' not in statistics and 'cas_138-86-3' not in statistics
+    assert_statistics_match_a_full_recalculation(db, with_limonene.id)
+    
+    # Three limonene peaks in each of three analyses
+    merged = next(c for c in CompositeCalculator(db)._aggregate_statistics(with_limonene.id) if c['component_name'] == 'Limonene')
+    assert merged['notes'] == 'Aggregated from 9 analyses'
+    
+    # Materials without those components keep their statistics rows
+    assert {row.id for row in db.query(ComponentStatistics).filter(ComponentStatistics.material_id == without.id)} == untouched
+
+
+def test_synonym_changes_rekey_both_ways(client, db, materials):
+    with_limonene, _ = materials
+    entry = client.post("/api/component-catalog", json=[{'name': 'Limonene', 'cas_number': '5989-27-5'}]).json()[0]
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5', 'name_d-limonene', 'cas_138-86-3'}
+    
+    response = client.post(f"/api/component-catalog/{entry['id']}/synonyms", json={'synonyms': ['D-Limonene '], 'cas_aliases': ['138-86-3']})
+    assert response.status_code == 200, response.text
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5'}
+    assert_statistics_match_a_full_recalculation(db, with_limonene.id)
+    
+    synonym = next(s for s in response.json()['synonyms'] if s['value'] == 'd-limonene')
+    response = client.delete(f"/api/component-catalog/{entry['id']}/synonyms/{synonym['id']}")
+    assert response.status_code == 200, response.text
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5', 'name_d-limonene'}
+    assert_statistics_match_a_full_recalculation(db, with_limonene.id)
+    
+    assert client.delete(f"/api/component-catalog/{entry['id']}").status_code == 204
+    assert limonene_keys(db, with_limonene.id) == {'cas_5989-27-5', 'name_d-limonene', 'cas_138-86-3'}
+    assert_statistics_match_a_full_recalculation(db, with_limonene.id)
+
+
+def test_taken_synonym_is_rejected_without_changes(client, db, materials):
+    with_limonene, _ = materials
+    assert client.post("/api/component-catalog", json=[{'name': 'Limonene', 'cas_number': '5989-27-5'}]).status_code == 201
+    before = stored_keys(db, with_limonene.id)
+    
+    response = client.post("/api/component-catalog", json=[{'name': 'Dipentene', 'cas_number': '138-86-3', 'cas_aliases': ['5989-27-5']}])
+    
+    assert response.status_code == 409
+    assert "already belongs to catalog entry" in response.json()['detail']
+    assert stored_keys(db, with_limonene.id) == before
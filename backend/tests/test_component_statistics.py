@@ -0,0 +1,121 @@
+"""Running component statistics (incremental aggregation) against a full recalculation"""
+
+import random
+
+import pytest
+
+from stress_composite_versions import create_materials, run
+from app.models import ChromatographicAnalysis, ComponentStatistics
+from app.services.composite_calculator import CompositeCalculator
+
+
+def random_components(rng, count=12):
+    """Components of one analysis; a few minor ones are missing, one CAS is reported twice"""
+    components = [
+        {
+            'cas_number': f"{100 + i}-00-{i % 10}" if i % 3 else None,
+            'component_name': f"Component {i}",
+            'percentage': rng.uniform(0.05, 20.0),
+            'component_type': 'IMPURITY' if i % 5 == 0 else 'COMPONENT'
+        }
+        for i in range(count)
+        if i < 4 or rng.random() > 0.2
+    ]
+    components.append(dict(components[1], percentage=rng.uniform(0.05, 1.0)))
+    return components
+
+
+def assert_same_components(expected, actual):
+    assert [c['component_name'] for c in actual] == [c['component_name'] for c in expected]
+    for e, a in zip(expected, actual):
+        assert a['percentage'] == pytest.approx(e['percentage'], abs=1e-4)
+        assert a['confidence_level'] == pytest.approx(e['confidence_level'], abs=1e-2)
+        assert (a['cas_number'], a['component_type'], a['notes']) == (e['cas_number'], e['component_type'], e['notes'])
+
+
+def full_recalculation(db, material_id):
+    """Aggregate every processed analysis of the material from parsed_data"""
+    calculator = CompositeCalculator(db)
+    return calculator._aggregate_analyses(calculator.load_analyses(material_id))
+
+
+def test_incremental_statistics_equal_a_full_recalculation(db, make_material, make_analysis):
+    rng = random.Random(3)
+    material = make_material()
+    other = make_material()
+    analyses = [make_analysis(material, random_components(rng), weight=rng.uniform(0.5, 5)) for _ in range(8)]
+    make_analysis(other, random_components(rng))
+    
+    # Delete two analyses the way the API does
+    calculator = CompositeCalculator(db)
+    for analysis in (analyses[2], analyses[5]):
+        calculator.forget_analysis(analysis)
+        db.delete(analysis)
+    db.commit()
+    
+    incremental = calculator._aggregate_statistics(material.id)
+    
+    assert_same_components(full_recalculation(db, material.id), incremental)
+
+
+def test_statistics_match_a_rebuild(db, make_material, make_analysis):
+    rng = random.Random(4)
+    material = make_material()
+    for _ in range(6):
+        make_analysis(material, random_components(rng), weight=rng.uniform(0.5, 5))
+    
+    calculator = CompositeCalculator(db)
+    incremental = calculator._aggregate_statistics(material.id)
+    keys = [row.component_key for row in db.query(ComponentStatistics).order_by(ComponentStatistics.id)]
+    
+    assert calculator.rebuild_statistics(material.id) == 6
+    db.commit()
+    
+    assert [row.component_key for row in db.query(ComponentStatistics).order_by(ComponentStatistics.id)] == keys
+    assert_same_components(calculator._aggregate_statistics(material.id), incremental)
+
+
+def test_analyses_not_recorded_are_picked_up(db, make_material, make_analysis):
+    rng = random.Random(5)
+    material = make_material()
+    make_analysis(material, random_components(rng))
+    
+    # Written without record_analysis, then one recorded analysis is no longer processed
+    for _ in range(3):
+        db.add(ChromatographicAnalysis(
+            material_id=material.id,
+            filename="legacy.csv",
+            file_path="",
+            weight=1.0,
+            is_processed=1,
+            parsed_data={'components': random_components(rng)}
+        ))
+    db.commit()
+    
+    calculator = CompositeCalculator(db)
+    assert calculator.sync_statistics(material.id) == 3
+    db.commit()
+    assert_same_components(full_recalculation(db, material.id), calculator._aggregate_statistics(material.id))
+    
+    first = db.query(ChromatographicAnalysis).order_by(ChromatographicAnalysis.id).first()
+    first.is_processed = -1
+    db.commit()
+    
+    assert calculator.sync_statistics(material.id) == 3
+    db.commit()
+    assert_same_components(full_recalculation(db, material.id), calculator._aggregate_statistics(material.id))
+
+
+def test_concurrent_calculations_record_missing_analyses_once(db):
+    # The analyses of these materials are not in the statistics yet, so the
+    # first calculations of every writer race to record them
+    material_ids = create_materials(2)
+    
+    _, errors = run(8, 24, material_ids)
+    
+    assert errors == []
+    for material_id in material_ids:
+        assert_same_components(
+            full_recalculation(db, material_id),
+            CompositeCalculator(db)._aggregate_statistics(material_id)
+        )
@@ -0,0 +1,151 @@
+"""Matrix aggregation (CompositeCalculator) against the previous per-component loop"""
+
+import numpy as np
+import pytest
+
+from benchmark_composite_aggregation import aggregate_legacy, best_of, generate_analyses
+from app.core.config import settings
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex
+
+
+@pytest.fixture
+def calculator():
+    """Calculator without database or catalog: components keep their legacy keys"""
+    return CompositeCalculator(db=None, identity_index=ComponentIdentityIndex([], []))
+
+
+def assert_same_composite(legacy, aggregated):
+    """Same components in the same order, percentages to 4 decimals"""
+    assert [c['component_name'] for c in aggregated] == [c['component_name'] for c in legacy]
+    for expected, actual in zip(legacy, aggregated):
+        assert actual['percentage'] == pytest.approx(expected['percentage'], abs=1e-4)
+        assert actual['confidence_level'] == pytest.approx(expected['confidence_level'], abs=1e-2)
+        assert (actual['cas_number'], actual['component_type'], actual['notes']) == \
+            (expected['cas_number'], expected['component_type'], expected['notes'])
+
+
+def test_matches_the_legacy_aggregation_to_4_decimals(calculator):
+    analyses = generate_analyses(60, 80)
+    
+    assert_same_composite(aggregate_legacy(calculator, analyses), calculator._aggregate_analyses(analyses))
+
+
+def test_repeated_and_unnamed_peaks_match_the_legacy_aggregation(calculator):
+    # The same CAS twice in one analysis, names differing in case and
+    # whitespace, a type that changes between analyses (the legacy loop
+    # broke type ties in set order, so there is a clear majority)
+    analyses = generate_analyses(5, 10)
+    for position, analysis in enumerate(analyses):
+        components = analysis.parsed_data['components']
+        components.append(dict(components[1], percentage=0.3))
+        components.append({'cas_number': None, 'component_name': ' Linalool', 'percentage': 2.0, 'component_type': 'COMPONENT'})
+        if position < 2:
+            components.append({'cas_number': '', 'component_name': 'linalool ', 'percentage': 1.0, 'component_type': 'IMPURITY'})
+    
+    assert_same_composite(aggregate_legacy(calculator, analyses), calculator._aggregate_analyses(analyses))
+
+
+def test_analyses_without_components_are_skipped(calculator):
+    analyses = generate_analyses(4, 10)
+    analyses[1].parsed_data = {'success': False}
+    analyses[2].parsed_data = None
+    
+    matrix = calculator._component_matrix(analyses)
+    
+    assert [analysis.id for analysis in matrix.analyses] == [0, 3]
+    assert_same_composite(aggregate_legacy(calculator, analyses), calculator._aggregate_matrix(matrix))
+
+
+def test_stored_composite_matches_the_legacy_aggregation(db, make_material, make_analysis, calculator):
+    material = make_material()
+    analyses = generate_analyses(8, 30)
+    for analysis in analyses:
+        analysis.id = make_analysis(material, analysis.parsed_data['components'], weight=analysis.weight).id
+    
+    composite = CompositeCalculator(db).calculate_from_lab_analyses(material.id)
+    
+    stored = sorted(
+        ({
+            'component_name': c.component_name,
+            'cas_number': c.cas_number,
+            'percentage': c.percentage,
+            'component_type': c.component_type,
+            'confidence_level': c.confidence_level,
+            'notes': c.notes
+        } for c in composite.components),
+        key=lambda c: c['percentage'],
+        reverse=True
+    )
+    assert_same_composite(aggregate_legacy(calculator, analyses), stored)
+
+
+def test_matrix_aggregation_is_faster_than_the_legacy_loop(calculator):
+    analyses = generate_analyses(300, 300)
+    
+    legacy_time, _ = best_of(lambda: aggregate_legacy(calculator, analyses))
+    matrix_time, _ = best_of(lambda: calculator._aggregate_analyses(analyses))
+    
+    # About 3-4x on a developer machine; 2x leaves room for noisy runners
+    assert legacy_time / matrix_time >= 2
+
+
+def test_bootstrap_intervals_are_reproducible_with_the_fixed_seed(calculator, monkeypatch):
+    analyses = generate_analyses(12, 40)
+    
+    first = calculator._aggregate_analyses(analyses, bootstrap=True)
+    second = calculator._aggregate_analyses(analyses, bootstrap=True)
+    monkeypatch.setattr(settings, "BOOTSTRAP_SEED", settings.BOOTSTRAP_SEED + 1)
+    reseeded = calculator._aggregate_analyses(analyses, bootstrap=True)
+    
+    assert first == second
+    assert [(c['ci_lower'], c['ci_upper']) for c in reseeded] != [(c['ci_lower'], c['ci_upper']) for c in first]
+
+
+def test_bootstrap_intervals_contain_the_point_estimate(calculator):
+    aggregated = calculator._aggregate_analyses(generate_analyses(12, 40), bootstrap=True)
+    
+    for component in aggregated:
+        assert component['ci_lower'] <= component['percentage'] <= component['ci_upper'], component
+        assert component['ci_lower'] < component['ci_upper']
+
+
+def test_bootstrap_resamples_match_aggregating_each_resample(calculator):
+    analyses = generate_analyses(8, 25)
+    matrix = calculator._component_matrix(analyses)
+    
+    resampled = matrix.bootstrap_percentages(30, seed=7)
+    
+    # Same draws, each resample aggregated like a composite
+    draws = np.random.default_rng(7).integers(0, len(analyses), size=(30, len(analyses)))
+    column = {name: index for index, name in enumerate(matrix.names)}
+    for row, drawn in enumerate(draws):
+        expected = np.zeros(matrix.component_count)
+        for component in calculator._aggregate_analyses([analyses[i] for i in drawn]):
+            expected[column[component['component_name']]] = component['percentage']
+        assert resampled[row] == pytest.approx(expected, abs=1e-3)
+
+
+def test_single_analysis_has_no_bootstrap_interval(calculator):
+    aggregated = calculator._aggregate_analyses(generate_analyses(1, 10), bootstrap=True)
+    
+    assert all('ci_lower' not in component for component in aggregated)
+
+
+def test_calculated_composite_stores_the_intervals(client, make_material, make_analysis):
+    material = make_material()
+    for analysis in generate_analyses(6, 15):
+        make_analysis(material, analysis.parsed_data['components'], weight=analysis.weight)
+    
+    response = client.post("/api/composites/calculate", json={'material_id': material.id, 'bootstrap': True})
+    
+    assert response.status_code == 201, response.text
+    composite = response.json()
+    assert composite['composite_metadata']['confidence_intervals'] == {
+        'method': 'bootstrap',
+        'confidence': CompositeCalculator.CONFIDENCE_INTERVAL,
+        'resamples': settings.BOOTSTRAP_RESAMPLES,
+        'seed': settings.BOOTSTRAP_SEED
+    }
+    for component in composite['components']:
+        assert component['ci_lower'] <= component['percentage'] <= component['ci_upper'], component
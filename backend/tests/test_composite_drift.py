@@ -0,0 +1,142 @@
+"""Drift ranking against pairwise comparisons, paging and reuse of pair scores"""
+
+import random
+
+import pytest
+
+from app.models import Composite, Material
+from app.models.composite import CompositeStatus
+from app.services import composite_drift
+from app.services.component_identity import ComponentIdentityIndex
+from app.services.composite_comparator import CompositeComparator
+from app.services.composite_drift import CompositeDriftAnalyzer
+from test_composite_history import evolve
+
+RULES = [{'absolute_threshold': 1.5}, {'cas_number': '1001-00-1', 'relative_threshold': 5.0}]
+
+
+def random_materials(make_material, make_composite, seed, count=12):
+    """
+    Materials with approved, archived and draft versions in random order
+    
+    Some materials have no draft or no approved composite, so they are not ranked.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        material = make_material()
+        components = {
+            f"Component {i}": (round(rng.uniform(0.5, 30), 4), f"{1000 + i}-00-{i % 10}" if i % 2 else None)
+            for i in range(rng.randint(3, 12))
+        }
+        statuses = [rng.choice((CompositeStatus.APPROVED, CompositeStatus.ARCHIVED, CompositeStatus.DRAFT)) for _ in range(rng.randint(1, 5))]
+        for status in statuses:
+            make_composite(material, components, status=status)
+            components = evolve(rng, components)
+
+
+def latest(db, material_id, status):
+    """Composite of a material with the highest version in a status, None if there is none"""
+    return db.query(Composite).filter_by(material_id=material_id, status=status).order_by(Composite.version.desc()).first()
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("rules", [None, RULES])
+def test_scores_match_pairwise_comparisons(client, db, make_material, make_composite, seed, rules):
+    if rules:
+        assert client.post("/api/significance-rules", json=rules).status_code == 201
+    random_materials(make_material, make_composite, seed)
+    
+    ranking = CompositeDriftAnalyzer(db).ranking()
+    
+    ranked = {
+        material.id for material in db.query(Material)
+        if latest(db, material.id, CompositeStatus.APPROVED) and latest(db, material.id, CompositeStatus.DRAFT)
+    }
+    assert {entry['material_id'] for entry in ranking} == ranked and len(ranked) >= 3
+    
+    comparator = CompositeComparator(db)
+    
+    for entry in ranking:
+        assert entry['approved_composite_id'] == latest(db, entry['material_id'], CompositeStatus.APPROVED).id
+        assert entry['draft_composite_id'] == latest(db, entry['material_id'], CompositeStatus.DRAFT).id
+        comparison = comparator.compare_composites(entry['approved_composite_id'], entry['draft_composite_id'])
+        assert entry['change_score'] == pytest.approx(comparison.total_change_score, abs=0.011)
+        assert entry['significant_changes'] == comparison.significant_changes
+        assert (entry['components_added'], entry['components_removed'], entry['components_changed']) == (
+            len(comparison.components_added), len(comparison.components_removed), len(comparison.components_changed)
+        )
+        listed = comparison.components_added + comparison.components_removed + comparison.components_changed
+        assert entry['significant_components'] == sum(c.significant for c in listed)
+    assert [entry['change_score'] for entry in ranking] == sorted((entry['change_score'] for entry in ranking), reverse=True)
+
+
+def test_pages_and_min_score(client, make_material, make_composite):
+    random_materials(make_material, make_composite, seed=3, count=30)
+    everything = client.get("/api/composites/drift", params={'limit': 1000}).json()
+    assert everything['total'] == len(everything['items']) > 10
+    
+    pages = []
+    for skip in range(0, everything['total'], 4):
+        page = client.get("/api/composites/drift", params={'skip': skip, 'limit': 4}).json()
+        assert (page['total'], page['skip'], page['limit']) == (everything['total'], skip, 4)
+        pages.extend(page['items'])
+    assert pages == everything['items']
+    
+    scores = sorted({item['change_score'] for item in everything['items']})
+    min_score = scores[len(scores) // 2]
+    filtered = client.get("/api/composites/drift", params={'min_score': min_score, 'limit': 1000}).json()
+    assert filtered['items'] == [item for item in everything['items'] if item['change_score'] >= min_score]
+    assert filtered['total'] == len(filtered['items'])
+
+
+@pytest.mark.parametrize("params", [{'skip': -1}, {'limit': -5}])
+def test_negative_skip_or_limit_is_rejected(client, params):
+    response = client.get("/api/composites/drift", params=params)
+    
+    assert response.status_code == 400
+    assert response.json()['detail'] == "skip and limit must not be negative"
+
+
+@pytest.fixture
+def scored_pairs(monkeypatch):
+    """Composite ID pairs passed to _score_pairs, one list per call"""
+    calls = []
+    score_pairs = CompositeDriftAnalyzer._score_pairs
+    
+    def record(self, pairs, ranked=None):
+        calls.append(sorted(pairs))
+        return score_pairs(self, pairs, ranked)
+    
+    monkeypatch.setattr(CompositeDriftAnalyzer, "_score_pairs", record)
+    return calls
+
+
+def test_only_new_pairs_are_scored(client, db, make_material, make_composite, scored_pairs, monkeypatch):
+    random_materials(make_material, make_composite, seed=5, count=20)
+    first = CompositeDriftAnalyzer(db).ranking()
+    assert len(scored_pairs) == 1 and len(scored_pairs[0]) == len(first)
+    
+    # A new draft of one ranked material: only its new pair is scored
+    entry = first[-1]
+    material = db.get(Material, entry['material_id'])
+    draft = make_composite(material, {'Component 0': 100.0})
+    second = CompositeDriftAnalyzer(db).ranking()
+    assert scored_pairs[1] == [(entry['approved_composite_id'], draft.id)]
+    
+    # Same ranking as one computed from scratch
+    monkeypatch.setattr(composite_drift, "_ranking", None)
+    monkeypatch.setattr(composite_drift, "_pair_scores", None)
+    assert CompositeDriftAnalyzer(db).ranking() == second
+    assert len(scored_pairs[2]) == len(second)
+    
+    # New rules change every score, so every pair is scored again
+    assert client.post("/api/significance-rules", json=RULES).status_code == 201
+    CompositeDriftAnalyzer(db).ranking()
+    assert len(scored_pairs[3]) == len(second)
+
+
+def test_injected_empty_identity_index_is_used(db, monkeypatch):
+    monkeypatch.setattr(composite_drift, "get_identity_index", lambda db: pytest.fail("the injected index is replaced"))
+    identity_index = ComponentIdentityIndex([], [])
+    
+    assert CompositeDriftAnalyzer(db, identity_index=identity_index).identity_index is identity_index
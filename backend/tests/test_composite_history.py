@@ -0,0 +1,83 @@
+"""Version matrix (compare_history) against pairwise compare_composites"""
+
+import random
+
+import pytest
+
+from app.services.composite_comparator import CompositeComparator
+
+
+def evolve(rng, components):
+    """Next version: components move, a few are dropped and one may be added"""
+    next_version = {}
+    for name, (percentage, cas_number) in components.items():
+        if rng.random() < 0.1:
+            continue
+        next_version[name] = (max(percentage + rng.choice((0.0, rng.uniform(-2, 2))), 0.05), cas_number)
+    if rng.random() < 0.5:
+        next_version[f"Added {rng.randint(0, 10**6)}"] = (round(rng.uniform(0.01, 3), 4), None)
+    return next_version
+
+
+def versions(make_material, make_composite, seed, count=6):
+    rng = random.Random(seed)
+    material = make_material()
+    components = {
+        f"Component {i}": (round(rng.uniform(0.5, 30), 4), f"{1000 + i}-00-{i % 10}" if i % 2 else None)
+        for i in range(rng.randint(5, 15))
+    }
+    composites = []
+    for _ in range(count):
+        composites.append(make_composite(material, components))
+        components = evolve(rng, components)
+    return material, [composite.id for composite in composites]
+
+
+def by_name(comparisons):
+    return sorted((c.model_dump() for c in comparisons), key=lambda c: c['component_name'])
+
+
+def assert_same_comparison(expected, actual):
+    assert (actual.old_composite_id, actual.new_composite_id) == (expected.old_composite_id, expected.new_composite_id)
+    assert (actual.total_change_score, actual.significant_changes) == (expected.total_change_score, expected.significant_changes)
+    for field in ('components_added', 'components_removed', 'components_changed'):
+        assert by_name(getattr(actual, field)) == pytest.approx(by_name(getattr(expected, field))), field
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("rules", [None, [{'absolute_threshold': 1.5}, {'cas_number': '1001-00-1', 'min_change': 0.5}]])
+def test_matrix_matches_pairwise_comparisons(client, db, make_material, make_composite, seed, rules):
+    if rules:
+        assert client.post("/api/significance-rules", json=rules).status_code == 201
+    material, composite_ids = versions(make_material, make_composite, seed)
+    
+    history = CompositeComparator(db).compare_history(material.id)
+    
+    assert [v['composite_id'] for v in history['versions']] == composite_ids
+    comparator = CompositeComparator(db)
+    for row, old_id in enumerate(composite_ids):
+        for column, new_id in enumerate(composite_ids):
+            expected = comparator.compare_composites(old_id, new_id).total_change_score
+            assert history['change_scores'][row][column] == pytest.approx(expected, abs=0.011), (row, column)
+    for row, consecutive in enumerate(history['consecutive']):
+        assert_same_comparison(comparator.compare_composites(composite_ids[row], composite_ids[row + 1]), consecutive)
+
+
+def test_catalog_synonyms_are_one_column(client, db, make_material, make_composite):
+    catalog = [{'name': 'Limonene', 'cas_number': '5989-27-5', 'synonyms': ['d-Limonene']}]
+    assert client.post("/api/component-catalog", json=catalog).status_code == 201
+    material = make_material()
+    old = make_composite(material, {'Limonene': (60.0, '5989-27-5'), 'Linalool': 40.0})
+    new = make_composite(material, {'d-Limonene': 61.0, 'Linalool': 39.0})
+    
+    history = CompositeComparator(db).compare_history(material.id)
+    
+    assert history['change_scores'] == [[0.0, 2.0], [2.0, 0.0]]
+    assert history['consecutive'][0].components_added == []
+    assert history['change_scores'][0][1] == CompositeComparator(db).compare_composites(old.id, new.id).total_change_score
+
+
+def test_material_without_composites_is_not_found(client, make_material):
+    response = client.get(f"/api/composites/material/{make_material().id}/version-matrix")
+    
+    assert response.status_code == 404
@@ -0,0 +1,106 @@
+"""Memoized composite previews and their invalidation"""
+
+import random
+
+import pytest
+
+from app.services.composite_preview import CompositePreviewer, _preview_cache
+from app.tasks.ingestion_tasks import parse_analysis
+from test_component_statistics import random_components
+
+CSV = b"Component,CAS,Area%\nLimonene,5989-27-5,60\nLinalool,78-70-6,40\n"
+
+
+@pytest.fixture
+def material(make_material, make_analysis):
+    """Material with three processed analyses"""
+    rng = random.Random(16)
+    material = make_material()
+    for _ in range(3):
+        make_analysis(material, random_components(rng), weight=rng.uniform(0.5, 5))
+    return material
+
+
+def preview(client, material_id, **request):
+    response = client.post("/api/composites/preview", json={'material_id': material_id, **request})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_repeated_preview_is_served_from_cache(client, material):
+    first = preview(client, material.id)
+    second = preview(client, material.id)
+    
+    assert (first['cached'], second['cached']) == (False, True)
+    assert second['fingerprint'] == first['fingerprint']
+    assert second['components'] == first['components']
+
+
+def test_cache_hit_only_runs_the_fingerprint_queries(db, material, count_queries):
+    with count_queries() as miss:
+        CompositePreviewer(db).preview(material.id)
+    with count_queries() as hit:
+        assert CompositePreviewer(db).preview(material.id)['cached'] is True
+    
+    # Analysis IDs and timestamps, catalog count/max, synonym count/max
+    assert len(hit) == 3
+    assert sum("FROM component_catalog" in statement for statement in miss) == 1
+
+
+def test_preview_matches_the_calculated_composite(client, material):
+    previewed = preview(client, material.id)['components']
+    
+    response = client.post("/api/composites/calculate", json={'material_id': material.id})
+    assert response.status_code == 201
+    
+    calculated = {c['component_name']: c['percentage'] for c in response.json()['components']}
+    assert {c['component_name']: c['percentage'] for c in previewed} == calculated
+
+
+def test_new_analysis_changes_the_fingerprint(client, material, make_analysis):
+    first = preview(client, material.id)
+    make_analysis(material, [{'cas_number': None, 'component_name': 'New peak', 'percentage': 50.0, 'component_type': 'COMPONENT'}])
+    
+    second = preview(client, material.id)
+    
+    assert second['cached'] is False
+    assert second['fingerprint'] != first['fingerprint']
+    assert second['composite_metadata']['analysis_count'] == first['composite_metadata']['analysis_count'] + 1
+    assert 'New peak' in [c['component_name'] for c in second['components']]
+
+
+def test_deleting_an_analysis_drops_its_previews(client, material, db):
+    analysis_ids = [analysis['id'] for analysis in client.get(f"/api/chromatographic-analyses/material/{material.id}").json()]
+    preview(client, material.id)
+    preview(client, material.id, analysis_ids=analysis_ids[:2])
+    preview(client, material.id, analysis_ids=analysis_ids[1:2])
+    assert len(_preview_cache) == 3
+    
+    assert client.delete(f"/api/chromatographic-analyses/{analysis_ids[0]}").status_code == 204
+    
+    # Only the previews using the deleted analysis are dropped
+    assert len(_preview_cache) == 1
+    assert preview(client, material.id, analysis_ids=analysis_ids[1:2])['cached'] is True
+    after = preview(client, material.id)
+    assert after['cached'] is False
+    assert after['composite_metadata']['analysis_ids'] == analysis_ids[1:]
+
+
+def test_reprocessing_an_analysis_drops_its_previews(client, make_material, monkeypatch):
+    material = make_material()
+    response = client.post(
+        "/api/chromatographic-analyses",
+        data={'material_id': material.id},
+        files={'file': ('analysis.csv', CSV, 'text/csv')}
+    )
+    assert response.status_code == 201, response.text
+    analysis_id = response.json()['id']
+    assert preview(client, material.id)['cached'] is False
+    assert preview(client, material.id)['cached'] is True
+    
+    # Run the ingestion task in this process, without a result backend
+    monkeypatch.setattr(parse_analysis, "update_state", lambda **kwargs: None)
+    parse_analysis.apply(args=[analysis_id])
+    
+    assert len(_preview_cache) == 0
+    assert preview(client, material.id)['cached'] is False
@@ -0,0 +1,84 @@
+"""Leave-one-out sensitivity against aggregating without each analysis"""
+
+import numpy as np
+import pytest
+
+from benchmark_composite_aggregation import generate_analyses
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex
+
+
+@pytest.fixture
+def calculator():
+    """Calculator without database or catalog: components keep their legacy keys"""
+    return CompositeCalculator(db=None, identity_index=ComponentIdentityIndex([], []))
+
+
+def analyses_with_edge_cases():
+    """Analyses with a component only one of them reports and one analysis of weight 0"""
+    analyses = generate_analyses(9, 30)
+    analyses[3].parsed_data['components'].append(
+        {'cas_number': None, 'component_name': 'Only here', 'percentage': 4.0, 'component_type': 'COMPONENT'}
+    )
+    analyses[5].weight = 0.0
+    return analyses
+
+
+def explicit_composite(calculator, analyses, names):
+    """Composite of the analyses by a full aggregation, as an array over names"""
+    percentages = {c['component_name']: c['percentage'] for c in calculator._aggregate_analyses(analyses)}
+    return np.array([percentages.get(name, 0.0) for name in names])
+
+
+def test_leave_one_out_matches_aggregating_without_each_analysis(calculator):
+    analyses = analyses_with_edge_cases()
+    matrix = calculator._component_matrix(analyses)
+    
+    full, without = matrix.leave_one_out_percentages()
+    
+    assert full == pytest.approx(explicit_composite(calculator, analyses, matrix.names), abs=1e-3)
+    for row in range(len(analyses)):
+        rest = analyses[:row] + analyses[row + 1:]
+        assert without[row] == pytest.approx(explicit_composite(calculator, rest, matrix.names), abs=1e-3), row
+    assert without[3, matrix.names.index('Only here')] == 0.0
+
+
+@pytest.fixture
+def material(make_material, make_analysis):
+    material = make_material()
+    for analysis in analyses_with_edge_cases():
+        make_analysis(material, analysis.parsed_data['components'], weight=analysis.weight)
+    return material
+
+
+def test_change_scores_rank_the_explicit_leave_one_out_distances(client, db, material):
+    response = client.post("/api/composites/sensitivity", json={'material_id': material.id, 'top_components': 3})
+    
+    assert response.status_code == 200, response.text
+    result = response.json()
+    calculator = CompositeCalculator(db)
+    analyses = calculator.load_analyses(material.id)
+    names = calculator._component_matrix(analyses).names
+    full = explicit_composite(calculator, analyses, names)
+    
+    expected = {}
+    for analysis in analyses:
+        without = explicit_composite(calculator, [a for a in analyses if a.id != analysis.id], names)
+        expected[analysis.id] = np.abs(without - full).sum()
+    
+    assert result['analysis_count'] == len(analyses)
+    assert [i['change_score'] for i in result['influences']] == sorted((i['change_score'] for i in result['influences']), reverse=True)
+    for influence in result['influences']:
+        assert influence['change_score'] == pytest.approx(expected[influence['analysis_id']], abs=1e-2)
+        changes = [abs(c['change']) for c in influence['top_components']]
+        assert len(changes) == 3 and changes == sorted(changes, reverse=True)
+
+
+def test_sensitivity_needs_two_analyses(client, make_material, make_analysis):
+    material = make_material()
+    make_analysis(material, generate_analyses(1, 5)[0].parsed_data['components'])
+    
+    response = client.post("/api/composites/sensitivity", json={'material_id': material.id})
+    
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Sensitivity analysis needs at least two analyses with components"
@@ -0,0 +1,145 @@
+"""Similarity index: search against brute force, incremental updates and approvals"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.models.composite import CompositeStatus
+from app.services import composite_similarity
+from app.services.component_identity import ComponentIdentityIndex
+from app.services.composite_similarity import CompositeSimilarityIndex, get_similarity_index
+
+KEYS = [f"cas_{i}" for i in range(40)]
+
+
+def random_vector(rng):
+    """Sparse composition over a shared pool of keys, some of them overlapping exactly"""
+    return {key: round(rng.choice((rng.uniform(0.01, 30), 5.0)), 4) for key in rng.sample(KEYS, rng.randint(1, 12))}
+
+
+def random_vectors(seed, count=50):
+    rng = random.Random(seed)
+    return {material_id: (material_id * 10, 1, random_vector(rng)) for material_id in range(1, count + 1)}
+
+
+def brute_force(vectors, query, metric):
+    """Score of every indexed material, computed over the union of the keys"""
+    scores = {}
+    for material_id, (_, _, vector) in vectors.items():
+        keys = sorted(set(vector) | set(query))
+        a = np.array([vector.get(key, 0.0) for key in keys])
+        b = np.array([query.get(key, 0.0) for key in keys])
+        if metric == 'cosine':
+            scores[material_id] = a @ b / (np.linalg.norm(a) * np.linalg.norm(b))
+        else:
+            scores[material_id] = np.abs(a - b).sum()
+    return scores
+
+
+def assert_search_matches_brute_force(index, vectors, query, metric, k=10):
+    matches = index.search(query, k=k, metric=metric)
+    expected = brute_force(vectors, query, metric)
+    
+    assert len(matches) == min(k, len(expected))
+    for match in matches:
+        assert match['score'] == pytest.approx(expected[match['material_id']], abs=1e-4)
+        assert (match['composite_id'], match['version']) == vectors[match['material_id']][:2]
+    # The k best scores, best first; ties may come in any order
+    best = sorted(expected.values(), reverse=(metric == 'cosine'))[:k]
+    assert [match['score'] for match in matches] == pytest.approx(best, abs=1e-4)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("metric", CompositeSimilarityIndex.METRICS)
+def test_search_matches_brute_force(seed, metric):
+    vectors = random_vectors(seed)
+    index = CompositeSimilarityIndex(vectors)
+    rng = random.Random(100 + seed)
+    
+    for _ in range(10):
+        assert_search_matches_brute_force(index, vectors, random_vector(rng), metric)
+    
+    # A material's own composition is its best match
+    composite_id, version, vector = vectors[7]
+    best = index.search(vector, k=1, metric=metric)[0]
+    assert (best['material_id'], best['score']) == (7, 1.0 if metric == 'cosine' else 0.0)
+    assert 7 not in [m['material_id'] for m in index.search(vector, k=50, metric=metric, exclude_material_id=7)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_l1_identity_matches_the_distance_over_the_union_of_keys(seed):
+    rng = random.Random(seed)
+    a, b = random_vector(rng), random_vector(rng)
+    
+    distance = CompositeSimilarityIndex({1: (1, 1, a)}).search(b, k=1, metric='l1')[0]['score']
+    
+    keys = set(a) | set(b)
+    assert distance == pytest.approx(sum(abs(a.get(key, 0.0) - b.get(key, 0.0)) for key in keys), abs=1e-4)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_updates_match_a_rebuilt_index(seed):
+    vectors = random_vectors(seed, count=20)
+    index = CompositeSimilarityIndex(vectors)
+    rng = random.Random(200 + seed)
+    
+    for step in range(40):
+        material_id = rng.randint(1, 30)
+        if material_id in vectors and rng.random() < 0.2:
+            del vectors[material_id]
+            index = index.updated(material_id, None, {})
+        else:
+            vectors[material_id] = (1000 + step, step, random_vector(rng))
+            index = index.updated(material_id, vectors[material_id][:2], vectors[material_id][2])
+    
+    rebuilt = CompositeSimilarityIndex(vectors)
+    for _ in range(10):
+        query = random_vector(rng)
+        for metric in CompositeSimilarityIndex.METRICS:
+            assert_search_matches_brute_force(index, vectors, query, metric, k=len(vectors))
+            # Rows are numbered differently, so only ties may be ordered differently
+            scores = [m['score'] for m in index.search(query, k=5, metric=metric)]
+            assert scores == [m['score'] for m in rebuilt.search(query, k=5, metric=metric)]
+
+
+def test_update_leaves_the_original_index_unchanged():
+    vectors = random_vectors(0, count=10)
+    index = CompositeSimilarityIndex(vectors, version="before")
+    query = vectors[3][2]
+    before = index.search(query, k=10)
+    
+    updated = index.updated(3, None, {})
+    updated = updated.updated(11, (110, 1), query)
+    
+    assert index.search(query, k=10) == before
+    assert len(index.material_ids) == 10 and updated.version == "before"
+    assert updated.search(query, k=1)[0]['material_id'] == 11
+    assert 3 not in [m['material_id'] for m in updated.search(query, k=20)]
+
+
+def test_injected_empty_identity_index_is_used(db, make_material, make_composite, monkeypatch):
+    make_composite(make_material(), {'Limonene': 60.0, 'Linalool': 40.0}, status=CompositeStatus.APPROVED)
+    monkeypatch.setattr(composite_similarity, "get_identity_index", lambda db: pytest.fail("the injected index is replaced"))
+    
+    index = CompositeSimilarityIndex.from_db(db, identity_index=ComponentIdentityIndex([], []))
+    
+    assert index.vectors == [{'name_limonene': 60.0, 'name_linalool': 40.0}]
+
+
+def test_approval_updates_the_loaded_index(client, db, make_material, make_composite):
+    first, second = make_material(), make_material()
+    query = make_composite(first, {'Limonene': 60.0, 'Linalool': 40.0}, status=CompositeStatus.APPROVED)
+    make_composite(second, {'Limonene': 10.0, 'Vanillin': 90.0}, status=CompositeStatus.APPROVED)
+    loaded = get_similarity_index(db)
+    
+    pending = make_composite(second, {'Limonene': 59.0, 'Linalool': 41.0}, status=CompositeStatus.PENDING_APPROVAL)
+    assert client.put(f"/api/composites/{pending.id}/approve").status_code == 200
+    
+    response = client.get(f"/api/composites/{query.id}/similar", params={'metric': 'l1'})
+    assert response.status_code == 200, response.text
+    assert [(m['composite_id'], m['score']) for m in response.json()['matches']] == [(pending.id, 2.0)]
+    # Patched into a new index, which is current; the one loaded before is untouched
+    assert composite_similarity._index is not loaded
+    assert composite_similarity._index.version == composite_similarity.similarity_version(db)
+    assert loaded.vectors[1] == {'name_limonene': 10.0, 'name_vanillin': 90.0}
@@ -0,0 +1,51 @@
+"""Composite version allocation"""
+
+import pytest
+
+from stress_composite_versions import check_versions, create_materials, run
+from app.models import Composite, CompositeVersionCounter
+from app.models.composite import CompositeOrigin
+from app.services.composite_versions import allocate_version, allocate_versions
+
+
+@pytest.mark.parametrize("writer_count", [1, 4, 8])
+def test_no_duplicate_versions_under_concurrency(writer_count):
+    material_ids = create_materials(3)
+    
+    _, errors = run(writer_count, 30, material_ids)
+    
+    assert errors == []
+    assert check_versions(material_ids) == {}
+
+
+def test_versions_are_allocated_per_material(db, make_material):
+    first, second = make_material(), make_material()
+    
+    assert allocate_versions(db, [second.id, first.id, first.id]) == {first.id: 1, second.id: 1}
+    assert allocate_version(db, first.id) == 2
+    db.commit()
+    
+    assert allocate_versions(db, [first.id, second.id]) == {first.id: 3, second.id: 2}
+
+
+def test_counter_starts_after_existing_versions(db, make_material):
+    material = make_material()
+    db.add(Composite(material_id=material.id, version=4, origin=CompositeOrigin.LAB))
+    db.commit()
+    
+    assert db.query(CompositeVersionCounter).count() == 0
+    assert allocate_version(db, material.id) == 5
+
+
+def test_rollback_gives_the_version_back(db, make_material):
+    material = make_material()
+    assert allocate_version(db, material.id) == 1
+    db.rollback()
+    
+    assert allocate_version(db, material.id) == 1
+
+
+def test_unknown_material(db):
+    assert allocate_versions(db, [999]) == {}
+    with pytest.raises(ValueError, match="Material 999 not found"):
+        allocate_version(db, 999)
@@ -0,0 +1,119 @@
+"""Peak table parsing (ChromatographicCSVParser)"""
+
+import math
+
+import pytest
+
+from benchmark_csv_parser import generate_csv, parse_column_wise, parse_row_by_row
+from app.core.config import settings
+from app.parsers.csv_parser import ChromatographicCSVParser
+
+DUPLICATE_PEAKS = (
+    b"Component,CAS,Area%\n"
+    b"Limonene,5989-27-5,0.06\n"
+    b"Limonene,5989-27-5,0.06\n"
+    b"Linalool,78-70-6,40\n"
+    b"Citral,5392-40-5,59.88\n"
+)
+
+
+def parse(content, streaming=False, monkeypatch=None, chunk_size=2):
+    """Parse content in memory, or in chunks of chunk_size rows"""
+    if streaming:
+        monkeypatch.setattr(settings, "PARSER_STREAMING_THRESHOLD", 0)
+        monkeypatch.setattr(settings, "PARSER_CHUNK_SIZE", chunk_size)
+    return ChromatographicCSVParser().parse_buffer(content)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_streaming_gives_the_same_result_as_in_memory_parsing(monkeypatch, chunk_size):
+    in_memory = parse(DUPLICATE_PEAKS)
+    streamed = parse(DUPLICATE_PEAKS, streaming=True, monkeypatch=monkeypatch, chunk_size=chunk_size)
+    
+    assert (in_memory.pop('parse_mode'), streamed.pop('parse_mode')) == ('in_memory', 'streaming')
+    assert streamed == in_memory
+    assert [(c['component_name'], c['component_type']) for c in streamed['components']] == [
+        ('Limonene', 'IMPURITY'), ('Limonene', 'IMPURITY'), ('Linalool', 'COMPONENT'), ('Citral', 'COMPONENT')
+    ]
+
+
+def without_nan(components):
+    """Components with NaN percentages replaced by None, so they compare equal"""
+    return [
+        {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in component.items()}
+        for component in components
+    ]
+
+
+def test_column_wise_parsing_matches_the_row_by_row_parser(tmp_path):
+    path = tmp_path / "edge_cases.csv"
+    path.write_text(
+        "Component,CAS,Area%\n"
+        "Limonene,5989-27-5,40.5\n"
+        " Linalool ,CAS 78-70-6,12.5 %\n"
+        ",5392-40-5,3.0\n"                  # no name: dropped
+        "nan,,2.0\n"                        # 'nan' name: dropped
+        "Citral,,\n"                        # blank percentage: kept as NaN, like before
+        "Geraniol,106-24-1,-1.5\n"          # negative: dropped
+        "Nerol,106-25-2,0\n"                # zero: dropped
+        "Myrcene,123-35-3,n.d.\n"           # not a number: dropped
+        "Pinene,no cas,0.4\n",
+        encoding="utf-8"
+    )
+    
+    expected = parse_row_by_row(path)
+    components = parse_column_wise(path)
+    
+    assert without_nan(components) == without_nan(expected)
+    assert [c['component_name'] for c in components] == ['Limonene', 'Linalool', 'Citral', 'Pinene']
+    assert [c['cas_number'] for c in components] == ['5989-27-5', '78-70-6', None, None]
+    assert components[-1]['component_type'] == 'IMPURITY'
+
+
+def test_generated_table_matches_the_row_by_row_parser(tmp_path):
+    path = tmp_path / "generated.csv"
+    generate_csv(path, 2000)
+    
+    assert parse_column_wise(path) == parse_row_by_row(path)
+
+
+@pytest.mark.parametrize("content, delimiter, decimal", [
+    (b"Component;CAS;Area%\nLimonene;5989-27-5;60,5\nLinalool;78-70-6;39,5\n", ';', ','),
+    (b"Component;CAS;Area%\nLimonene;5989-27-5;60.5\nLinalool;78-70-6;39.5\n", ';', '.'),
+    (b"Component\tCAS\tArea%\nLimonene\t5989-27-5\t60.5\nLinalool\t78-70-6\t39.5\n", '\t', '.'),
+    (b"Component|CAS|Area%\nLimonene|5989-27-5|60.5\nLinalool|78-70-6|39.5\n", '|', '.'),
+    (b'Component,CAS,Area%\n"Limonene, d-",5989-27-5,60.5\nLinalool,78-70-6,39.5\n', ',', '.'),
+])
+def test_dialects(content, delimiter, decimal):
+    result = parse(content)
+    
+    assert result['success'], result
+    assert (result['dialect']['delimiter'], result['dialect']['decimal']) == (delimiter, decimal)
+    assert [c['percentage'] for c in result['components']] == [60.5, 39.5]
+    assert [c['cas_number'] for c in result['components']] == ['5989-27-5', '78-70-6']
+
+
+@pytest.mark.parametrize("content, encoding", [
+    ("Component,Area%\nLimonène,60\nLinalool,40\n".encode("utf-8"), 'utf-8'),
+    ("Component,Area%\nLimonène,60\nLinalool,40\n".encode("utf-8-sig"), 'utf-8-sig'),
+    ("Component,Area%\nLimonène,60\nLinalool,40\n".encode("utf-16"), 'utf-16'),
+    ("Component,Area%\nLimonène,60\nLinalool,40\n".encode("latin-1"), 'latin1'),
+])
+def test_encodings(content, encoding):
+    result = parse(content)
+    
+    assert result['encoding'] == encoding
+    assert [c['component_name'] for c in result['components']] == ['Limonène', 'Linalool']
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_latin1_byte_past_the_sample_falls_back_to_latin1(monkeypatch, streaming):
+    monkeypatch.setattr(ChromatographicCSVParser, "SNIFF_SAMPLE_SIZE", 64)
+    rows = "".join(f"Peak {i},1.0\n" for i in range(10))
+    content = f"Component,Area%\n{rows}Acétate,90\n".encode("latin-1")
+    
+    result = parse(content, streaming=streaming, monkeypatch=monkeypatch)
+    
+    assert result['encoding'] == 'latin1'
+    assert result['components'][-1]['component_name'] == 'Acétate'
+    assert result['total_percentage'] == 100.0
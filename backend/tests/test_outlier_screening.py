@@ -0,0 +1,125 @@
+"""Outlier scores (robust z-scores of L1 distances to the median profile)"""
+
+import random
+import statistics
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.models import ChromatographicAnalysis
+from app.services.composite_calculator import CompositeCalculator
+from app.services.component_identity import ComponentIdentityIndex
+from app.services.outlier_screening import OutlierScreener
+
+
+def analyses_with_outlier(count=7, seed=19):
+    """Analyses of one material; the fourth reports a very different profile"""
+    rng = random.Random(seed)
+    base = {f"Component {i}": rng.uniform(1, 20) for i in range(10)}
+    analyses = []
+    for row in range(count):
+        profile = dict(base)
+        if row == 3:
+            profile["Component 0"] *= 6
+            profile["Contaminant"] = 15.0
+        analyses.append(SimpleNamespace(
+            id=row + 1,
+            weight=1.0,
+            parsed_data={'components': [
+                {'cas_number': None, 'component_name': name, 'percentage': p * rng.uniform(0.9, 1.1), 'component_type': 'COMPONENT'}
+                for name, p in profile.items()
+                if name == "Component 0" or rng.random() > 0.1
+            ]}
+        ))
+    return analyses
+
+
+def reference_scores(analyses):
+    """Robust z-scores computed one analysis and one component at a time"""
+    profiles = []
+    for analysis in analyses:
+        profile = {}
+        for component in analysis.parsed_data['components']:
+            key = component['component_name'].lower()
+            profile[key] = profile.get(key, 0.0) + component['percentage']
+        total = sum(profile.values())
+        profiles.append({key: p * 100 / total for key, p in profile.items()})
+    
+    keys = {key for profile in profiles for key in profile}
+    median_profile = {key: statistics.median(profile.get(key, 0.0) for profile in profiles) for key in keys}
+    distances = [sum(abs(profile.get(key, 0.0) - median_profile[key]) for key in keys) for profile in profiles]
+    
+    center = statistics.median(distances)
+    scale = 1.4826 * statistics.median(abs(d - center) for d in distances)
+    return distances, [(d - center) / scale for d in distances]
+
+
+@pytest.fixture
+def calculator():
+    return CompositeCalculator(db=None, identity_index=ComponentIdentityIndex([], []))
+
+
+def test_scores_match_a_per_analysis_computation(calculator):
+    analyses = analyses_with_outlier()
+    
+    distances, scores = calculator._component_matrix(analyses).outlier_scores()
+    
+    expected_distances, expected_scores = reference_scores(analyses)
+    assert distances.tolist() == pytest.approx(expected_distances, abs=1e-9)
+    assert scores.tolist() == pytest.approx(expected_scores, abs=1e-9)
+    assert scores.argmax() == 3
+    assert scores[3] > settings.OUTLIER_THRESHOLD
+    assert (scores[[0, 1, 2, 4, 5, 6]] < settings.OUTLIER_THRESHOLD).all()
+
+
+def test_zero_mad_falls_back_to_the_mean_absolute_deviation(calculator):
+    same = [{'cas_number': None, 'component_name': 'A', 'percentage': 60.0}, {'cas_number': None, 'component_name': 'B', 'percentage': 40.0}]
+    odd = [{'cas_number': None, 'component_name': 'A', 'percentage': 40.0}, {'cas_number': None, 'component_name': 'B', 'percentage': 60.0}]
+    analyses = [SimpleNamespace(id=i, weight=1.0, parsed_data={'components': same}) for i in range(4)]
+    analyses.append(SimpleNamespace(id=4, weight=1.0, parsed_data={'components': odd}))
+    
+    distances, scores = calculator._component_matrix(analyses).outlier_scores()
+    
+    # Distances 0, 0, 0, 0, 40: median and MAD are 0, the mean absolute deviation is 8
+    assert distances.tolist() == pytest.approx([0, 0, 0, 0, 40])
+    assert scores.tolist() == pytest.approx([0, 0, 0, 0, 40 / (1.2533 * 8)])
+
+
+@pytest.mark.parametrize("count", [1, 2])
+def test_fewer_than_three_analyses_score_zero(calculator, count):
+    _, scores = calculator._component_matrix(analyses_with_outlier(count)).outlier_scores()
+    
+    assert scores.tolist() == [0.0] * count
+
+
+def test_identical_analyses_score_zero(calculator):
+    analyses = analyses_with_outlier(1) * 4
+    
+    _, scores = calculator._component_matrix(analyses).outlier_scores()
+    
+    assert scores.tolist() == [0.0] * 4
+
+
+def test_screening_flags_records_and_excludes_the_outlier(db, make_material, make_analysis):
+    material = make_material()
+    ids = [make_analysis(material, analysis.parsed_data['components']).id for analysis in analyses_with_outlier()]
+    outlier_id = ids[3]
+    
+    screened = OutlierScreener(db).screen_material(material.id)
+    assert [item['analysis_id'] for item in screened if item['is_outlier']] == [outlier_id]
+    assert screened[0]['analysis_id'] == outlier_id
+    
+    updated_at = {a.id: a.updated_at for a in db.query(ChromatographicAnalysis)}
+    assert OutlierScreener(db).screen_all() == {'materials': 1, 'analyses': 7, 'outliers': 1}
+    db.commit()
+    db.expire_all()
+    recorded = {a.id: (a.is_outlier, a.outlier_score, a.updated_at) for a in db.query(ChromatographicAnalysis)}
+    assert [analysis_id for analysis_id, (flag, _, _) in recorded.items() if flag] == [outlier_id]
+    assert recorded[outlier_id][1] == screened[0]['score']
+    assert {analysis_id: changed for analysis_id, (_, _, changed) in recorded.items()} == updated_at
+    
+    metadata, components = CompositeCalculator(db).aggregate_lab_analyses(material.id, outliers='exclude')
+    assert [item['analysis_id'] for item in metadata['outlier_screening']['flagged']] == [outlier_id]
+    assert outlier_id not in metadata['analysis_ids']
+    assert 'Contaminant' not in [c['component_name'] for c in components]
@@ -0,0 +1,144 @@
+"""Raw chromatogram traces: baseline, peaks, areas and ingestion"""
+
+import numpy as np
+import pytest
+
+from benchmark_raw_trace import synthetic_trace
+from app.parsers.csv_parser import ChromatographicCSVParser
+from app.parsers.raw_trace_parser import RawTraceParser
+from app.tasks.ingestion_tasks import parse_analysis
+
+
+def gaussian(times, center, height, width):
+    return height * np.exp(-0.5 * ((times - center) / width) ** 2)
+
+
+def trace_csv(times, signal, header="Time (min),Intensity"):
+    rows = "".join(f"{t:.5f},{s:.4f}\n" for t, s in zip(times, signal))
+    return f"{header}\n{rows}".encode()
+
+
+# Three resolved peaks (area% 20, 30 and 50) on a drifting baseline
+TIMES = np.linspace(0.0, 10.0, 3001)
+PEAKS = [(2.0, 400.0, 0.05), (5.0, 600.0, 0.05), (8.0, 500.0, 0.1)]
+SIGNAL = 10.0 + 0.8 * TIMES + sum(gaussian(TIMES, *peak) for peak in PEAKS)
+TRACE = trace_csv(TIMES, SIGNAL)
+
+
+def test_baseline_follows_the_drift_under_narrow_peaks():
+    drift = 10.0 + 0.8 * TIMES + 3.0 * np.sin(TIMES / 2.0)
+    signal = drift + sum(gaussian(TIMES, *peak) for peak in PEAKS)
+    
+    baseline = RawTraceParser()._baseline(TIMES, signal)
+    
+    # Off by at most the drift over half a baseline block (about 1.2 here), far below the peak heights
+    assert np.abs(baseline - drift).max() < 1.5
+
+
+def test_peaks_are_detected_and_integrated_on_a_drifting_baseline():
+    result = RawTraceParser().parse_arrays(TIMES, SIGNAL)
+    
+    assert result['success'], result
+    assert result['parse_mode'] == 'raw_trace'
+    assert [c['retention_time'] for c in result['components']] == pytest.approx([2.0, 5.0, 8.0], abs=0.005)
+    assert [c['percentage'] for c in result['components']] == pytest.approx([20.0, 30.0, 50.0], abs=0.5)
+    assert all(c['unidentified'] and c['cas_number'] is None for c in result['components'])
+
+
+def test_noisy_trace_recovers_every_peak():
+    times, signal, centers, expected = synthetic_trace(200_000, peak_count=20, seed=7)
+    
+    result = RawTraceParser().parse_arrays(times, signal)
+    
+    assert [c['retention_time'] for c in result['components']] == pytest.approx(centers.tolist(), abs=0.02)
+    assert [c['percentage'] for c in result['components']] == pytest.approx(expected.tolist(), abs=0.5)
+
+
+def test_peak_areas_match_the_trapezoidal_integral():
+    times = np.linspace(0.0, 10.0, 5001)
+    signal = gaussian(times, 3.0, 100.0, 0.1) + gaussian(times, 7.0, 50.0, 0.2)
+    starts = np.array([np.searchsorted(times, 2.0), np.searchsorted(times, 6.0)])
+    ends = np.array([np.searchsorted(times, 4.0), np.searchsorted(times, 8.0)])
+    
+    areas = RawTraceParser._peak_areas(times, signal, starts, ends)
+    
+    expected = [np.trapz(signal[start:end], times[start:end]) for start, end in zip(starts, ends)]
+    assert areas.tolist() == pytest.approx(expected, rel=1e-9)
+    assert areas.tolist() == pytest.approx([100.0 * 0.1 * np.sqrt(2 * np.pi), 50.0 * 0.2 * np.sqrt(2 * np.pi)], rel=1e-4)
+
+
+def test_coeluting_peaks_are_one_region():
+    signal = gaussian(TIMES, 5.0, 500.0, 0.05) + gaussian(TIMES, 5.15, 300.0, 0.05)
+    
+    result = RawTraceParser().parse_arrays(TIMES, signal)
+    
+    assert [c['retention_time'] for c in result['components']] == pytest.approx([5.0], abs=0.005)
+    assert result['components'][0]['percentage'] == pytest.approx(100.0)
+
+
+def test_short_trace_is_an_error():
+    result = RawTraceParser().parse_arrays([0.0, 0.1, 0.2], [1.0, 5.0, 1.0])
+    
+    assert result['success'] is False
+    assert result['validation_errors'] == ["Trace has too few points to integrate"]
+
+
+@pytest.mark.parametrize("content, parser_class", [
+    (TRACE, RawTraceParser),
+    (trace_csv(TIMES[:10], SIGNAL[:10], header="RT;Signal").replace(b",", b";"), RawTraceParser),
+    (b"Component,CAS,Area%\nLimonene,5989-27-5,100\n", ChromatographicCSVParser),
+    (b"Component,RT,Area\nLimonene,5.01,1200\n", ChromatographicCSVParser),
+    (b"", ChromatographicCSVParser),
+])
+def test_parser_is_chosen_from_the_header(content, parser_class):
+    assert type(ChromatographicCSVParser.for_content(content)) is parser_class
+
+
+def assert_trace_components(parsed_data):
+    assert parsed_data['parse_mode'] == 'raw_trace'
+    assert [c['component_name'] for c in parsed_data['components']] == ['Peak RT 2.000', 'Peak RT 5.000', 'Peak RT 8.000']
+
+
+def test_uploaded_trace_is_integrated(client, make_material):
+    response = client.post(
+        "/api/chromatographic-analyses",
+        data={'material_id': make_material().id},
+        files={'file': ('trace.csv', TRACE, 'text/csv')}
+    )
+    
+    assert response.status_code == 201, response.text
+    assert response.json()['is_processed'] == 1
+    assert_trace_components(response.json()['parsed_data'])
+
+
+def test_batch_integrates_traces_next_to_peak_tables(client, db, make_material):
+    response = client.post(
+        "/api/chromatographic-analyses/batch",
+        data={'material_id': make_material().id},
+        files=[
+            ('files', ('trace.csv', TRACE, 'text/csv')),
+            ('files', ('table.csv', b"Component,Area%\nLimonene,60\nLinalool,40\n", 'text/csv'))
+        ]
+    )
+    
+    assert response.status_code == 200, response.text
+    trace, table = (client.get(f"/api/chromatographic-analyses/{r['analysis_id']}").json() for r in response.json()['results'])
+    assert_trace_components(trace['parsed_data'])
+    assert table['parsed_data']['parse_mode'] == 'in_memory'
+
+
+def test_queued_trace_is_integrated_by_the_ingestion_task(client, make_material, monkeypatch):
+    monkeypatch.setattr(parse_analysis, "apply_async", lambda args, task_id: None)
+    monkeypatch.setattr(parse_analysis, "update_state", lambda **kwargs: None)
+    response = client.post(
+        "/api/chromatographic-analyses",
+        data={'material_id': make_material().id, 'async_processing': 'true'},
+        files={'file': ('trace.csv', TRACE, 'text/csv')}
+    )
+    assert response.status_code == 201, response.text
+    
+    parse_analysis.apply(args=[response.json()['id']])
+    
+    analysis = client.get(f"/api/chromatographic-analyses/{response.json()['id']}").json()
+    assert analysis['is_processed'] == 1
+    assert_trace_components(analysis['parsed_data'])
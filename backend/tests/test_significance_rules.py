@@ -0,0 +1,204 @@
+"""Significance rules against the comparison the periodic review used before them"""
+
+import random
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models import Composite
+from app.models.composite import CompositeStatus
+from app.services import significance
+from app.services.component_identity import ComponentIdentityIndex
+from app.services.composite_calculator import CompositeCalculator
+from app.services.composite_comparator import CompositeComparator
+from app.services.significance import SignificanceEngine, get_significance_engine
+from app.tasks.composite_tasks import review_composites
+from test_component_statistics import random_components
+
+
+def compare_composite_components(old_composite, new_composite, threshold):
+    """The review's comparison before significance rules (every change counts, summed against threshold)"""
+    old_components = {(c.cas_number or c.component_name.lower()): c.percentage for c in old_composite.components}
+    new_components = {(c.cas_number or c.component_name.lower()): c.percentage for c in new_composite.components}
+    
+    total_change = 0.0
+    all_keys = set(old_components.keys()) | set(new_components.keys())
+    for key in all_keys:
+        total_change += abs(new_components.get(key, 0.0) - old_components.get(key, 0.0))
+    
+    return {"total_change": total_change, "significant_changes": total_change >= threshold}
+
+
+def random_pair(rng, scale, tiny_changes=False):
+    """
+    Old and new components of a composite pair
+    
+    Components move by up to scale percentage points, are dropped or
+    added. Unless tiny_changes, every move is larger than
+    COMPONENT_CHANGE_TOLERANCE, so it counts with the default rule too.
+    """
+    old, new = {}, {}
+    for index in range(rng.randint(4, 15)):
+        name = f"Component {index}"
+        cas_number = f"{1000 + index}-00-{index % 10}" if rng.random() < 0.6 else None
+        percentage = round(rng.uniform(0.5, 30), 4)
+        old[name] = (percentage, cas_number)
+        
+        draw = rng.random()
+        if draw < 0.1:
+            continue
+        if draw < 0.3:
+            move = 0.0
+        elif tiny_changes and draw < 0.5:
+            move = rng.uniform(-1, 1) * settings.COMPONENT_CHANGE_TOLERANCE
+        else:
+            move = rng.choice((-1, 1)) * rng.uniform(2 * settings.COMPONENT_CHANGE_TOLERANCE, scale)
+        new[name] = (max(percentage + move, 0.05), cas_number)
+    
+    for index in range(rng.randint(0, 2)):
+        new[f"New component {index}"] = (round(rng.uniform(0.01, scale), 4), None)
+    return old, new
+
+
+@pytest.fixture
+def material(make_material):
+    return make_material()
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_without_rules_results_match_the_previous_comparison(db, material, make_composite, seed):
+    rng = random.Random(seed)
+    old_components, new_components = random_pair(rng, scale=rng.choice((0.05, 0.5, 2.0)))
+    old, new = make_composite(material, old_components), make_composite(material, new_components)
+    
+    expected = compare_composite_components(old, new, settings.COMPOSITE_THRESHOLD_PERCENT)
+    comparison = CompositeComparator(db).compare_components(old, new)
+    
+    assert comparison.total_change_score == round(expected["total_change"], 2)
+    if abs(expected["total_change"] - settings.COMPOSITE_THRESHOLD_PERCENT) > 0.01:
+        assert comparison.significant_changes == expected["significant_changes"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_default_rule_without_tolerance_counts_every_change(client, db, material, make_composite, seed):
+    response = client.post("/api/significance-rules", json=[{'min_change': 0}])
+    assert response.status_code == 201, response.text
+    rng = random.Random(seed)
+    old_components, new_components = random_pair(rng, scale=rng.choice((0.05, 0.5, 2.0)), tiny_changes=True)
+    old, new = make_composite(material, old_components), make_composite(material, new_components)
+    
+    expected = compare_composite_components(old, new, settings.COMPOSITE_THRESHOLD_PERCENT)
+    comparison = CompositeComparator(db).compare_components(old, new)
+    
+    assert comparison.total_change_score == round(expected["total_change"], 2)
+    if abs(expected["total_change"] - settings.COMPOSITE_THRESHOLD_PERCENT) > 0.01:
+        assert comparison.significant_changes == expected["significant_changes"]
+
+
+def test_changes_within_tolerance_do_not_count(db, material, make_composite):
+    old = make_composite(material, {'A': 50.0, 'B': 50.0})
+    new = make_composite(material, {'A': 50.01, 'B': 49.99})
+    
+    comparison = CompositeComparator(db).compare_components(old, new)
+    
+    assert (comparison.components_changed, comparison.total_change_score) == ([], 0.0)
+
+
+def test_rules_take_precedence_by_cas_then_type_then_default(client, db, material, make_composite):
+    rules = [
+        {'absolute_threshold': 3.0},
+        {'component_type': 'COMPONENT', 'absolute_threshold': 2.0},
+        {'cas_number': '5392-40-5', 'absolute_threshold': 1.0}
+    ]
+    assert client.post("/api/significance-rules", json=rules).status_code == 201
+    old = make_composite(material, {'Limonene': (60.0, '5989-27-5'), 'Citral': (10.0, '5392-40-5'), 'Linalool': 30.0})
+    
+    citral = make_composite(material, {'Limonene': (61.5, '5989-27-5'), 'Citral': (8.5, '5392-40-5'), 'Linalool': 30.0})
+    comparison = CompositeComparator(db).compare_components(old, citral)
+    assert comparison.significant_changes is True
+    assert [(c.component_name, c.significance) for c in comparison.components_changed if c.significant] == [('Citral', 'absolute')]
+    
+    limonene = make_composite(material, {'Limonene': (58.5, '5989-27-5'), 'Citral': (10.0, '5392-40-5'), 'Linalool': 31.5})
+    assert CompositeComparator(db).compare_components(old, limonene).significant_changes is False
+
+
+def test_relative_threshold_and_limit(client, db, material, make_composite):
+    rules = [
+        {'cas_number': '5392-40-5', 'relative_threshold': 20.0},
+        {'cas_number': '106-22-9', 'max_percentage': 2.0}
+    ]
+    assert client.post("/api/significance-rules", json=rules).status_code == 201
+    old = make_composite(material, {'Limonene': 97.0, 'Citral': (2.0, '5392-40-5'), 'Citronellol': (1.0, '106-22-9')})
+    
+    relative = make_composite(material, {'Limonene': 96.5, 'Citral': (2.5, '5392-40-5'), 'Citronellol': (1.0, '106-22-9')})
+    comparison = CompositeComparator(db).compare_components(old, relative)
+    assert [(c.component_name, c.significance) for c in comparison.components_changed if c.significant] == [('Citral', 'relative')]
+    
+    over_limit = make_composite(material, {'Limonene': 95.5, 'Citral': (2.0, '5392-40-5'), 'Citronellol': (2.5, '106-22-9')})
+    comparison = CompositeComparator(db).compare_components(old, over_limit)
+    assert [(c.component_name, c.significance) for c in comparison.components_changed if c.significant] == [('Citronellol', 'limit')]
+
+
+def test_rule_applies_to_cas_synonyms(client, db, material, make_composite):
+    catalog = [{'name': 'Limonene', 'cas_number': '5989-27-5', 'synonyms': ['d-Limonene'], 'cas_aliases': ['138-86-3']}]
+    response = client.post("/api/component-catalog", json=catalog)
+    assert response.status_code == 201, response.text
+    assert client.post("/api/significance-rules", json=[{'cas_number': '138-86-3', 'absolute_threshold': 1.0}]).status_code == 201
+    
+    old = make_composite(material, {'Limonene': (60.0, '5989-27-5'), 'Linalool': 40.0})
+    new = make_composite(material, {'Limonene': (58.5, '5989-27-5'), 'Linalool': 41.5})
+    
+    comparison = CompositeComparator(db).compare_components(old, new)
+    
+    assert [c.component_name for c in comparison.components_changed if c.significant] == ['Limonene']
+
+
+def test_empty_catalog_index_is_not_looked_up_again(db, count_queries, monkeypatch):
+    get_significance_engine(db)
+    
+    # Catalog and rules fingerprints only, with an empty (falsy) catalog index
+    with count_queries() as statements:
+        engine = get_significance_engine(db)
+    assert [re.search(r"FROM (\w+)", s).group(1) for s in statements] == ['component_catalog', 'component_synonyms', 'significance_rules']
+    
+    monkeypatch.setattr(significance, "get_identity_index", lambda db: pytest.fail("the injected index is replaced"))
+    assert len(SignificanceEngine.from_db(db, ComponentIdentityIndex([], []))) == len(engine)
+
+
+@pytest.mark.parametrize("scale", [0.2, 4.0])
+def test_review_keeps_the_recalculation_when_the_previous_comparison_would(db, make_material, make_analysis, scale):
+    rng = random.Random(25)
+    expected = {}
+    for _ in range(3):
+        material = make_material()
+        for _ in range(3):
+            make_analysis(material, random_components(rng), weight=rng.uniform(0.5, 5))
+        
+        # Approved composite: the current aggregation, every component moved by up to scale
+        calculated = CompositeCalculator(db).calculate_from_lab_analyses(material.id)
+        approved = Composite(
+            material_id=material.id,
+            version=1,
+            origin=calculated.origin,
+            status=CompositeStatus.APPROVED,
+            approved_at=datetime.now() - timedelta(days=settings.REVIEW_PERIOD_DAYS + 1)
+        )
+        for component in calculated.components:
+            approved.components.append(type(component)(
+                component_name=component.component_name,
+                cas_number=component.cas_number,
+                component_type=component.component_type,
+                percentage=component.percentage + rng.uniform(-scale, scale)
+            ))
+        db.add(approved)
+        db.commit()
+        expected[material.id] = compare_composite_components(approved, calculated, settings.COMPOSITE_THRESHOLD_PERCENT)
+    
+    result = review_composites()
+    
+    significant = {material_id for material_id, comparison in expected.items() if comparison["significant_changes"]}
+    assert (result["reviewed_count"], result["significant_changes_count"]) == (3, len(significant))
+    db.expire_all()
+    assert {composite.material_id for composite in db.query(Composite).filter(Composite.version > 1)} == significant
@@ -0,0 +1,99 @@
+"""
+Aggregation inside PostgreSQL against the Python aggregation
+
+Needs a PostgreSQL database at TEST_DATABASE_URL (its tables are dropped
+and recreated); skipped when it is not reachable.
+"""
+
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import Material, ChromatographicAnalysis
+from app.services.analysis_components import AnalysisComponentIndex
+from app.services.composite_calculator import CompositeCalculator
+from app.services.sql_aggregation import supports_sql_aggregation
+from test_component_statistics import assert_same_components, random_components
+
+
+@pytest.fixture
+def pg_db(monkeypatch):
+    """Session on an empty TEST_DATABASE_URL database"""
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    try:
+        engine.connect().close()
+    except OperationalError:
+        engine.dispose()
+        pytest.skip("TEST_DATABASE_URL is not reachable")
+    if engine.dialect.name != "postgresql":
+        engine.dispose()
+        pytest.skip("TEST_DATABASE_URL is not a PostgreSQL database")
+    
+    monkeypatch.setattr(settings, "COMPOSITE_AGGREGATION_BACKEND", "sql")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def material(pg_db):
+    """Material with eight processed analyses, recorded in the statistics"""
+    rng = random.Random(12)
+    material = Material(reference_code="SQL-1", name="SQL aggregation")
+    pg_db.add(material)
+    pg_db.flush()
+    
+    analyses = [
+        ChromatographicAnalysis(
+            material_id=material.id,
+            filename="analysis.csv",
+            file_path="",
+            weight=rng.uniform(0.5, 5),
+            is_processed=1,
+            parsed_data={'components': random_components(rng)}
+        )
+        for _ in range(8)
+    ]
+    pg_db.add_all(analyses)
+    pg_db.flush()
+    AnalysisComponentIndex(pg_db).add(analyses)
+    calculator = CompositeCalculator(pg_db)
+    for analysis in analyses:
+        calculator.record_analysis(analysis)
+    pg_db.commit()
+    return material
+
+
+def python_aggregation(db, material_id, analysis_ids=None):
+    calculator = CompositeCalculator(db)
+    return calculator._aggregate_analyses(calculator.load_analyses(material_id, analysis_ids))
+
+
+def test_sql_aggregation_equals_python_aggregation(pg_db, material):
+    assert supports_sql_aggregation(pg_db)
+    analysis_ids = [row.id for row in pg_db.query(ChromatographicAnalysis.id).order_by(ChromatographicAnalysis.id)][1:6]
+    
+    _, aggregated = CompositeCalculator(pg_db).aggregate_lab_analyses(material.id, analysis_ids)
+    
+    assert_same_components(python_aggregation(pg_db, material.id, analysis_ids), aggregated)
+
+
+def test_statistics_rebuilt_in_sql_equal_python_aggregation(pg_db, material):
+    calculator = CompositeCalculator(pg_db)
+    assert calculator.rebuild_statistics(material.id) == 8
+    pg_db.commit()
+    
+    _, aggregated = calculator.aggregate_lab_analyses(material.id)
+    
+    assert_same_components(python_aggregation(pg_db, material.id), aggregated)
@@ -19,6 +19,8 @@ export interface CompositeComponent {
   percentage: number
   component_type: 'COMPONENT' | 'IMPURITY'
   confidence_level?: number
+  ci_lower?: number
+  ci_upper?: number
   notes?: string
   created_at: string
 }